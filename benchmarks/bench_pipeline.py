@@ -0,0 +1,113 @@
+# benchmarks/bench_pipeline.py
+"""
+pytest-benchmark cases for the pipeline stages (requires `pip install pytest-benchmark`).
+Not collected by the default pytest run; invoke explicitly:
+
+    pytest benchmarks/bench_pipeline.py --benchmark-autosave
+    pytest benchmarks/bench_pipeline.py --benchmark-compare --benchmark-compare-fail=mean:20%
+"""
+import os
+import sys
+
+import matplotlib
+matplotlib.use("Agg")
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_benchmarks import FEATURE_COLS, field_file
+from src.InstrumentDataProcessor import InstrumentDataProcessor
+from src.FFTFeatureExtractor import FFTFeatureExtractor
+from src.RollingFFTExtractor import RollingFFTExtractor
+from src.AnomalyDetector import AnomalyDetector
+from src.OnlineAnomalyDetector import OnlineAnomalyDetector
+from src.dashboard import DashboardAggregator, generate_financial_dashboard
+from src.visualization import plot_anomalies_over_time
+from src.utils import generate_synthetic_tick_frame, write_synthetic_tick_file
+
+N_TICKS = int(os.environ.get("BENCH_TICKS", 100_000))
+N_INSTRUMENTS = int(os.environ.get("BENCH_INSTRUMENTS", 100))
+
+
+@pytest.fixture(scope="module")
+def tick_file(tmp_path_factory):
+    return write_synthetic_tick_file(str(tmp_path_factory.mktemp("ticks") / "data.txt"), N_TICKS, N_INSTRUMENTS)
+
+
+@pytest.fixture(scope="module")
+def price_df():
+    df = generate_synthetic_tick_frame(N_TICKS, N_INSTRUMENTS)
+    return df[df["Field ID"] == "2"].reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def small_price_df(price_df):
+    codes = price_df["Instrument Code"].drop_duplicates().head(10)
+    return price_df[price_df["Instrument Code"].isin(codes)]
+
+
+@pytest.fixture(scope="module")
+def features(price_df):
+    return FFTFeatureExtractor(engine="vectorized").compute_rolling_features(price_df)
+
+
+@pytest.fixture(scope="module")
+def scored(features):
+    return AnomalyDetector().detect_per_instrument(features, feature_cols=FEATURE_COLS, verbose=False)
+
+
+def test_process_streaming(benchmark, tick_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor_args = (tick_file, field_file("StaticFields.txt"), field_file("DynamicFields.txt"))
+    benchmark(lambda: InstrumentDataProcessor(*processor_args).process(streaming=True))
+
+
+def test_process_parquet(benchmark, tick_file, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    processor_args = (tick_file, field_file("StaticFields.txt"), field_file("DynamicFields.txt"))
+    benchmark(lambda: InstrumentDataProcessor(*processor_args).process(output_format="parquet"))
+
+
+def test_fft_vectorized(benchmark, price_df):
+    benchmark(FFTFeatureExtractor(engine="vectorized").compute_rolling_features, price_df)
+
+
+def test_fft_loop(benchmark, small_price_df):
+    benchmark(FFTFeatureExtractor().compute_rolling_features, small_price_df)
+
+
+def test_rolling_fft_exact(benchmark, small_price_df):
+    benchmark(RollingFFTExtractor().compute_rolling_features, small_price_df)
+
+
+def test_rolling_fft_sliding(benchmark, small_price_df):
+    benchmark(RollingFFTExtractor(method="sliding").compute_rolling_features, small_price_df)
+
+
+def test_detect_per_instrument(benchmark, features):
+    detector = AnomalyDetector()
+    benchmark(detector.detect_per_instrument, features, feature_cols=FEATURE_COLS, verbose=False)
+
+
+def test_online_detect_per_instrument(benchmark, features):
+    benchmark(lambda: OnlineAnomalyDetector().detect_per_instrument(features, feature_cols=FEATURE_COLS, verbose=False))
+
+
+def test_financial_dashboard(benchmark, scored, tmp_path):
+    benchmark(generate_financial_dashboard, scored, charts_dir=str(tmp_path))
+
+
+def test_dashboard_incremental_update(benchmark, scored):
+    cut = len(scored) * 9 // 10  # fold the last 10% of windows into a summary of the first 90%
+    history, batch = scored.iloc[:cut], scored.iloc[cut:]
+
+    def setup():
+        return (DashboardAggregator().update(history),), {}
+
+    benchmark.pedantic(lambda aggregator: aggregator.update(batch).summary(), setup=setup, rounds=20)
+
+
+def test_render_instrument_chart(benchmark, scored, tmp_path):
+    inst = scored["Instrument Code"].iloc[0]
+    benchmark(plot_anomalies_over_time, scored, instrument_code=inst, output_dir=str(tmp_path))
@@ -0,0 +1,240 @@
+# benchmarks/run_benchmarks.py
+"""
+Time and memory-profile every pipeline stage on synthetic tick data.
+
+Usage:
+    python benchmarks/run_benchmarks.py --ticks 1000000 --instruments 1000 --output bench.json
+    python benchmarks/run_benchmarks.py --output bench_new.json --compare bench.json --threshold 0.2
+
+Results are written as JSON (one entry per stage: wall/CPU seconds, traced peak MB, max RSS MB,
+rows in/out) so runs can be diffed; --compare exits with status 1 if any stage regressed.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.InstrumentDataProcessor import InstrumentDataProcessor
+from src.FFTFeatureExtractor import FFTFeatureExtractor
+from src.RollingFFTExtractor import RollingFFTExtractor
+from src.AnomalyDetector import AnomalyDetector
+from src.OnlineAnomalyDetector import OnlineAnomalyDetector
+from src.dashboard import generate_financial_dashboard
+from src.visualization import (
+    plot_dominant_frequency_histogram,
+    plot_anomalies_over_time,
+    plot_top_anomalies_bar
+)
+from src.utils import generate_synthetic_tick_frame, load_processed_data, write_synthetic_tick_file
+
+FEATURE_COLS = ["dominant_frequency", "total_power", "spectral_entropy",
+                "rolling_mean", "rolling_std", "rolling_skew"]
+
+
+def field_file(name):
+    """Locate data/<name> regardless of extension case (the repo ships StaticFields.Txt)."""
+    data_dir = os.path.join(ROOT, "data")
+    for candidate in os.listdir(data_dir):
+        if candidate.lower() == name.lower():
+            return os.path.join(data_dir, candidate)
+    raise FileNotFoundError(os.path.join(data_dir, name))
+
+
+def max_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB on Linux
+
+
+def measure(name, fn, rows_in=None, memory=True):
+    """Run fn() once for timing and, if memory=True, once more under tracemalloc for the peak."""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = fn()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        fn()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    rows_out = len(result) if hasattr(result, "__len__") and not isinstance(result, str) else None
+    record = {
+        "stage": name,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_traced_mb": None if peak_mb is None else round(peak_mb, 2),
+        "max_rss_mb": round(max_rss_mb(), 2),
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+    }
+    print(f"{name:<28} wall {wall:9.3f}s  cpu {cpu:9.3f}s  "
+          f"peak {record['peak_traced_mb'] if peak_mb is not None else '-':>8} MB  rows {rows_in} -> {rows_out}")
+    return result, record
+
+
+def run(args):
+    results = []
+    workdir = tempfile.mkdtemp(prefix="tickerfft_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # processor and plots write into the working directory
+    try:
+        data_file = os.path.join(workdir, "data.txt")
+        _, record = measure("synthetic_tick_file",
+                            lambda: write_synthetic_tick_file(data_file, args.ticks, args.instruments, seed=args.seed),
+                            memory=False)
+        results.append(record)
+
+        processor_args = (data_file, field_file("StaticFields.txt"), field_file("DynamicFields.txt"))
+        _, record = measure("process_csv_streaming",
+                            lambda: InstrumentDataProcessor(*processor_args).process(streaming=True),
+                            rows_in=args.ticks, memory=args.memory)
+        results.append(record)
+        parquet_dir, record = measure("process_parquet",
+                                      lambda: InstrumentDataProcessor(*processor_args).process(output_format="parquet"),
+                                      rows_in=args.ticks, memory=args.memory)
+        results.append(record)
+        if args.legacy_parse:
+            _, record = measure("process_csv_legacy",
+                                lambda: InstrumentDataProcessor(*processor_args).process(),
+                                rows_in=args.ticks, memory=args.memory)
+            results.append(record)
+
+        df = load_processed_data(parquet_dir, columns=["Instrument Code", "Timestamp", "Field ID", "Value"])
+        price_df = df[df["Field ID"].astype(str) == "2"].reset_index(drop=True)
+        del df
+
+        extractor = FFTFeatureExtractor(window_size=args.window_size, step_size=args.step_size, engine="vectorized")
+        features, record = measure("fft_vectorized", lambda: extractor.compute_rolling_features(price_df),
+                                   rows_in=len(price_df), memory=args.memory)
+        results.append(record)
+
+        # per-window / per-offset engines are timed on a subset of instruments unless --full-slow
+        subset_codes = price_df["Instrument Code"].drop_duplicates().head(args.slow_instruments)
+        slow_df = price_df if args.full_slow else price_df[price_df["Instrument Code"].isin(subset_codes)]
+        for name, slow_extractor in [
+            ("fft_loop", FFTFeatureExtractor(window_size=args.window_size, step_size=args.step_size)),
+            ("rolling_fft_exact", RollingFFTExtractor(window_size=args.window_size)),
+            ("rolling_fft_sliding", RollingFFTExtractor(window_size=args.window_size, method="sliding")),
+        ]:
+            _, record = measure(name, lambda e=slow_extractor: e.compute_rolling_features(slow_df),
+                                rows_in=len(slow_df), memory=args.memory)
+            results.append(record)
+
+        detector = AnomalyDetector(contamination=0.05, n_jobs=args.n_jobs)
+        scored, record = measure(
+            "detect_per_instrument",
+            lambda: detector.detect_per_instrument(features, feature_cols=FEATURE_COLS, verbose=False),
+            rows_in=len(features), memory=args.memory)
+        results.append(record)
+
+        _, record = measure(
+            "online_detect_per_instrument",
+            lambda: OnlineAnomalyDetector().detect_per_instrument(features, feature_cols=FEATURE_COLS, verbose=False),
+            rows_in=len(features), memory=args.memory)
+        results.append(record)
+
+        dashboard, record = measure("generate_financial_dashboard",
+                                    lambda: generate_financial_dashboard(scored, charts_dir="charts"),
+                                    rows_in=len(scored), memory=args.memory)
+        results.append(record)
+
+        def render_charts():
+            plot_dominant_frequency_histogram(features, output_dir="charts", fig_num=1)
+            plot_top_anomalies_bar(dashboard, top_n=20, output_dir="charts", fig_num=2)
+            for fig_num, inst in enumerate(dashboard["Instrument"].head(5), start=3):
+                plot_anomalies_over_time(scored, instrument_code=inst, output_dir="charts", fig_num=fig_num)
+            return dashboard.head(5)
+
+        _, record = measure("render_charts", render_charts, rows_in=len(scored), memory=args.memory)
+        results.append(record)
+    finally:
+        os.chdir(cwd)
+
+    _, record = measure("synthetic_tick_frame",
+                        lambda: generate_synthetic_tick_frame(args.ticks, args.instruments, seed=args.seed),
+                        memory=False)
+    results.append(record)
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print per-stage wall-time ratios vs a previous run; return the list of regressed stages."""
+    with open(baseline_path) as file:
+        baseline = {r["stage"]: r for r in json.load(file)["results"]}
+
+    regressions = []
+    print(f"\nComparison with {baseline_path} (threshold +{threshold:.0%}):")
+    for record in results:
+        previous = baseline.get(record["stage"])
+        if previous is None or not previous["wall_s"]:
+            continue
+        ratio = record["wall_s"] / previous["wall_s"]
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{record['stage']:<28} {previous['wall_s']:9.3f}s -> {record['wall_s']:9.3f}s  x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append(record["stage"])
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every TickerFFT-Analytics pipeline stage.")
+    parser.add_argument("--ticks", type=int, default=200_000, help="synthetic ticks to generate")
+    parser.add_argument("--instruments", type=int, default=200, help="number of synthetic instruments")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--window-size", type=int, default=20)
+    parser.add_argument("--step-size", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=1, help="worker processes for anomaly detection")
+    parser.add_argument("--slow-instruments", type=int, default=20,
+                        help="instruments used for the per-window/per-offset engines")
+    parser.add_argument("--full-slow", action="store_true", help="run slow engines on every instrument")
+    parser.add_argument("--legacy-parse", action="store_true", help="also time the original multi-pass parser")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the tracemalloc pass (halves run time)")
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed wall-time slowdown before flagging")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nBenchmark results saved to {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
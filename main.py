@@ -1,4 +1,5 @@
 # main.py
+import argparse
 import os
 import pandas as pd
 import numpy as np
@@ -6,133 +7,284 @@ import matplotlib.pyplot as plt
 
 from src.InstrumentDataProcessor import InstrumentDataProcessor
 from src.FFTFeatureExtractor import FFTFeatureExtractor
+from src.FieldPivot import FieldPivot
+from src.FeatureCache import FeatureCache
+from src.OutOfCoreRunner import OutOfCoreRunner
 from src.AnomalyDetector import AnomalyDetector
+from src.OnlineAnomalyDetector import OnlineAnomalyDetector
 from src.evaluation import compare_feature_sets
+from src.pipeline import PipelineRunner
+from src.ChartRenderer import ChartRenderer
 from src.visualization import (
     plot_dominant_frequency_histogram,
-    plot_anomalies_over_time,
     plot_top_anomalies_bar
 )
-from src.dashboard import generate_financial_dashboard
-
-# ------------------------------
-# Create charts directory
-# ------------------------------
-charts_dir = "charts"
-os.makedirs(charts_dir, exist_ok=True)
-
-# ==============================
-# Step 1: Process raw ticker data
-# ==============================
-processor = InstrumentDataProcessor(
-    "data/data.txt",
-    "data/StaticFields.txt",
-    "data/DynamicFields.txt"
-)
-output_file = processor.process()  # prints output
-
-# ==============================
-# Step 2: Load processed CSV
-# ==============================
-df = pd.read_csv(output_file)
-print(f"Loaded {len(df)} rows from {output_file}")
-
-# Ensure numeric values for FFT
-df["Value"] = pd.to_numeric(df["Value"], errors="coerce")
-df = df.dropna(subset=["Value"])
-print(f"Filtered to {len(df)} numeric rows for FFT")
-
-# ==============================
-# Step 3: Compute FFT + rolling features
-# ==============================
-fft_extractor = FFTFeatureExtractor(sampling_rate=1, window_size=20, step_size=5)
-fft_features_df = fft_extractor.compute_rolling_features(
-    df,
-    value_col="Value",
-    instrument_col="Instrument Code",
-    timestamp_col="Timestamp"
-)
-fft_features_df.to_csv("fft_features.csv", index=False)
-print("FFT features saved to fft_features.csv")
-
-# ==============================
-# Step 4: Evaluate FFT features vs baseline
-# ==============================
-fft_feature_cols = ["dominant_frequency", "total_power", "spectral_entropy"]
-baseline_feature_cols = ["rolling_mean", "rolling_std", "rolling_skew"]
-
-evaluation_results = compare_feature_sets(
-    fft_features_df,
-    fft_cols=fft_feature_cols,
-    baseline_cols=baseline_feature_cols
-)
+from src.dashboard import generate_financial_dashboard, DashboardAggregator
+from src.utils import load_processed_data
 
-print("\nFeature evaluation results:")
-for k, v in evaluation_results.items():
-    print(f"{k}: {v}")
-
-fft_var = evaluation_results["fft_avg_variance"]
-baseline_var = evaluation_results["baseline_avg_variance"]
-signal_improvement_pct = ((fft_var - baseline_var) / baseline_var) * 100
-print(f"Normalized signal improvement (FFT vs baseline): {signal_improvement_pct:.2f}%")
-
-# ==============================
-# Step 5: Run anomaly detection
-# ==============================
-feature_cols = [c for c in fft_features_df.select_dtypes(include=np.number).columns
-                if c not in ["window_start", "window_end"]]
-
-anomaly_detector = AnomalyDetector(contamination=0.05)
-fft_features_with_anomalies = anomaly_detector.detect_per_instrument(
-    fft_features_df,
-    instrument_col="Instrument Code",
-    feature_cols=feature_cols
-)
-fft_features_with_anomalies.to_csv("fft_features_with_anomalies.csv", index=False)
-
-num_anomalies = (fft_features_with_anomalies["anomaly"] == -1).sum()
-print(f"\nDetected {num_anomalies} anomalies across {fft_features_df['Instrument Code'].nunique()} instruments")
-
-# ==============================
-# Step 6: Figure 1 - Dominant frequency histogram
-# ==============================
-plot_dominant_frequency_histogram(
-    fft_features_df,
-    output_dir=charts_dir,
-    fig_num=1
-)
 
-# ==============================
-# Step 7: Financial dashboard + Figure 2 (Top anomalies bar chart)
-# ==============================
-dashboard_df = generate_financial_dashboard(
-    fft_features_with_anomalies,
-    charts_dir=charts_dir,
-    anomaly_threshold_pct=5
-)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="TickerFFT-Analytics pipeline")
+    parser.add_argument("--data-dir", default="data", help="directory with data.txt and field files")
+    parser.add_argument("--charts-dir", default="charts")
+    parser.add_argument("--max-charts", type=int,
+                        help="total power figures for at most this many flagged instruments (default: all)")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--score-only", action="store_true",
+                        help="score with saved models instead of refitting (online: continue the stream from the "
+                             "saved state without saving it back)")
+    parser.add_argument("--detector", default="isolation-forest", choices=["isolation-forest", "online"],
+                        help="per-instrument IsolationForest (batch refit) or online robust z-scores (O(1) per window)")
+    parser.add_argument("--resample-interval",
+                        help="bucket ticks onto a uniform grid before the FFT, e.g. 1s or 250ms (frequencies in Hz)")
+    parser.add_argument("--resample-how", default="last", choices=["last", "mean", "ohlc", "vwap"],
+                        help="bucket aggregation used with --resample-interval (vwap weights by D3 Last volume)")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="run every stage in memory-bounded chunks / instrument groups (datasets in --ooc-dir)")
+    parser.add_argument("--memory-budget-mb", type=float, default=512,
+                        help="working memory per chunk or instrument group in --out-of-core mode "
+                             "(per-instrument models and dashboard totals are kept besides)")
+    parser.add_argument("--ooc-dir", default="ooc_output")
+    parser.add_argument("--events", default="pipeline_events.jsonl",
+                        help="JSON-lines file receiving one event per stage")
+    parser.add_argument("--profile", choices=["cprofile", "tracemalloc"],
+                        help="dump a per-stage profile into --profile-dir")
+    parser.add_argument("--profile-dir", default="profiles")
+    return parser.parse_args(argv)
+
+
+def run_pipeline(args, callbacks=None):
+    runner = PipelineRunner(args.events, profile=args.profile, profile_dir=args.profile_dir, callbacks=callbacks)
+
+    # ------------------------------
+    # Create charts directory
+    # ------------------------------
+    charts_dir = args.charts_dir
+    os.makedirs(charts_dir, exist_ok=True)
+
+    # ==============================
+    # Feature cache: skip parsing + FFT when inputs and parameters are unchanged
+    # ==============================
+    input_files = [os.path.join(args.data_dir, name)
+                   for name in ("data.txt", "StaticFields.txt", "DynamicFields.txt")]
+    fft_field_ids = ["2"]  # D2 = Last price; add more D field IDs to analyse them separately
+    volume_field = "3" if args.resample_how == "vwap" else None  # D3 = Last volume weights the vwap buckets
+    fft_extractor = FFTFeatureExtractor(sampling_rate=1, window_size=20, step_size=5, engine="vectorized", n_jobs=-1,
+                                        resample_interval=args.resample_interval, resample_how=args.resample_how)
+
+    feature_cache = FeatureCache("cache")
+    cache_key = feature_cache.input_key(input_files, fft_extractor, fft_field_ids)
+    fft_features_df = None if args.out_of_core else feature_cache.get(cache_key)
+    if args.detector == "online":  # learns from the windows in time order; --score-only resumes from the saved state
+        anomaly_detector = OnlineAnomalyDetector(alpha=0.05, z_threshold=4.0, warmup=20)
+    else:
+        anomaly_detector = AnomalyDetector(contamination=0.05, n_jobs=-1)
+
+    if fft_features_df is not None:
+        print(f"Loaded {len(fft_features_df)} cached FFT windows (key {cache_key[:17]})")
+        runner.skip("parse", "feature cache hit")
+        runner.skip("load", "feature cache hit")
+        runner.skip("fft", "feature cache hit")
+    else:
+        # ==============================
+        # Step 1: Process raw ticker data
+        # ==============================
+        with runner.stage("parse") as stage:
+            processor = InstrumentDataProcessor(*input_files)
+            output_file = processor.process(output_format="parquet")  # single pass over data.txt, prints output
+            stage.rows_in = processor.stats["lines"]
+            stage.rows_out = processor.stats["records"]
+            stage.metrics["instruments"] = len(processor.instrument_codes)
+            stage.metrics["output"] = output_file
+
+    if fft_features_df is None and args.out_of_core:
+        # ==============================
+        # Steps 2-3 (out-of-core): stream the Parquet dataset in budget-sized chunks
+        # ==============================
+        runner.skip("load", "out-of-core mode reads chunks")
+        with runner.stage("fft") as stage:
+            out_of_core = OutOfCoreRunner(fft_extractor, anomaly_detector, output_dir=args.ooc_dir,
+                                          memory_budget_mb=args.memory_budget_mb, field_id=fft_field_ids[0],
+                                          dynamic_fields=processor.dynamic_fields)
+            out_of_core.extract_features(output_file)
+            stage.rows_in = out_of_core.stats["rows"]
+            stage.rows_out = out_of_core.stats["windows"]
+            stage.metrics["chunks"] = out_of_core.stats["chunks"]
+    elif fft_features_df is None:
+        # ==============================
+        # Step 2: Load processed Parquet dataset
+        # ==============================
+        with runner.stage("load") as stage:
+            df = load_processed_data(
+                output_file,
+                columns=["Instrument Code", "Timestamp", "Field ID", "Description", "Value"]
+            )
+            stage.rows_in = len(df)
+            print(f"Loaded {len(df)} rows from {output_file}")
+
+            # Values are already typed as float; drop text fields (NaN) for FFT
+            df = df.dropna(subset=["Value"])
+            stage.rows_out = len(df)
+            print(f"Filtered to {len(df)} numeric rows for FFT")
+
+        # ==============================
+        # Step 3: Pivot to per-field series + compute FFT rolling features
+        # ==============================
+        with runner.stage("fft", rows_in=len(df)) as stage:
+            pivot_field_ids = fft_field_ids + [volume_field] if volume_field else fft_field_ids
+            pivot = FieldPivot(field_ids=pivot_field_ids, dynamic_fields=processor.dynamic_fields).build(df)
+            print(f"Pivoted {len(pivot.instruments)} instruments x {len(pivot.field_ids)} fields")
+
+            # per-instrument cache entries: only instruments whose input changed are recomputed
+            fft_features_df = feature_cache.compute_field_features(
+                fft_extractor,
+                pivot,
+                field_ids=fft_field_ids,
+                volume_field=volume_field,
+                instrument_col="Instrument Code",
+                timestamp_col="Timestamp"
+            )
+            feature_cache.put(cache_key, fft_features_df)
+            stage.rows_out = len(fft_features_df)
+
+    fft_feature_cols = ["dominant_frequency", "total_power", "spectral_entropy"]
+    baseline_feature_cols = ["rolling_mean", "rolling_std", "rolling_skew"]
+    if args.out_of_core:  # one instrument group in memory at a time: CSV copy + running variances
+        feature_moments = DashboardAggregator(moment_cols=fft_feature_cols + baseline_feature_cols)
+        for i, (_, group_df) in enumerate(out_of_core.iter_groups("features")):
+            group_df.to_csv("fft_features.csv", index=False, mode="a" if i else "w", header=not i)
+            feature_moments.update_moments(group_df)
+        feature_variances = feature_moments.variances()
+        n_windows = out_of_core.stats["windows"]
+        feature_cols = [c for c in group_df.select_dtypes(include=np.number).columns
+                        if c not in ["window_start", "window_end"]]
+    else:
+        fft_features_df.to_csv("fft_features.csv", index=False)
+        feature_variances = None
+        n_windows = len(fft_features_df)
+        feature_cols = [c for c in fft_features_df.select_dtypes(include=np.number).columns
+                        if c not in ["window_start", "window_end"]]
+    print("FFT features saved to fft_features.csv")
+
+    # ==============================
+    # Step 4: Evaluate FFT features vs baseline
+    # ==============================
+    with runner.stage("evaluate", rows_in=n_windows) as stage:
+        evaluation_results = compare_feature_sets(
+            fft_features_df,
+            fft_cols=fft_feature_cols,
+            baseline_cols=baseline_feature_cols,
+            variances=feature_variances
+        )
+
+        print("\nFeature evaluation results:")
+        for k, v in evaluation_results.items():
+            print(f"{k}: {v}")
+
+        fft_var = evaluation_results["fft_avg_variance"]
+        baseline_var = evaluation_results["baseline_avg_variance"]
+        signal_improvement_pct = ((fft_var - baseline_var) / baseline_var) * 100
+        print(f"Normalized signal improvement (FFT vs baseline): {signal_improvement_pct:.2f}%")
+        stage.rows_out = len(evaluation_results)
+
+    # ==============================
+    # Step 5: Run anomaly detection
+    # ==============================
+    with runner.stage("detect", rows_in=n_windows) as stage:
+        if args.score_only:
+            anomaly_detector.load_models(args.model_dir, feature_cols)
+        # the online state is a running summary: each window is scored against the windows before it,
+        # so a frozen end-of-stream state would misjudge the whole run; it keeps updating (but is not saved)
+        score_only = args.score_only and not getattr(anomaly_detector, "online", False)
+        if args.out_of_core:  # whole instruments, in groups that fit the memory budget
+            out_of_core.detect(feature_cols=feature_cols, score_only=score_only, verbose=True)
+            fft_features_with_anomalies = None
+            dashboard_aggregator = DashboardAggregator()
+            for i, (_, group_df) in enumerate(out_of_core.iter_groups("anomalies")):
+                group_df.to_csv("fft_features_with_anomalies.csv", index=False, mode="a" if i else "w", header=not i)
+                dashboard_aggregator.update(group_df)
+        else:
+            fft_features_with_anomalies = anomaly_detector.detect_per_instrument(
+                fft_features_df,
+                instrument_col="Instrument Code",
+                feature_cols=feature_cols,
+                score_only=score_only
+            )
+            fft_features_with_anomalies.to_csv("fft_features_with_anomalies.csv", index=False)
+            dashboard_aggregator = None
+        if not args.score_only:
+            print(f"Models saved to {anomaly_detector.save_models(args.model_dir, feature_cols)}")
+
+        if args.out_of_core:
+            num_anomalies = int(dashboard_aggregator.totals["anomalies"].sum())
+            num_instruments = len(dashboard_aggregator.totals)
+        else:
+            num_anomalies = int((fft_features_with_anomalies["anomaly"] == -1).sum())
+            num_instruments = fft_features_with_anomalies["Instrument Code"].nunique()
+        print(f"\nDetected {num_anomalies} anomalies across {num_instruments} instruments")
+        stage.rows_out = n_windows
+        stage.metrics["anomalies"] = num_anomalies
+
+    # ==============================
+    # Step 6: Financial dashboard
+    # ==============================
+    with runner.stage("dashboard", rows_in=n_windows) as stage:
+        dashboard_df = generate_financial_dashboard(
+            fft_features_with_anomalies,
+            charts_dir=charts_dir,
+            anomaly_threshold_pct=5,
+            aggregator=dashboard_aggregator  # out of core: totals folded in group by group during detection
+        )
+        stage.rows_out = len(dashboard_df)
+
+        print("\nTop instruments by % anomalous windows:")
+        print(dashboard_df.head(10))
+
+    # ==============================
+    # Step 7: Charts
+    #   Figure 1 - Dominant frequency histogram
+    #   Figure 2 - Top anomalies bar chart
+    #   Figures 3+ - Total power over time for every flagged instrument, by % anomalous
+    # ==============================
+    with runner.stage("charts", rows_in=n_windows) as stage:
+        plot_dominant_frequency_histogram(
+            fft_features_df,
+            output_dir=charts_dir,
+            fig_num=1,
+            counts=dashboard_aggregator.frequency_counts.groupby(level="frequency").sum() if args.out_of_core else None
+        )
+
+        plot_top_anomalies_bar(
+            dashboard_df,
+            top_n=20,
+            output_dir=charts_dir,
+            fig_num=2
+        )
+
+        flagged = dashboard_df.loc[dashboard_df["Anomalies"] > 0, "Instrument"].tolist()[:args.max_charts]
+        chart_renderer = ChartRenderer(output_dir=charts_dir, n_jobs=-1, n_ticks=10)
+        if args.out_of_core:  # flagged instruments read back one budget-sized group at a time
+            chart_renderer.render_instrument_groups(
+                out_of_core.iter_groups("anomalies", instruments=flagged),
+                fig_num_start=3,
+                value_col="total_power"
+            )
+        else:
+            chart_renderer.render_instruments(  # grouped once, unchanged figures skipped, rest drawn in parallel
+                fft_features_with_anomalies,
+                instruments=flagged,
+                fig_num_start=3,
+                value_col="total_power"
+            )
+        print(f"Instrument charts: {chart_renderer.stats['rendered']} rendered, "
+              f"{chart_renderer.stats['skipped']} unchanged")
+        stage.rows_out = 2 + len(flagged)
+        stage.metrics.update(chart_renderer.stats)
+
+    print("\nStage summary:")
+    print(runner.summary())
+    return runner
 
-plot_top_anomalies_bar(
-    dashboard_df,
-    top_n=20,
-    output_dir=charts_dir,
-    fig_num=2
-)
 
-print("\nTop instruments by % anomalous windows:")
-print(dashboard_df.head(10))
-
-# ==============================
-# Step 8: Figures 3-7 - Total power over time for top 5 high-risk instruments
-# ==============================
-top_instruments = dashboard_df["Instrument"].head(5).tolist()
-
-for idx, inst in enumerate(top_instruments, start=3):
-    plot_anomalies_over_time(
-        fft_features_with_anomalies,
-        instrument_code=inst,
-        value_col="total_power",
-        output_dir=charts_dir,
-        n_ticks=10,
-        fig_num=idx,
-        highlight_high_risk=True  # updated argument matches visualization.py
-    )
+if __name__ == "__main__":
+    run_pipeline(parse_args())
@@ -0,0 +1,41 @@
+# replay_ticks.py
+import argparse
+import asyncio
+import json
+
+from src.ReplayClient import ReplayClient
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a data.txt file to serve_ticks.py and report throughput/latency")
+    parser.add_argument("data_file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="connect to this Unix socket path instead of TCP")
+    parser.add_argument("--speed", type=float,
+                        help="replay speed vs. the recorded timestamps, e.g. 1 = real time (default: as fast as possible)")
+    parser.add_argument("--connections", type=int, default=1, help="parallel replays of the file")
+    parser.add_argument("--max-lines", type=int)
+    return parser.parse_args(argv)
+
+
+async def replay(args):
+    clients = [ReplayClient(args.data_file, speed=args.speed, max_lines=args.max_lines)
+               for _ in range(args.connections)]
+    return await asyncio.gather(*(client.run(args.host, args.port, unix_path=args.unix_socket) for client in clients))
+
+
+def main(argv=None):
+    for i, stats in enumerate(asyncio.run(replay(parse_args(argv)))):
+        server = stats["server"]
+        print(f"[connection {i}] {stats['lines']} lines in {stats['total_seconds']}s "
+              f"({stats['lines_per_second']} lines/s, max lag {stats['max_schedule_lag_ms']} ms) -> "
+              f"{server.get('windows')} windows, {server.get('anomalies')} anomalies, "
+              f"tick latency p50 {server.get('p50_us', 0) / 1e3:.1f} ms, p99 {server.get('p99_us', 0) / 1e3:.1f} ms")
+        if server.get("errors"):
+            print(json.dumps(server["errors"], indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
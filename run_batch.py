@@ -0,0 +1,35 @@
+# run_batch.py
+import argparse
+import os
+
+from src.BatchRunner import BatchRunner
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the TickerFFT-Analytics pipeline over many daily tick files")
+    parser.add_argument("source", help="directory of daily tick files, or a glob such as 'archive/*.txt'")
+    parser.add_argument("--fields-dir", default="data", help="directory with StaticFields.txt and DynamicFields.txt")
+    parser.add_argument("--output-dir", default="batch_output", help="per-day outputs and manifest.json")
+    parser.add_argument("--pattern", default="*.txt", help="file pattern when source is a directory")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="days processed in parallel (-1 = all cores)")
+    parser.add_argument("--force", action="store_true", help="re-run days the manifest records as done")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runner = BatchRunner(os.path.join(args.fields_dir, "StaticFields.txt"),
+                         os.path.join(args.fields_dir, "DynamicFields.txt"),
+                         output_dir=args.output_dir, n_jobs=args.n_jobs)
+    days = runner.run(args.source, pattern=args.pattern, force=args.force)
+
+    failed = {day: entry for day, entry in days.items() if entry["status"] != "done"}
+    print(f"\n{len(days) - len(failed)}/{len(days)} days done (manifest: {runner.manifest_path})")
+    for day, entry in failed.items():
+        error = entry["stages"].get(entry.get("failed_stage"), {}).get("error")
+        print(f"  {day}: failed at {entry.get('failed_stage')} - {error}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+# serve_ticks.py
+import argparse
+import asyncio
+import os
+
+from src.InstrumentDataProcessor import InstrumentDataProcessor
+from src.FFTFeatureExtractor import FFTFeatureExtractor
+from src.AnomalyDetector import AnomalyDetector
+from src.OnlineAnomalyDetector import OnlineAnomalyDetector
+from src.IngestionServer import IngestionServer
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Receive data.txt tick lines over a socket and score FFT windows live")
+    parser.add_argument("--data-dir", default="data", help="directory with StaticFields.txt and DynamicFields.txt")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix-socket", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--n-workers", type=int, default=-1, help="FFT/scoring worker processes (-1 = all cores)")
+    parser.add_argument("--queue-size", type=int, default=8, help="batches queued per worker before reads pause")
+    parser.add_argument("--batch-ticks", type=int, default=4096)
+    parser.add_argument("--batch-interval", type=float, default=0.05, help="seconds before a partial batch is sent")
+    parser.add_argument("--score", action="store_true", help="score windows with the models saved in --model-dir")
+    parser.add_argument("--detector", default="isolation-forest", choices=["isolation-forest", "online"],
+                        help="with --score: saved IsolationForest models, or online z-scores updated by every window")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--output", help="append scored windows to this CSV")
+    return parser.parse_args(argv)
+
+
+async def serve(args):
+    processor = InstrumentDataProcessor(None,  # line rules only: ticks arrive over the socket
+                                        os.path.join(args.data_dir, "StaticFields.txt"),
+                                        os.path.join(args.data_dir, "DynamicFields.txt"))
+    # same extractor / detector settings as main.py
+    fft_extractor = FFTFeatureExtractor(sampling_rate=1, window_size=20, step_size=5, engine="vectorized")
+    anomaly_detector = None
+    if args.score:
+        anomaly_detector = (OnlineAnomalyDetector(alpha=0.05, z_threshold=4.0, warmup=20) if args.detector == "online"
+                            else AnomalyDetector(contamination=0.05))
+    server = IngestionServer(processor, fft_extractor, anomaly_detector, model_dir=args.model_dir,
+                             n_workers=args.n_workers, queue_size=args.queue_size,
+                             batch_ticks=args.batch_ticks, batch_interval=args.batch_interval)
+    if args.output:
+        server.add_callback(lambda scored: scored.to_csv(
+            args.output, mode="a", header=not os.path.exists(args.output), index=False))
+
+    await server.start(args.host, args.port, unix_path=args.unix_socket)
+    print(f"Listening on {server.addresses} with {server.n_workers} workers")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        print(f"\n{server.stats}")
+        print(f"Tick latency: {server.latency_stats()}")
+
+
+def main(argv=None):
+    try:
+        asyncio.run(serve(parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,14 +1,21 @@
+import copy
+import os
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
+from src.ModelRegistry import ModelRegistry
+from src.parallel import SharedArray, attach_shared_array, iter_sharded, resolve_n_jobs, run_sharded, shard_groups
+
 class AnomalyDetector:
-    def __init__(self, contamination=0.05, random_state=42, normalize_features=True):
+    def __init__(self, contamination=0.05, random_state=42, normalize_features=True, n_jobs=1, chunk_size=None):
         """
         :param contamination: Expected fraction of anomalies
         :param random_state: Random seed for reproducibility
         :param normalize_features: Whether to standardize numeric features
+        :param n_jobs: Worker processes for detect_per_instrument (-1 = all cores)
+        :param chunk_size: Instruments per pool task (default: ~4 tasks per worker)
         """
         self.model = IsolationForest(
             contamination=contamination,
@@ -16,17 +23,16 @@ class AnomalyDetector:
         )
         self.normalize_features = normalize_features
         self.scaler = None
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
+        self.models = {}  # instrument -> (fitted scaler or None, fitted IsolationForest)
 
     def fit_predict(self, feature_df, feature_cols=None):
         """
         Fit the Isolation Forest and predict anomalies.
         Returns the dataframe with 'anomaly' and 'anomaly_score' columns.
         """
-        if feature_cols is None:
-            # Use all numeric columns except instrument/timestamp identifiers
-            feature_cols = feature_df.select_dtypes(include=np.number).columns.tolist()
-            feature_cols = [c for c in feature_cols if c not in ["window_start", "window_end"]]
-
+        feature_cols = self._resolve_feature_cols(feature_df, feature_cols)
         X = feature_df[feature_cols].values
 
         # Optional normalization
@@ -40,17 +46,33 @@ class AnomalyDetector:
 
         return df_copy
 
-    def detect_per_instrument(self, feature_df, instrument_col="Instrument Code", feature_cols=None, verbose=True):
+    def detect_per_instrument(self, feature_df, instrument_col="Instrument Code", feature_cols=None, verbose=True,
+                              score_only=False):
         """
         Run anomaly detection per instrument and return combined results.
         Optionally prints anomaly counts per instrument.
+        Fitted (scaler, model) pairs are kept in self.models (a fresh dict if it held loaded models).
+        With score_only=True, nothing is trained: rows are scored with the models already in
+        self.models (e.g. from load_models), in the same output order.
         """
+        if score_only:
+            _, _, order, _, _ = self._group_instruments(feature_df, instrument_col)
+            result_df = self.score_per_instrument(feature_df, instrument_col, feature_cols)
+            result_df = result_df.iloc[order].reset_index(drop=True)
+            if verbose:
+                for inst, inst_df in result_df.groupby(instrument_col, sort=False):
+                    print(f"Instrument {inst}: {(inst_df['anomaly'] == -1).sum()} anomalies out of {len(inst_df)} rows")
+            return result_df
+
+        self._writable_models()
+        if resolve_n_jobs(self.n_jobs) > 1:
+            return self._detect_per_instrument_parallel(feature_df, instrument_col, feature_cols, verbose)
+
         result_list = []
-        instruments = feature_df[instrument_col].unique()
 
-        for inst in instruments:
-            inst_df = feature_df[feature_df[instrument_col] == inst].copy()
+        for inst, inst_df in feature_df.groupby(instrument_col, sort=False):  # group once, first-appearance order
             inst_df = self.fit_predict(inst_df, feature_cols)
+            self.models[inst] = (self.scaler, copy.deepcopy(self.model))
             if verbose:
                 num_anomalies = (inst_df["anomaly"] == -1).sum()
                 print(f"Instrument {inst}: {num_anomalies} anomalies out of {len(inst_df)} rows")
@@ -58,6 +80,171 @@ class AnomalyDetector:
 
         return pd.concat(result_list, ignore_index=True)
 
+    def _writable_models(self):
+        """Fits write into a plain dict: after load_models() self.models is a read-only lazy view."""
+        if not isinstance(self.models, dict):
+            self.models = {}
+        return self.models
+
+    def _resolve_feature_cols(self, feature_df, feature_cols):
+        if feature_cols is None:
+            # Use all numeric columns except instrument/timestamp identifiers
+            feature_cols = feature_df.select_dtypes(include=np.number).columns.tolist()
+            feature_cols = [c for c in feature_cols if c not in ["window_start", "window_end"]]
+        return feature_cols
+
+    def _group_instruments(self, feature_df, instrument_col):
+        """Group once: row order that makes each instrument contiguous (first-appearance order, stable)."""
+        codes, uniques = pd.factorize(feature_df[instrument_col], sort=False)
+        valid = codes >= 0  # rows without an instrument are dropped, as groupby does
+        order = np.flatnonzero(valid)[np.argsort(codes[valid], kind="stable")]
+        group_lengths = np.bincount(codes[valid], minlength=len(uniques))
+        group_offsets = np.concatenate(([0], np.cumsum(group_lengths)))
+        return codes, uniques, order, group_lengths, group_offsets
+
+    def _detect_per_instrument_parallel(self, feature_df, instrument_col, feature_cols, verbose):
+        """
+        Shard instrument groups across a process pool. The feature matrix is placed in shared memory
+        once; workers fit a scaler + IsolationForest per instrument on their slice.
+        Output order and values match the sequential path.
+        """
+        feature_cols = self._resolve_feature_cols(feature_df, feature_cols)
+        codes, uniques, order, group_lengths, group_offsets = self._group_instruments(feature_df, instrument_col)
+
+        X = feature_df[feature_cols].to_numpy(dtype=np.float64)[order]
+        n_jobs = resolve_n_jobs(self.n_jobs)
+        params = self.model.get_params()
+
+        with SharedArray(X) as shared_X:
+            tasks = [
+                (params, self.normalize_features, shared_X.descriptor, group_offsets[first:last + 1], True)
+                for first, last in shard_groups(len(uniques), n_jobs, self.chunk_size)
+            ]
+            results = run_sharded(_detect_shard_worker, tasks, n_jobs)
+
+        fitted = [pair for _, _, shard_fitted in results for pair in shard_fitted]
+        self.models.update(zip(uniques, fitted))
+
+        result_df = feature_df.iloc[order].reset_index(drop=True)
+        result_df["anomaly"] = np.concatenate([labels for labels, _, _ in results]) if results else []
+        result_df["anomaly_score"] = np.concatenate([scores for _, scores, _ in results]) if results else []
+
+        if verbose:
+            anomaly_counts = np.bincount(codes[order], weights=result_df["anomaly"].to_numpy() == -1,
+                                         minlength=len(uniques))
+            for inst, num_anomalies, n_rows in zip(uniques, anomaly_counts.astype(int), group_lengths):
+                print(f"Instrument {inst}: {num_anomalies} anomalies out of {n_rows} rows")
+
+        return result_df
+
+    def fit_per_instrument(self, feature_df, output_path, instrument_col="Instrument Code", feature_cols=None,
+                           verbose=True):
+        """
+        Train and score one (scaler, IsolationForest) pair per instrument, in parallel when n_jobs > 1.
+        Fitted pairs are kept in self.models for later scoring without refitting, and scored rows are
+        appended to output_path (CSV) shard by shard instead of being concatenated in memory.
+        Row order and scores match detect_per_instrument. Returns output_path.
+        """
+        feature_cols = self._resolve_feature_cols(feature_df, feature_cols)
+        codes, uniques, order, group_lengths, group_offsets = self._group_instruments(feature_df, instrument_col)
+        X = feature_df[feature_cols].to_numpy(dtype=np.float64)[order]
+        n_jobs = resolve_n_jobs(self.n_jobs)
+        params = self.model.get_params()
+        shards = shard_groups(len(uniques), n_jobs, self.chunk_size)
+        self._writable_models()
+
+        if os.path.exists(output_path):
+            os.remove(output_path)
+
+        with SharedArray(X) as shared_X:
+            tasks = [(params, self.normalize_features, shared_X.descriptor, group_offsets[first:last + 1], True)
+                     for first, last in shards]
+            for (first, last), (labels, scores, fitted) in zip(shards, iter_sharded(_detect_shard_worker, tasks, n_jobs)):
+                rows = order[group_offsets[first]:group_offsets[last]]
+                chunk_df = feature_df.iloc[rows].copy()
+                chunk_df["anomaly"] = labels
+                chunk_df["anomaly_score"] = scores
+                chunk_df.to_csv(output_path, mode="a", header=not os.path.exists(output_path), index=False)
+
+                shard_offsets = group_offsets[first:last + 1] - group_offsets[first]
+                for i, inst in enumerate(uniques[first:last]):
+                    self.models[inst] = fitted[i]
+                    if verbose:
+                        inst_labels = labels[shard_offsets[i]:shard_offsets[i + 1]]
+                        print(f"Instrument {inst}: {(inst_labels == -1).sum()} anomalies out of {len(inst_labels)} rows")
+
+        return output_path
+
+    def score_per_instrument(self, feature_df, instrument_col="Instrument Code", feature_cols=None):
+        """
+        Score windows with the per-instrument models in self.models, without refitting.
+        anomaly is int64 (-1/1, as fit_predict returns it); instruments with no fitted model get
+        anomaly/anomaly_score = NaN, in which case anomaly stays float.
+        """
+        feature_cols = self._resolve_feature_cols(feature_df, feature_cols)
+        df_copy = feature_df.copy()
+        df_copy["anomaly"] = np.nan
+        df_copy["anomaly_score"] = np.nan
+
+        for inst, index in df_copy.groupby(instrument_col, sort=False).groups.items():
+            if inst not in self.models:
+                continue
+            scaler, model = self.models[inst]
+            X = df_copy.loc[index, feature_cols].values
+            if scaler is not None:
+                X = scaler.transform(X)
+            scores = model.decision_function(X)
+            df_copy.loc[index, "anomaly"] = np.where(scores < 0, -1, 1)  # same rule as IsolationForest.predict
+            df_copy.loc[index, "anomaly_score"] = scores
+
+        if not df_copy["anomaly"].isna().any():
+            df_copy["anomaly"] = df_copy["anomaly"].astype(np.int64)
+        return df_copy
+
+    def save_models(self, registry_dir, feature_cols, append=False):
+        """
+        Persist self.models to a ModelRegistry, versioned by feature columns and hyperparameters.
+        With append=True, only these models are written and instruments saved earlier are kept.
+        """
+        registry = ModelRegistry(registry_dir)
+        if append:
+            return registry.add(self.models, feature_cols, self.model.get_params(), self.normalize_features)
+        return registry.save(self.models, feature_cols, self.model.get_params(), self.normalize_features)
+
+    def load_models(self, registry_dir, feature_cols, mmap_mode="r"):
+        """
+        Point self.models at saved models for these feature columns and hyperparameters.
+        Models are loaded lazily (memory-mapped) the first time an instrument is scored.
+        """
+        registry = ModelRegistry(registry_dir)
+        self.models = registry.load(feature_cols, self.model.get_params(), self.normalize_features, mmap_mode)
+        return self.models
+
     def get_anomalies(self, feature_df):
         """Return only rows flagged as anomalies"""
         return feature_df[feature_df["anomaly"] == -1]
+
+
+def _detect_shard_worker(params, normalize_features, X_descriptor, group_offsets, return_models=False):
+    """Fit and score one IsolationForest per instrument group in [group_offsets[0], group_offsets[-1])."""
+    shm, X_all = attach_shared_array(X_descriptor)
+    try:
+        labels, scores, fitted = [], [], []
+        for start, end in zip(group_offsets[:-1], group_offsets[1:]):
+            X = X_all[start:end]
+            scaler = None
+            if normalize_features:
+                scaler = StandardScaler()
+                X = scaler.fit_transform(X)
+            else:
+                X = np.array(X)  # copy out of shared memory so fitted models never reference it
+            model = IsolationForest(**params)
+            labels.append(model.fit_predict(X))
+            scores.append(model.decision_function(X))
+            fitted.append((scaler, model))
+        if return_models:
+            return np.concatenate(labels), np.concatenate(scores), fitted
+        return np.concatenate(labels), np.concatenate(scores)
+    finally:
+        del X_all
+        shm.close()
@@ -0,0 +1,227 @@
+import glob
+import json
+import os
+import time
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from src.parallel import iter_sharded, resolve_n_jobs
+from src.timestamps import is_logging_date
+
+STAGES = ("parse", "fft", "detect", "dashboard")
+
+
+class BatchRunner:
+    def __init__(self, static_fields_file, dynamic_fields_file, output_dir="batch_output", n_jobs=-1,
+                 field_ids=("2",), extractor_params=None, detector_params=None):
+        """
+        Run the pipeline over many daily tick files, one process per day.
+
+        Each day gets <output_dir>/<date>/ with the processed Parquet dataset, fft_features.parquet,
+        fft_features_with_anomalies.parquet, models/ and financial_health_summary.csv. Workers record
+        finished stages in <date>/checkpoint.json; the parent merges them into <output_dir>/manifest.json.
+        Re-running skips finished days and resumes a failed day from its first unfinished stage; a day
+        whose source file changed (size or mtime) starts over.
+
+        :param static_fields_file: StaticFields.txt shared by all days
+        :param dynamic_fields_file: DynamicFields.txt shared by all days
+        :param output_dir: Root of the per-day outputs and manifest.json
+        :param n_jobs: Days processed in parallel (-1 = all cores); each day runs single-process inside
+        :param field_ids: D field IDs analysed (as in main.py)
+        :param extractor_params: FFTFeatureExtractor keyword arguments
+        :param detector_params: AnomalyDetector keyword arguments
+        """
+        self.static_fields_file = static_fields_file
+        self.dynamic_fields_file = dynamic_fields_file
+        self.output_dir = output_dir
+        self.n_jobs = n_jobs
+        self.field_ids = [str(f) for f in field_ids]
+        self.extractor_params = {"sampling_rate": 1, "window_size": 20, "step_size": 5, "engine": "vectorized",
+                                 **(extractor_params or {}), "n_jobs": 1}
+        self.detector_params = {"contamination": 0.05, **(detector_params or {}), "n_jobs": 1}
+        self.manifest_path = os.path.join(output_dir, "manifest.json")
+        os.makedirs(output_dir, exist_ok=True)
+
+    def discover(self, source, pattern="*.txt"):
+        """Daily tick files from a directory (matching pattern, field files excluded) or a glob expression."""
+        paths = glob.glob(os.path.join(source, pattern)) if os.path.isdir(source) else glob.glob(source)
+        field_files = {os.path.abspath(self.static_fields_file), os.path.abspath(self.dynamic_fields_file)}
+        return sorted(path for path in paths if os.path.abspath(path) not in field_files)
+
+    def run(self, source, pattern="*.txt", force=False):
+        """
+        Process every day found in `source`, skipping days the manifest records as done (unless force).
+        Returns the manifest's {date: entry} mapping; failed days keep status "failed" and their error.
+        Files whose first line has no valid YYYYMMDD date are skipped with a warning.
+        """
+        from src.InstrumentDataProcessor import InstrumentDataProcessor
+
+        manifest = self.load_manifest()
+        tasks = []
+        for path in self.discover(source, pattern):
+            processor = InstrumentDataProcessor(path, self.static_fields_file, self.dynamic_fields_file)
+            day = processor.extract_date()
+            if not is_logging_date(day):  # not a daily tick file (or empty): no safe directory/manifest key
+                print(f"[batch] {path}: no YYYYMMDD date on the first line, skipped")
+                continue
+            fingerprint = _fingerprint(path)
+            entry = manifest["days"].get(day)
+            if entry is not None and entry["source"] != os.path.abspath(path):
+                raise ValueError(f"Two files for day {day}: {entry['source']} and {path}")
+            if entry is not None and entry["status"] == "done" and entry["fingerprint"] == fingerprint and not force:
+                print(f"[batch] {day}: done, skipped")
+                continue
+            if force:
+                _remove(os.path.join(self.output_dir, day, "checkpoint.json"))
+            manifest["days"][day] = {"source": os.path.abspath(path), "fingerprint": fingerprint,
+                                     "status": "running", "stages": (entry or {}).get("stages", {})}
+            tasks.append((self._config(), day, os.path.abspath(path), fingerprint))
+        self._save_manifest(manifest)
+
+        n_jobs = min(resolve_n_jobs(self.n_jobs), max(len(tasks), 1))
+        for result in iter_sharded(_run_day, tasks, n_jobs):  # manifest updated as each day finishes
+            manifest["days"][result["day"]].update(result)
+            self._save_manifest(manifest)
+            status = result["status"] if result["status"] == "done" else f"failed at {result['failed_stage']}"
+            print(f"[batch] {result['day']}: {status}")
+        return manifest["days"]
+
+    def load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                return json.load(file)
+        return {"days": {}}
+
+    def _save_manifest(self, manifest):
+        _write_json(self.manifest_path, manifest)
+
+    def _config(self):
+        return {
+            "output_dir": os.path.abspath(self.output_dir),
+            "static_fields_file": os.path.abspath(self.static_fields_file),
+            "dynamic_fields_file": os.path.abspath(self.dynamic_fields_file),
+            "field_ids": self.field_ids,
+            "extractor_params": self.extractor_params,
+            "detector_params": self.detector_params,
+        }
+
+
+# -------------------------------------------------
+# Worker side (module level so it can be pickled to the pool)
+# -------------------------------------------------
+def _run_day(config, day, source, fingerprint):
+    """Run the unfinished stages of one day; never raises, failures are returned and checkpointed."""
+    day_dir = os.path.join(config["output_dir"], day)
+    os.makedirs(day_dir, exist_ok=True)
+    checkpoint_path = os.path.join(day_dir, "checkpoint.json")
+    checkpoint = _read_json(checkpoint_path)
+    if checkpoint is None or checkpoint.get("fingerprint") != fingerprint:  # new or changed source: start over
+        checkpoint = {"fingerprint": fingerprint, "stages": {}}
+
+    context = {"config": config, "source": source, "day_dir": day_dir}
+    for stage in STAGES:
+        done = checkpoint["stages"].get(stage)
+        if done and done["status"] == "ok" and all(os.path.exists(p) for p in done["outputs"].values()):
+            context.update(done["outputs"])
+            continue
+
+        started = time.perf_counter()
+        try:
+            outputs = _STAGE_FUNCTIONS[stage](context)
+        except Exception as exc:
+            checkpoint["stages"][stage] = {"status": "error", "error": f"{type(exc).__name__}: {exc}",
+                                           "traceback": traceback.format_exc()}
+            _write_json(checkpoint_path, checkpoint)
+            return {"day": day, "status": "failed", "failed_stage": stage, "stages": checkpoint["stages"]}
+
+        context.update(outputs)
+        checkpoint["stages"][stage] = {"status": "ok", "outputs": outputs, "finished_at": time.time(),
+                                       "wall_s": round(time.perf_counter() - started, 6)}
+        _write_json(checkpoint_path, checkpoint)
+
+    return {"day": day, "status": "done", "failed_stage": None, "stages": checkpoint["stages"]}
+
+
+def _stage_parse(context):
+    from src.InstrumentDataProcessor import InstrumentDataProcessor
+
+    config = context["config"]
+    processor = InstrumentDataProcessor(context["source"], config["static_fields_file"], config["dynamic_fields_file"])
+    return {"processed": processor.process(output_format="parquet", output_dir=context["day_dir"])}
+
+
+def _stage_fft(context):
+    from src.FFTFeatureExtractor import FFTFeatureExtractor
+    from src.FieldPivot import FieldPivot
+    from src.InstrumentDataProcessor import InstrumentDataProcessor
+    from src.utils import load_processed_data
+
+    config = context["config"]
+    processor = InstrumentDataProcessor(context["source"], config["static_fields_file"], config["dynamic_fields_file"])
+    dynamic_fields = processor.load_fields(config["dynamic_fields_file"], "D")
+    df = load_processed_data(context["processed"],
+                             columns=["Instrument Code", "Timestamp", "Field ID", "Description", "Value"])
+    df = df.dropna(subset=["Value"])
+    pivot = FieldPivot(field_ids=config["field_ids"], dynamic_fields=dynamic_fields).build(df)
+    features = FFTFeatureExtractor(**config["extractor_params"]).compute_field_features(
+        pivot, field_ids=config["field_ids"])
+
+    path = os.path.join(context["day_dir"], "fft_features.parquet")
+    _write_parquet(features, path)
+    return {"features": path}
+
+
+def _stage_detect(context):
+    from src.AnomalyDetector import AnomalyDetector
+
+    features = pd.read_parquet(context["features"])
+    feature_cols = [c for c in features.select_dtypes(include=np.number).columns
+                    if c not in ["window_start", "window_end"]]
+    detector = AnomalyDetector(**context["config"]["detector_params"])
+    scored = detector.detect_per_instrument(features, feature_cols=feature_cols, verbose=False)
+
+    path = os.path.join(context["day_dir"], "fft_features_with_anomalies.parquet")
+    _write_parquet(scored, path)
+    return {"anomalies": path, "models": detector.save_models(os.path.join(context["day_dir"], "models"), feature_cols)}
+
+
+def _stage_dashboard(context):
+    from src.dashboard import generate_financial_dashboard
+
+    generate_financial_dashboard(pd.read_parquet(context["anomalies"]), charts_dir=context["day_dir"])
+    return {"dashboard": os.path.join(context["day_dir"], "financial_health_summary.csv")}
+
+
+_STAGE_FUNCTIONS = {"parse": _stage_parse, "fft": _stage_fft, "detect": _stage_detect, "dashboard": _stage_dashboard}
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _write_parquet(df, path):  # write-then-rename so a crash never leaves a complete-looking output
+    tmp_path = path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _write_json(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(payload, file, indent=1, default=str)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def _remove(path):
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.parallel import resolve_n_jobs, run_sharded, shard_groups
+from src.timestamps import to_minutes
+
+RENDER_VERSION = 1  # bump when the figure layout changes so cached charts are redrawn
+
+
+class ChartRenderer:
+    def __init__(self, output_dir="charts", n_jobs=-1, n_ticks=10, manifest_name=".chart_manifest.json"):
+        """
+        Batch renderer for the per-instrument total power figures (Figures 3+).
+
+        The feature table is grouped once (one sort), each instrument's slice is hashed and only
+        figures whose slice or settings changed since the last run are drawn, in a process pool
+        with the object-oriented Agg API. Hashes are kept in output_dir/<manifest_name>.
+
+        :param output_dir: Directory receiving the PNGs and the manifest
+        :param n_jobs: Worker processes (-1 = all cores)
+        :param n_ticks: Maximum x-axis ticks per figure
+        :param manifest_name: File (in output_dir) mapping figure name -> slice hash
+        """
+        self.output_dir = output_dir
+        self.n_jobs = n_jobs
+        self.n_ticks = n_ticks
+        self.manifest_path = os.path.join(output_dir, manifest_name)
+        self.stats = {}
+
+    def render_instruments(self, df, instruments=None, fig_num_start=3, value_col="total_power",
+                           instrument_col="Instrument Code", time_col="window_end", prune=True):
+        """
+        Render one figure per instrument, numbered fig_num_start, fig_num_start + 1, ... in list order.
+
+        :param df: Feature table with anomaly flags (detect_per_instrument output)
+        :param instruments: Instruments to draw, in figure order; default all with at least one anomaly
+        :param prune: Delete figures written by an earlier run that are not part of this one
+        :return: {instrument: png path} for every figure now on disk
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        anomaly = (df["anomaly"] == -1).to_numpy()
+        if instruments is None:
+            instruments = pd.unique(df[instrument_col].to_numpy()[anomaly])
+        instruments = list(pd.unique(np.asarray(list(instruments), dtype=object)))
+
+        # group once: instrument codes in figure order, time-sorted within each instrument
+        codes = pd.Categorical(df[instrument_col], categories=instruments).codes
+        t_min = to_minutes(df[time_col])
+        values = df[value_col].to_numpy(dtype=float)
+        valid = np.flatnonzero((codes >= 0) & ~np.isnan(t_min) & ~np.isnan(values))
+        order = valid[np.lexsort((t_min[valid], codes[valid]))]
+        bounds = np.searchsorted(codes[order], np.arange(len(instruments) + 1))
+
+        manifest = self._load_manifest()
+        outputs, jobs, hashes = {}, [], {}
+        for i, inst in enumerate(instruments):
+            rows = order[bounds[i]:bounds[i + 1]]
+            fig_num = fig_num_start + i
+            if not len(rows):
+                print(f"[Figure {fig_num}] No valid parsed data for {inst}")
+                continue
+            name = f"figure_{fig_num}_total_power_{inst}.png"
+            path = os.path.join(self.output_dir, name)
+            job = (path, t_min[rows], values[rows], anomaly[rows], inst, fig_num, self.n_ticks)
+            hashes[name] = _slice_hash(job)
+            outputs[inst] = path
+            if manifest.get(name) != hashes[name] or not os.path.exists(path):
+                jobs.append(job)
+
+        n_jobs = resolve_n_jobs(self.n_jobs)
+        shards = [(jobs[first:last],) for first, last in shard_groups(len(jobs), n_jobs)]
+        run_sharded(_render_shard, shards, n_jobs)
+
+        removed = self._prune(manifest, hashes) if prune else 0
+        self._save_manifest(hashes if prune else {**manifest, **hashes})
+
+        self.stats = {"rendered": len(jobs), "skipped": len(outputs) - len(jobs), "removed": removed}
+        return outputs
+
+    def render_instrument_groups(self, groups, fig_num_start=3, value_col="total_power",
+                                 instrument_col="Instrument Code", time_col="window_end"):
+        """
+        render_instruments() over (instruments, df) groups, e.g. OutOfCoreRunner.iter_groups(), so only one
+        group's rows are in memory at a time. Figures are numbered across groups in order; stale figures
+        are pruned once at the end. Returns {instrument: png path}.
+        """
+        outputs, stats = {}, {"rendered": 0, "skipped": 0, "removed": 0}
+        fig_num = fig_num_start
+        for instruments, df in groups:
+            outputs.update(self.render_instruments(
+                df, instruments=instruments, fig_num_start=fig_num, value_col=value_col,
+                instrument_col=instrument_col, time_col=time_col, prune=False))
+            fig_num += len(instruments)
+            for key in ("rendered", "skipped"):
+                stats[key] += self.stats[key]
+        manifest = self._load_manifest()
+        written = {os.path.basename(path) for path in outputs.values()}
+        keep = {name: digest for name, digest in manifest.items() if name in written}
+        stats["removed"] = self._prune(manifest, keep)
+        self._save_manifest(keep)
+        self.stats = stats
+        return outputs
+
+    def _prune(self, manifest, keep):
+        """Delete figures listed in the manifest that are not in keep. Returns how many were removed."""
+        removed = 0
+        for name in set(manifest) - set(keep):
+            path = os.path.join(self.output_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as file:
+                return json.load(file)
+        return {}
+
+    def _save_manifest(self, hashes):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(hashes, file, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def _slice_hash(job):
+    _, t_min, values, anomaly, inst, fig_num, n_ticks = job
+    digest = hashlib.sha1(repr((RENDER_VERSION, inst, fig_num, n_ticks)).encode())
+    for array in (t_min, values, anomaly):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _render_shard(jobs):  # module level so it can be pickled to the pool
+    from src.visualization import save_total_power_figure
+
+    for path, t_min, values, anomaly, inst, fig_num, n_ticks in jobs:
+        save_total_power_figure(path, t_min, values, anomaly, inst, fig_num, n_ticks)
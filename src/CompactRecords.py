@@ -0,0 +1,147 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from src.timestamps import date_to_epoch_ns, format_timestamps, is_logging_date
+
+
+class CompactRecords:
+    def __init__(self, instruments, field_ids, descriptions, date_str=None):
+        """
+        Parsed data.txt records as typed columns instead of one tuple of strings per field.
+
+        Each record is an instrument code, a timestamp in nanoseconds since midnight, a field code,
+        the float value and the original value text, kept in one UTF-8 buffer indexed by offsets
+        (so outputs reproduce data.txt exactly). Instruments and (field ID, description) pairs live
+        once in lookup tables shared by every chunk of one parse. Columns are growable array.array
+        buffers, exposed to NumPy without copying.
+
+        :param instruments: Instrument code table (list, index = instrument code)
+        :param field_ids: Field ID table (list, index = field code)
+        :param descriptions: Description table, parallel to field_ids
+        :param date_str: Logging date 'YYYYMMDD' of the records
+        """
+        self.instruments = instruments
+        self.field_ids = field_ids
+        self.descriptions = descriptions
+        self.date_str = date_str
+        self.instrument = array('i')        # index into instruments
+        self.timestamp = array('q')         # nanoseconds since midnight
+        self.field = array('i')             # index into field_ids / descriptions
+        self.value = array('d')             # float value, NaN for text fields
+        self.raw_text = bytearray()         # original value strings, concatenated
+        self.raw_offsets = array('q', [0])  # record i's text is raw_text[raw_offsets[i]:raw_offsets[i + 1]]
+
+    def __len__(self):
+        return len(self.field)
+
+    @property
+    def nbytes(self):  # column buffers only; lookup tables are shared and small
+        columns = (self.instrument, self.timestamp, self.field, self.value, self.raw_offsets)
+        return sum(column.itemsize * len(column) for column in columns) + len(self.raw_text)
+
+    def extend_raw(self, values):
+        """Append value strings to the raw text buffer (the parser calls this in batches)."""
+        text = ''.join(values)
+        if text.isascii():
+            lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        else:
+            lengths = np.fromiter((len(value.encode()) for value in values), dtype=np.int64, count=len(values))
+        self.raw_offsets.frombytes((np.cumsum(lengths) + self.raw_offsets[-1]).tobytes())
+        self.raw_text += text.encode()
+
+    def columns(self):
+        """Zero-copy NumPy views of the record columns."""
+        return {
+            "instrument": np.frombuffer(self.instrument, dtype=np.int32),
+            "timestamp": np.frombuffer(self.timestamp, dtype=np.int64),
+            "field": np.frombuffer(self.field, dtype=np.int32),
+            "value": np.frombuffer(self.value, dtype=np.float64),
+        }
+
+    def raw_values(self, start=0, stop=None):
+        """Original value strings of records [start, stop)."""
+        stop = len(self) if stop is None else stop
+        offsets = self.raw_offsets[start:stop + 1]
+        data = bytes(self.raw_text[offsets[0]:offsets[-1]])
+        base = offsets[0]
+        if data.isascii():  # character and byte offsets agree: slice the decoded text
+            text = data.decode()
+            return [text[a - base:b - base] for a, b in zip(offsets[:-1], offsets[1:])]
+        return [data[a - base:b - base].decode() for a, b in zip(offsets[:-1], offsets[1:])]
+
+    def iter_rows(self, batch_size=100_000):
+        """Yield the (instrument_code, timestamp, field_id, description, value) tuples of parse_data_file, a batch at a time."""
+        cols = self.columns()
+        instruments = np.asarray(self.instruments, dtype=object)
+        field_ids = np.asarray(self.field_ids, dtype=object)
+        descriptions = np.asarray(self.descriptions, dtype=object)
+        for start in range(0, len(self), batch_size):
+            stop = min(start + batch_size, len(self))
+            fields = cols["field"][start:stop]
+            yield from zip(instruments[cols["instrument"][start:stop]],
+                           format_timestamps(cols["timestamp"][start:stop]),
+                           field_ids[fields], descriptions[fields],
+                           self.raw_values(start, stop))
+
+    def to_frame(self):
+        """
+        DataFrame shaped like load_processed_data() on the Parquet output: categorical instrument,
+        field and description columns built straight from the codes, datetime64 timestamps when
+        the date is known (nanoseconds since midnight otherwise) and float values.
+        """
+        cols = self.columns()
+        timestamps = cols["timestamp"]
+        if is_logging_date(self.date_str):
+            timestamps = (timestamps + date_to_epoch_ns(self.date_str)).astype("datetime64[ns]")
+        return pd.DataFrame({
+            "Instrument Code": _categorical(cols["instrument"], self.instruments),
+            "Timestamp": timestamps,
+            "Field ID": _categorical(cols["field"], self.field_ids),
+            "Description": _categorical(cols["field"], self.descriptions),
+            "Value": cols["value"].copy(),
+        })
+
+    def to_record_batch(self, schema):
+        """
+        pyarrow RecordBatch in InstrumentDataProcessor.save_to_parquet's schema. Dictionary columns
+        reuse the codes and 'Raw Value' wraps the text buffer, so no per-row Python strings are built.
+        """
+        import pyarrow as pa
+
+        cols = self.columns()
+        offset = date_to_epoch_ns(self.date_str) if is_logging_date(self.date_str) else 0  # no usable date: no offset
+        raw = pa.LargeStringArray.from_buffers(
+            len(self), pa.py_buffer(np.frombuffer(self.raw_offsets, dtype=np.int64)), pa.py_buffer(self.raw_text))
+        return pa.record_batch([
+            pa.array([self.date_str or "00000000"] * len(self), pa.string()),
+            _dictionary_array(cols["instrument"], self.instruments),
+            pa.array(cols["timestamp"] + offset, pa.int64()).cast(pa.timestamp("ns")),
+            _dictionary_array(cols["field"], self.field_ids),
+            _dictionary_array(cols["field"], self.descriptions),
+            pa.array(cols["value"], pa.float64()),
+            raw.cast(pa.string()),
+        ], schema=schema)
+
+
+def _dictionary(codes, table):
+    """
+    (indices, dictionary) holding the used table entries in order of first appearance, with duplicate
+    entries merged (S and D fields may share IDs/descriptions), as dictionary_encode() would give.
+    """
+    inverse, used = pd.factorize(codes)
+    value_codes, dictionary = pd.factorize(np.asarray(table, dtype=object)[used])
+    return value_codes.astype(np.int32)[inverse], np.asarray(dictionary, dtype=object)
+
+
+def _dictionary_array(codes, table):
+    import pyarrow as pa
+
+    indices, dictionary = _dictionary(codes, table)
+    return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(dictionary, pa.string()))
+
+
+def _categorical(codes, table):
+    indices, categories = _dictionary(codes, table)
+    return pd.Categorical.from_codes(indices, categories=categories)
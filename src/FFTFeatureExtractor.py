@@ -1,12 +1,131 @@
+import copy
+
 import numpy as np
 import pandas as pd
-from scipy.fft import fft, fftfreq
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import fft, fftfreq, rfft
+from scipy.signal import detrend as detrend_windows, get_window, welch
+
+from src.parallel import SharedArray, attach_shared_array, resolve_n_jobs, run_sharded, shard_groups
+from src.resampling import RESAMPLE_METHODS, interval_to_ns, resample_ticks
+from src.timestamps import NS_PER_SECOND, sort_key
+
+SPECTRAL_FEATURES = {}  # name -> fn(power, freqs, windows, extractor) -> 1D array per window
+SPECTRAL_FEATURE_DEFAULTS = {
+    "rolloff": 0.85,        # spectral_rolloff: fraction of total power below the rolloff frequency
+    "band_split": 0.25,     # band_power_ratio: low band is freqs <= band_split * Nyquist
+    "welch_nperseg": None,  # welch_peak_frequency: segment length (default half the window)
+}
+
+
+def register_spectral_feature(name):
+    """
+    Decorator registering an extra spectral feature, selectable with FFTFeatureExtractor(spectral_features=[name]).
+
+    The function receives the positive-frequency power matrix already computed for the core features
+    (n_windows x n_bins, DC and Nyquist excluded), the bin frequencies, the (tapered/detrended) windows
+    and the extractor, and returns one value per window. welch_peak_frequency is the one built-in
+    feature that runs its own (segment) FFTs on those windows instead of reusing the power matrix.
+    """
+    def decorator(fn):
+        SPECTRAL_FEATURES[name] = fn
+        return fn
+    return decorator
+
+
+@register_spectral_feature("spectral_centroid")
+def _spectral_centroid(power, freqs, windows, extractor):  # power-weighted mean frequency
+    total = power.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, power @ freqs / total, 0.0)
+
+
+@register_spectral_feature("spectral_flatness")
+def _spectral_flatness(power, freqs, windows, extractor):  # geometric / arithmetic mean power, 1 = white noise
+    arithmetic = power.mean(axis=1)
+    geometric = np.exp(np.log(power + 1e-12).mean(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(arithmetic > 0, geometric / arithmetic, 0.0)
+
+
+@register_spectral_feature("spectral_rolloff")
+def _spectral_rolloff(power, freqs, windows, extractor):  # lowest frequency holding `rolloff` of the power
+    cumulative = np.cumsum(power, axis=1)
+    threshold = extractor.feature_params["rolloff"] * cumulative[:, -1]
+    first_bin = np.minimum((cumulative < threshold[:, None]).sum(axis=1), len(freqs) - 1)
+    return np.where(cumulative[:, -1] > 0, freqs[first_bin], 0.0)
+
+
+@register_spectral_feature("band_power_ratio")
+def _band_power_ratio(power, freqs, windows, extractor):  # share of power in the low band
+    low_band = freqs <= extractor.feature_params["band_split"] * extractor.sampling_rate / 2
+    total = power.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, power[:, low_band].sum(axis=1) / total, 0.0)
+
+
+@register_spectral_feature("welch_peak_frequency")
+def _welch_peak_frequency(power, freqs, windows, extractor):  # peak of the Welch PSD (averaged segments)
+    n = windows.shape[1]
+    nperseg = min(extractor.feature_params["welch_nperseg"] or max(n // 2, 1), n)
+    # windows already carry the extractor's taper/detrend: don't let welch apply its own on top
+    welch_freqs, psd = welch(windows, fs=extractor.sampling_rate, nperseg=nperseg, window="boxcar",
+                             detrend=False, axis=-1)
+    positive = welch_freqs > 0
+    if not positive.any():
+        return np.zeros(len(windows))
+    psd = psd[:, positive]
+    return np.where(psd.sum(axis=1) > 0, welch_freqs[positive][np.argmax(psd, axis=1)], 0.0)
+
 
 class FFTFeatureExtractor:
-    def __init__(self, sampling_rate=1, window_size=20, step_size=5):
+    def __init__(self, sampling_rate=1, window_size=20, step_size=5, engine="loop", batch_size=65536,
+                 n_jobs=1, chunk_size=None, resample_interval=None, resample_how="last",
+                 spectral_features=None, window_function=None, detrend=None, feature_params=None):
+        """
+        :param sampling_rate: Observations per unit time
+        :param window_size: Number of observations per rolling window
+        :param step_size: Offset between consecutive window starts
+        :param engine: "loop" (one FFT per window) or "vectorized" (batched rfft over strided window views)
+        :param batch_size: Windows per batched FFT call in the vectorized engine (bounds temporary memory)
+        :param n_jobs: Worker processes for the vectorized engine (-1 = all cores); instruments are sharded
+                       across a process pool and values shared through shared memory
+        :param chunk_size: Instruments per pool task (default: ~4 tasks per worker)
+        :param resample_interval: Bucket ticks onto a uniform per-instrument grid before the FFT (seconds or
+                                  e.g. "1s"); sampling_rate then becomes 1 / interval, so frequencies are in Hz
+        :param resample_how: Bucket aggregation: "last", "mean", "ohlc" (FFT on close) or "vwap"
+        :param spectral_features: Extra registered features to output (see SPECTRAL_FEATURES), computed from
+                                  the same power spectrum as the core features; unselected ones cost nothing
+        :param window_function: Taper applied before the FFT, any scipy.signal.get_window spec (e.g. "hann")
+        :param detrend: "constant" or "linear" detrending of each window before the FFT
+        :param feature_params: Overrides for SPECTRAL_FEATURE_DEFAULTS
+        """
+        if engine not in ("loop", "vectorized"):
+            raise ValueError(f"Unknown engine '{engine}', expected 'loop' or 'vectorized'")
+        if resolve_n_jobs(n_jobs) > 1 and engine != "vectorized":
+            raise ValueError("n_jobs > 1 requires engine='vectorized'")
+        unknown = [name for name in (spectral_features or []) if name not in SPECTRAL_FEATURES]
+        if unknown:
+            raise ValueError(f"Unknown spectral features {unknown}, registered: {sorted(SPECTRAL_FEATURES)}")
+        if detrend not in (None, "constant", "linear"):
+            raise ValueError(f"Unknown detrend '{detrend}', expected None, 'constant' or 'linear'")
+        if resample_how not in RESAMPLE_METHODS:
+            raise ValueError(f"Unknown resample_how '{resample_how}', expected one of {RESAMPLE_METHODS}")
+        if resample_interval is not None:
+            sampling_rate = NS_PER_SECOND / interval_to_ns(resample_interval)  # samples per second on the uniform grid
         self.sampling_rate = sampling_rate
+        self.resample_interval = resample_interval
+        self.resample_how = resample_how
+        self.spectral_features = list(spectral_features or [])
+        self.window_function = window_function
+        self.detrend = detrend
+        self.feature_params = {**SPECTRAL_FEATURE_DEFAULTS, **(feature_params or {})}
         self.window_size = window_size
         self.step_size = step_size
+        self.engine = engine
+        self.batch_size = batch_size
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
 
     def compute_fft_features(self, series):
         series = pd.to_numeric(series, errors="coerce").dropna().values.astype(float)
@@ -15,7 +134,8 @@ class FFTFeatureExtractor:
         if n == 0:
             return None
 
-        fft_values = fft(series)
+        prepared = self._prepare_windows(series[None, :])
+        fft_values = fft(prepared[0])
         freqs = fftfreq(n, d=1 / self.sampling_rate)
         power = np.abs(fft_values) ** 2 / n
 
@@ -23,6 +143,7 @@ class FFTFeatureExtractor:
         pos_mask = freqs > 0
         freqs = freqs[pos_mask]
         power = power[pos_mask]
+        extra = self._spectral_features(power[None, :], freqs, prepared)
 
         # Normalize power to sum to 1
         total_power = np.sum(power)
@@ -34,10 +155,61 @@ class FFTFeatureExtractor:
         dominant_freq = freqs[np.argmax(power)] if len(power) > 0 else 0.0
         spectral_entropy = -np.sum(power * np.log2(power + 1e-12))
 
+        features = {
+            "dominant_frequency": dominant_freq,
+            "total_power": total_power,
+            "spectral_entropy": spectral_entropy,
+        }
+        features.update({name: values[0] for name, values in extra.items()})
+        return features
+
+    def compute_batch_features(self, windows):
+        """
+        Compute FFT features and rolling moments for a 2D array of windows (n_windows x window_size)
+        with one batched rfft along the last axis. Windows must not contain NaN.
+        Returns a dict of 1D arrays, matching compute_fft_features + pandas mean/std/skew per window.
+        """
+        n = windows.shape[1]
+        n_pos = (n - 1) // 2  # rfft bins with strictly positive fftfreq (Nyquist bin excluded, as in fft path)
+
+        prepared = self._prepare_windows(windows)
+        spectrum = rfft(prepared, axis=-1)
+        power = np.abs(spectrum[:, 1:n_pos + 1]) ** 2 / n
+        freqs = np.arange(1, n_pos + 1) * self.sampling_rate / n
+        extra = self._spectral_features(power, freqs, prepared)
+
+        total_power = power.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            norm_power = np.where(total_power[:, None] > 0, power / total_power[:, None], 0.0)
+
+        if n_pos > 0:
+            dominant_freq = freqs[np.argmax(norm_power, axis=1)]
+        else:
+            dominant_freq = np.zeros(len(windows))
+        spectral_entropy = -np.sum(norm_power * np.log2(norm_power + 1e-12), axis=1)
+
+        # rolling moments (pandas semantics: sample std, adjusted Fisher-Pearson skew)
+        mean = windows.mean(axis=1)
+        adjusted = windows - mean[:, None]
+        m2 = (adjusted ** 2).sum(axis=1)
+        m3 = (adjusted ** 3).sum(axis=1)
+        eps = np.finfo(np.float64).eps
+        max_abs = np.abs(windows).max(axis=1, initial=0.0)
+        m2 = np.where(np.abs(m2) <= (eps * max_abs) ** 2 * n, 0.0, m2)
+        m3 = np.where(np.abs(m3) <= (eps * max_abs) ** 3 * n, 0.0, m3)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(m2 / (n - 1)) if n > 1 else np.full(len(windows), np.nan)
+            skew = (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5) if n > 2 else np.full(len(windows), np.nan)
+        skew = np.where(m2 == 0, 0.0, skew) if n > 2 else skew
+
         return {
             "dominant_frequency": dominant_freq,
             "total_power": total_power,
             "spectral_entropy": spectral_entropy,
+            **extra,
+            "rolling_mean": mean,
+            "rolling_std": std,
+            "rolling_skew": skew,
         }
 
     def compute_rolling_features(
@@ -46,11 +218,24 @@ class FFTFeatureExtractor:
         value_col="Value",
         instrument_col="Instrument Code",
         timestamp_col="Timestamp",
+        volume_col=None,
     ):
+        """
+        Rolling FFT features per instrument, one row per window.
+        With resample_interval set, ticks are first bucketed onto a uniform grid (volume_col feeds "vwap")
+        and window_start / window_end are bucket start times.
+        """
+        if self.resample_interval is not None:
+            df = resample_ticks(df, self.resample_interval, how=self.resample_how, value_col=value_col,
+                                instrument_col=instrument_col, timestamp_col=timestamp_col, volume_col=volume_col)
+
+        if self.engine == "vectorized":
+            return self._compute_rolling_features_vectorized(df, value_col, instrument_col, timestamp_col)
+
         results = []
 
-        for inst in df[instrument_col].unique():
-            inst_df = df[df[instrument_col] == inst].sort_values(timestamp_col)
+        for inst, inst_df in df.groupby(instrument_col, sort=False):  # group once, first-appearance order
+            inst_df = inst_df.iloc[np.argsort(sort_key(inst_df[timestamp_col]), kind="stable")]  # chronological
 
             series = inst_df[value_col]
             timestamps = inst_df[timestamp_col].values
@@ -75,3 +260,269 @@ class FFTFeatureExtractor:
                 results.append(fft_features)
 
         return pd.DataFrame(results)
+
+    def _prepare_windows(self, windows):
+        """Optional detrending and tapering of each window (rows) before the FFT."""
+        if self.detrend is not None:
+            windows = detrend_windows(windows, axis=-1, type=self.detrend)
+        if self.window_function is not None:
+            windows = windows * get_window(self.window_function, windows.shape[1])
+        return windows
+
+    def _spectral_features(self, power, freqs, windows):
+        """Selected registry features from the already computed power matrix and prepared windows (empty dict when none selected)."""
+        if power.shape[1] == 0:  # windows too short for any positive-frequency bin
+            return {name: np.zeros(len(power)) for name in self.spectral_features}
+        return {name: SPECTRAL_FEATURES[name](power, freqs, windows, self) for name in self.spectral_features}
+
+    def _window_counts(self, group_lengths):
+        """Number of complete windows in each group."""
+        return np.where(
+            group_lengths >= self.window_size,
+            (group_lengths - self.window_size) // self.step_size + 1,
+            0,
+        )
+
+    def _window_starts(self, group_starts, group_lengths):
+        """Start offsets of every window, for contiguous groups, in group order (no Python loop over groups)."""
+        counts = self._window_counts(group_lengths)
+        total = int(counts.sum())
+        first_window = np.cumsum(counts) - counts
+        within = np.arange(total) - np.repeat(first_window, counts)
+        return np.repeat(group_starts, counts) + within * self.step_size
+
+    def _sorted_groups(self, df, instrument_col, timestamp_col):
+        """
+        Group once: stable sort rows by (instrument in first-appearance order, timestamp).
+        Returns (order, instrument codes, instrument uniques, group starts, group lengths).
+        """
+        inst_codes, inst_uniques = pd.factorize(df[instrument_col], sort=False)
+        ts_keys = sort_key(df[timestamp_col])  # int64 ns, parsed once for the whole column; missing sort last
+        order = np.lexsort((ts_keys, inst_codes))
+
+        sorted_codes = inst_codes[order]
+        group_lengths = np.bincount(sorted_codes, minlength=len(inst_uniques))
+        group_starts = np.cumsum(group_lengths) - group_lengths
+        return order, sorted_codes, inst_uniques, group_starts, group_lengths
+
+    def _compute_rolling_features_vectorized(self, df, value_col, instrument_col, timestamp_col):
+        columns = ["dominant_frequency", "total_power", "spectral_entropy", *self.spectral_features, instrument_col,
+                   "window_start", "window_end", "rolling_mean", "rolling_std", "rolling_skew"]
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+
+        order, sorted_codes, inst_uniques, group_starts, group_lengths = self._sorted_groups(
+            df, instrument_col, timestamp_col)
+        values = pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=np.float64)[order]
+        timestamps = df[timestamp_col].to_numpy()[order]
+
+        starts, features, keep = self._window_features(values, group_starts, group_lengths)
+        if len(starts) == 0:
+            return pd.DataFrame(columns=columns)
+
+        result = pd.DataFrame({
+            "dominant_frequency": features["dominant_frequency"],
+            "total_power": features["total_power"],
+            "spectral_entropy": features["spectral_entropy"],
+            **{name: features[name] for name in self.spectral_features},
+            instrument_col: np.asarray(inst_uniques, dtype=object)[sorted_codes[starts]],
+            "window_start": timestamps[starts],
+            "window_end": timestamps[starts + self.window_size - 1],
+            "rolling_mean": features["rolling_mean"],
+            "rolling_std": features["rolling_std"],
+            "rolling_skew": features["rolling_skew"],
+        }, columns=columns)
+        return result[keep].reset_index(drop=True)
+
+    def compute_multiscale_features(
+        self,
+        df,
+        scales,
+        value_col="Value",
+        instrument_col="Instrument Code",
+        timestamp_col="Timestamp",
+        volume_col=None,
+    ):
+        """
+        Rolling features at several (window_size, step_size) scales in one pass: the data is resampled,
+        grouped and sorted once and every scale windows the same sorted value array.
+
+        Rows are the windows of the first (base) scale. Each scale's features get a "_w<size>s<step>"
+        suffix; for the other scales the row holds the latest window of that scale (same instrument)
+        ending at or before the base window's end, NaN if there is none yet.
+
+        :param scales: List of (window_size, step_size) pairs, base scale first
+        :return: DataFrame [instrument_col, window_start, window_end, <feature>_w<size>s<step>...]
+        """
+        if not scales:
+            raise ValueError("scales must contain at least one (window_size, step_size) pair")
+        if self.resample_interval is not None:
+            df = resample_ticks(df, self.resample_interval, how=self.resample_how, value_col=value_col,
+                                instrument_col=instrument_col, timestamp_col=timestamp_col, volume_col=volume_col)
+
+        feature_names = ["dominant_frequency", "total_power", "spectral_entropy", *self.spectral_features,
+                         "rolling_mean", "rolling_std", "rolling_skew"]
+        suffixes = [f"_w{window_size}s{step_size}" for window_size, step_size in scales]
+        columns = [instrument_col, "window_start", "window_end"] + [
+            name + suffix for suffix in suffixes for name in feature_names]
+        if df.empty:
+            return pd.DataFrame(columns=columns)
+
+        order, sorted_codes, inst_uniques, group_starts, group_lengths = self._sorted_groups(
+            df, instrument_col, timestamp_col)
+        values = pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=np.float64)[order]
+        timestamps = df[timestamp_col].to_numpy()[order]
+
+        base_ends = None
+        result = {}
+        for (window_size, step_size), suffix in zip(scales, suffixes):
+            scale = copy.copy(self)
+            scale.window_size, scale.step_size = window_size, step_size
+            starts, features, keep = scale._window_features(values, group_starts, group_lengths)
+            if not features:  # no complete window at this scale
+                features = {name: np.empty(0) for name in feature_names}
+            starts = starts[keep]
+            ends = starts + window_size - 1  # positions in the shared sorted arrays, increasing
+
+            if base_ends is None:  # base scale defines the rows
+                base_ends = ends
+                result[instrument_col] = np.asarray(inst_uniques, dtype=object)[sorted_codes[starts]]
+                result["window_start"] = timestamps[starts]
+                result["window_end"] = timestamps[ends]
+                for name in feature_names:
+                    result[name + suffix] = features[name][keep]
+                continue
+
+            # as-of join on end position: latest window of this scale ending at or before the base end
+            match = np.searchsorted(ends, base_ends, side="right") - 1
+            found = match >= 0
+            found[found] = sorted_codes[ends[match[found]]] == sorted_codes[base_ends[found]]
+            for name in feature_names:
+                aligned = np.full(len(base_ends), np.nan)
+                aligned[found] = features[name][keep][match[found]]
+                result[name + suffix] = aligned
+
+        return pd.DataFrame(result, columns=columns)
+
+    def compute_field_features(
+        self,
+        pivot,
+        field_ids=None,
+        instrument_col="Instrument Code",
+        timestamp_col="Timestamp",
+        field_col="Field ID",
+        volume_field=None,
+    ):
+        """
+        Compute rolling features separately for each selected field of a FieldPivot store,
+        so spectra are never built from interleaved fields.
+        Returns one DataFrame with a field_col column identifying the source field.
+        volume_field (a field of the store, e.g. "3" = Last volume) supplies the trade sizes for resample_how="vwap".
+        """
+        field_ids = pivot.field_ids if field_ids is None else [str(f) for f in field_ids]
+        results = []
+
+        for field_id in field_ids:
+            field_df = pivot.to_long(field_id, instrument_col=instrument_col, timestamp_col=timestamp_col,
+                                     volume_field=volume_field)
+            features = self.compute_rolling_features(
+                field_df,
+                value_col="Value",
+                instrument_col=instrument_col,
+                timestamp_col=timestamp_col,
+                volume_col=None if volume_field is None else "Volume",
+            )
+            features[field_col] = field_id
+            results.append(features)
+
+        if not results:
+            return pd.DataFrame()
+        return pd.concat(results, ignore_index=True)
+
+    def _window_features(self, values, group_starts, group_lengths):
+        """
+        Features for every window of this extractor's scale over sorted, contiguous groups.
+        Returns (starts, features dict, keep mask), sharded across processes when n_jobs > 1.
+        """
+        starts = self._window_starts(group_starts, group_lengths)
+        if len(starts) == 0:
+            return starts, {}, np.zeros(0, dtype=bool)
+
+        n_jobs = resolve_n_jobs(self.n_jobs)
+        if n_jobs > 1:
+            feature_parts, keep_parts = self._features_parallel(values, starts, group_lengths, n_jobs)
+        else:
+            features, keep = self._features_for_starts(values, starts)
+            feature_parts, keep_parts = [features], [keep]
+        features = {name: np.concatenate([part[name] for part in feature_parts]) for name in feature_parts[0]}
+        return starts, features, np.concatenate(keep_parts)
+
+    def _features_for_starts(self, values, starts):
+        """
+        Batched features for the windows starting at `starts` in the sorted value array.
+        Returns (features dict, keep mask); keep is False for windows with no numeric values.
+        """
+        # zero-copy strided view: row i is values[i:i + window_size]
+        all_windows = sliding_window_view(values, self.window_size)
+
+        feature_parts = []
+        keep = np.ones(len(starts), dtype=bool)
+        for batch_begin in range(0, len(starts), self.batch_size):
+            batch_starts = starts[batch_begin:batch_begin + self.batch_size]
+            windows = all_windows[batch_starts]
+            features = self.compute_batch_features(np.nan_to_num(windows))
+
+            # windows with missing values fall back to the per-window path (NaN-skipping semantics)
+            for i in np.flatnonzero(np.isnan(windows).any(axis=1)):
+                window_series = pd.Series(windows[i])
+                fallback = self.compute_fft_features(window_series)
+                if fallback is None:
+                    keep[batch_begin + i] = False
+                    continue
+                fallback.update({
+                    "rolling_mean": window_series.mean(),
+                    "rolling_std": window_series.std(),
+                    "rolling_skew": window_series.skew(),
+                })
+                for name, value in fallback.items():
+                    features[name][i] = value
+            feature_parts.append(features)
+
+        if not feature_parts:
+            empty = self.compute_batch_features(np.empty((0, self.window_size)))
+            return empty, keep
+        features = {name: np.concatenate([part[name] for part in feature_parts]) for name in feature_parts[0]}
+        return features, keep
+
+    def _features_parallel(self, values, starts, group_lengths, n_jobs):
+        """Shard instrument groups across a process pool; sorted values are shared, not pickled."""
+        window_offsets = np.concatenate(([0], np.cumsum(self._window_counts(group_lengths))))
+        params = {
+            "sampling_rate": self.sampling_rate,
+            "window_size": self.window_size,
+            "step_size": self.step_size,
+            "engine": "vectorized",
+            "batch_size": self.batch_size,
+            "spectral_features": self.spectral_features,
+            "window_function": self.window_function,
+            "detrend": self.detrend,
+            "feature_params": self.feature_params,
+        }
+
+        with SharedArray(values) as shared_values:
+            tasks = [
+                (params, shared_values.descriptor, starts[window_offsets[first]:window_offsets[last]])
+                for first, last in shard_groups(len(group_lengths), n_jobs, self.chunk_size)
+            ]
+            results = run_sharded(_fft_shard_worker, tasks, n_jobs)
+
+        return [features for features, _ in results], [keep for _, keep in results]
+
+
+def _fft_shard_worker(params, values_descriptor, starts):  # module-level so it can be pickled to the pool
+    shm, values = attach_shared_array(values_descriptor)
+    try:
+        return FFTFeatureExtractor(**params)._features_for_starts(values, starts)
+    finally:
+        del values
+        shm.close()
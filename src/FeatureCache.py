@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class FeatureCache:
+    def __init__(self, cache_dir="cache", max_bytes=2 * 1024 ** 3):
+        """
+        Content-addressed on-disk cache of FFT feature tables (Parquet files).
+
+        Two kinds of entry share one LRU budget:
+        - full tables keyed by a hash of the input file(s), extractor parameters and field selection
+        - per-instrument tables keyed by a hash of that instrument's input rows and the same parameters,
+          so only instruments whose input changed are recomputed
+
+        :param cache_dir: Directory holding the cache entries and index.json
+        :param max_bytes: Size budget; least recently used entries are evicted beyond it
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    # -------------------------------------------------
+    # Keys
+    # -------------------------------------------------
+    @staticmethod
+    def extractor_params(extractor, field_ids=None):
+        params = {
+            "extractor": type(extractor).__name__,
+            "sampling_rate": extractor.sampling_rate,
+            "window_size": extractor.window_size,
+            "step_size": getattr(extractor, "step_size", 1),
+            "field_ids": None if field_ids is None else [str(f) for f in field_ids],
+        }
+        # optional settings only enter the key when set, so existing keys stay valid
+        if getattr(extractor, "resample_interval", None) is not None:
+            params["resample"] = [str(extractor.resample_interval), extractor.resample_how]
+        if getattr(extractor, "spectral_features", None) or getattr(extractor, "window_function", None) \
+                or getattr(extractor, "detrend", None):
+            params["spectral"] = {"features": extractor.spectral_features, "window_function": extractor.window_function,
+                                  "detrend": extractor.detrend, "feature_params": extractor.feature_params}
+        return params
+
+    def file_hash(self, path, block_size=1 << 20):
+        """SHA-256 of a file's contents, memoised in the index by (size, mtime)."""
+        stat = os.stat(path)
+        memo_key = os.path.abspath(path)
+        memo = self.index["file_hashes"].get(memo_key)
+        if memo and memo["size"] == stat.st_size and memo["mtime"] == stat.st_mtime:
+            return memo["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(block_size), b""):
+                digest.update(block)
+        self.index["file_hashes"][memo_key] = {
+            "size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest.hexdigest()}
+        self._save_index()
+        return digest.hexdigest()
+
+    def input_key(self, input_files, extractor, field_ids=None):
+        """Key for a full feature table computed from input_files with this extractor and field selection."""
+        payload = {
+            "files": [self.file_hash(path) for path in input_files],
+            "params": self.extractor_params(extractor, field_ids),
+        }
+        return "full_" + _hash_json(payload)
+
+    # -------------------------------------------------
+    # Entries
+    # -------------------------------------------------
+    def get(self, key):
+        table = self._read(key)
+        self._save_index()
+        return table
+
+    def put(self, key, df):
+        self._write(key, df)
+        self._evict()
+        self._save_index()
+
+    def compute_rolling_features(self, extractor, df, value_col="Value", instrument_col="Instrument Code",
+                                 timestamp_col="Timestamp", field_id=None, volume_col=None):
+        """
+        extractor.compute_rolling_features with per-instrument reuse: instruments whose rows hash to a
+        cached entry are read back, only the rest are computed (in one extractor call) and stored.
+        Output has the same rows and order as calling the extractor directly.
+        """
+        params = self.extractor_params(extractor, None if field_id is None else [field_id])
+        groups = df.groupby(instrument_col, sort=False).indices  # first-appearance order, as the extractors use
+        hashed_cols = [timestamp_col, value_col] + ([volume_col] if volume_col is not None else [])
+        row_hashes = pd.util.hash_pandas_object(df[hashed_cols], index=False).to_numpy()
+
+        keys = {}
+        for inst, rows in groups.items():
+            digest = hashlib.sha256(_hash_json({"instrument": str(inst), "params": params}).encode())
+            digest.update(row_hashes[rows].tobytes())
+            keys[inst] = "inst_" + digest.hexdigest()[:32]
+
+        cached = {inst: self._read(key) for inst, key in keys.items()}
+        missing = [inst for inst, table in cached.items() if table is None]
+
+        if missing:
+            missing_rows = np.sort(np.concatenate([groups[inst] for inst in missing]))
+            computed = extractor.compute_rolling_features(
+                df.iloc[missing_rows], value_col=value_col,
+                instrument_col=instrument_col, timestamp_col=timestamp_col, volume_col=volume_col)
+            computed_groups = dict(tuple(computed.groupby(instrument_col, sort=False))) if not computed.empty else {}
+            for inst in missing:
+                table = computed_groups.get(inst, computed.iloc[:0]).reset_index(drop=True)
+                self._write(keys[inst], table)
+                cached[inst] = table
+            self._evict()
+        self._save_index()
+
+        tables = [cached[inst] for inst in groups if not cached[inst].empty]
+        if not tables:
+            return pd.DataFrame()
+        return pd.concat(tables, ignore_index=True)
+
+    def compute_field_features(self, extractor, pivot, field_ids=None, instrument_col="Instrument Code",
+                               timestamp_col="Timestamp", field_col="Field ID", volume_field=None):
+        """Cached equivalent of FFTFeatureExtractor.compute_field_features."""
+        field_ids = pivot.field_ids if field_ids is None else [str(f) for f in field_ids]
+        results = []
+        for field_id in field_ids:
+            field_df = pivot.to_long(field_id, instrument_col=instrument_col, timestamp_col=timestamp_col,
+                                     volume_field=volume_field)
+            features = self.compute_rolling_features(
+                extractor, field_df, instrument_col=instrument_col, timestamp_col=timestamp_col, field_id=field_id,
+                volume_col=None if volume_field is None else "Volume")
+            features[field_col] = field_id
+            results.append(features)
+
+        if not results:
+            return pd.DataFrame()
+        return pd.concat(results, ignore_index=True)
+
+    # -------------------------------------------------
+    # Index + eviction
+    # -------------------------------------------------
+    def _load_index(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as file:
+                return json.load(file)
+        return {"entries": {}, "file_hashes": {}}
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.index, file)
+        os.replace(tmp_path, self.index_path)
+
+    def _read(self, key):
+        entry = self.index["entries"].get(key)
+        path = os.path.join(self.cache_dir, f"{key}.parquet")
+        if entry is None or not os.path.exists(path):
+            return None
+        entry["last_access"] = time.time()
+        return pd.read_parquet(path)
+
+    def _write(self, key, df):
+        path = os.path.join(self.cache_dir, f"{key}.parquet")
+        df.to_parquet(path, index=False)
+        self.index["entries"][key] = {"bytes": os.path.getsize(path), "last_access": time.time()}
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes."""
+        entries = self.index["entries"]
+        total = sum(entry["bytes"] for entry in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entries[key]["bytes"]
+            path = os.path.join(self.cache_dir, f"{key}.parquet")
+            if os.path.exists(path):
+                os.remove(path)
+            del entries[key]
+
+
+def _hash_json(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
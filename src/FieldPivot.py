@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+
+class FieldPivot:
+    def __init__(self, field_ids=None, dynamic_fields=None, fill="ffill"):
+        """
+        Pivot long-format processor output into a dense per-instrument, per-field array store.
+
+        :param field_ids: Field IDs to keep as columns (e.g. ["2", "3"]); None keeps every field
+        :param dynamic_fields: Optional {field_id: description} from InstrumentDataProcessor.dynamic_fields;
+                               when given, only D-field rows (matching description) are kept, so S-fields
+                               sharing the same numeric ID are not mixed in
+        :param fill: "ffill" to carry the last observed value forward (as-of alignment), None to leave gaps
+        """
+        self.field_ids = [str(f) for f in field_ids] if field_ids is not None else None
+        self.dynamic_fields = dynamic_fields
+        self.fill = fill
+        self.instruments = []
+        self.timestamps = {}  # instrument -> 1D array of timestamps (sorted)
+        self.values = {}      # instrument -> 2D float64 array (time x field)
+        self.observed = {}    # instrument -> 2D bool array, True where the value was observed (not filled)
+
+    def build(self, df, instrument_col="Instrument Code", timestamp_col="Timestamp",
+              field_col="Field ID", value_col="Value", description_col="Description"):
+        """
+        Build the store from long-format rows. Duplicate (instrument, timestamp, field) rows keep the last value.
+        Returns self.
+        """
+        field_ids = df[field_col].astype(str)
+        mask = pd.Series(True, index=df.index)
+        if self.field_ids is not None:
+            mask &= field_ids.isin(self.field_ids)
+        if self.dynamic_fields is not None and description_col in df.columns:
+            expected = field_ids.map(self.dynamic_fields)
+            mask &= df[description_col].astype(str).eq(expected)
+
+        long_df = pd.DataFrame({
+            instrument_col: df.loc[mask, instrument_col].values,
+            timestamp_col: df.loc[mask, timestamp_col].values,
+            field_col: field_ids[mask].values,
+            value_col: pd.to_numeric(df.loc[mask, value_col], errors="coerce").values,
+        })
+
+        wide = long_df.groupby([instrument_col, timestamp_col, field_col], sort=True)[value_col].last().unstack(field_col)
+        columns = self.field_ids if self.field_ids is not None else sorted(wide.columns, key=_field_sort_key)
+        wide = wide.reindex(columns=columns)
+        observed = wide.notna().to_numpy()
+        if self.fill == "ffill":
+            wide = wide.groupby(level=0).ffill()
+
+        self.field_ids = list(columns)
+        matrix = wide.to_numpy(dtype=np.float64)
+        instruments = wide.index.get_level_values(0)
+        timestamps = wide.index.get_level_values(1).to_numpy()
+
+        # split the sorted matrix into contiguous per-instrument blocks in one pass
+        codes, uniques = pd.factorize(instruments, sort=False)
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [len(codes)]))
+
+        self.instruments = list(uniques)
+        self.timestamps = {}
+        self.values = {}
+        self.observed = {}
+        for inst, start, end in zip(self.instruments, starts, ends):
+            self.timestamps[inst] = timestamps[start:end]
+            self.values[inst] = matrix[start:end]
+            self.observed[inst] = observed[start:end]
+        return self
+
+    def get(self, instrument, field_id=None):
+        """Return (timestamps, values) for an instrument; values is 1D for a single field_id, else 2D."""
+        values = self.values[instrument]
+        if field_id is not None:
+            values = values[:, self.field_ids.index(str(field_id))]
+        return self.timestamps[instrument], values
+
+    def to_long(self, field_id, instrument_col="Instrument Code", timestamp_col="Timestamp", value_col="Value",
+                volume_field=None, volume_col="Volume"):
+        """
+        Return one field as a long DataFrame [instrument, timestamp, value] sorted by instrument then time,
+        ready for the rolling FFT extractors. Leading gaps (before the first observation) are dropped.
+        With volume_field (e.g. "3" = Last volume, which must be in the store) only rows where field_id was
+        observed are kept, with that row's own volume (never forward-filled, 0 when none was reported) as
+        volume_col, so each trade is weighted once by resample_how="vwap".
+        """
+        col = self.field_ids.index(str(field_id))
+        lengths = [len(self.timestamps[inst]) for inst in self.instruments]
+        if not self.instruments:
+            return pd.DataFrame(columns=[instrument_col, timestamp_col, value_col])
+
+        out = pd.DataFrame({
+            instrument_col: np.repeat(np.array(self.instruments, dtype=object), lengths),
+            timestamp_col: np.concatenate([self.timestamps[inst] for inst in self.instruments]),
+            value_col: np.concatenate([self.values[inst][:, col] for inst in self.instruments]),
+        })
+        if volume_field is not None:
+            volume = self.field_ids.index(str(volume_field))
+            out[volume_col] = np.concatenate([np.where(self.observed[inst][:, volume], self.values[inst][:, volume], 0.0)
+                                              for inst in self.instruments])
+            out = out[np.concatenate([self.observed[inst][:, col] for inst in self.instruments])]
+        return out.dropna(subset=[value_col]).reset_index(drop=True)
+
+
+def _field_sort_key(field_id):  # numeric IDs in numeric order, anything else after
+    return (0, int(field_id), "") if str(field_id).isdigit() else (1, 0, str(field_id))
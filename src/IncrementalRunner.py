@@ -0,0 +1,304 @@
+import hashlib
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.dashboard import DashboardAggregator
+from src.FeatureCache import FeatureCache
+from src.OutOfCoreRunner import carry_rows, hold_latest
+from src.timestamps import to_epoch_ns
+
+STATE_VERSION = 1  # bump when the state layout changes so old state triggers a fresh bootstrap
+
+
+class IncrementalRunner:
+    def __init__(self, processor, extractor, detector, state_dir="incremental_state",
+                 features_path="fft_features.csv", anomalies_path="fft_features_with_anomalies.csv",
+                 model_dir="models", field_id="2", feature_cols=None, block_bytes=64 * 1024 ** 2,
+                 instrument_col="Instrument Code", timestamp_col="Timestamp", value_col="Value", field_col="Field ID"):
+        """
+        Intraday refresh of the features and anomaly scores of a data.txt that keeps growing.
+
+        The first refresh (or any refresh after the file was replaced or truncated) is a bootstrap:
+        the whole file is parsed, per-instrument models are fitted and saved, and both CSV outputs
+        are rewritten. Later refreshes seek to the byte offset reached last time and parse only the
+        complete lines appended since. Each instrument keeps its rows from the next unemitted window
+        start on (window_size - 1 ticks when step_size is 1) as a carry buffer, so exactly the windows
+        touched by new ticks are computed, scored with the saved models and appended to the outputs.
+        Ticks at an instrument's latest timestamp are carried too and only windowed once a later tick
+        arrives, so same-timestamp ticks split across refreshes keep the last value as in a full run
+        (the windows ending at that timestamp are emitted one refresh late).
+        Instruments that reach their first window after the bootstrap get a model fitted on those windows.
+
+        State (offset, watermark, carry, dashboard totals) lives in state_dir. It is replaced in one
+        atomic rename after the outputs are appended, and outputs are cut back to the recorded sizes
+        on start, so an interrupted refresh is simply redone.
+
+        :param processor: InstrumentDataProcessor for the day's data.txt (its line rules are reused)
+        :param extractor: FFTFeatureExtractor (no resample_interval: buckets would be split at refresh borders)
+        :param detector: AnomalyDetector whose models are saved to / loaded from model_dir
+        :param state_dir: Directory receiving incremental_state.json and the carry / dashboard files
+        :param features_path: CSV of feature windows (as main.py's fft_features.csv)
+        :param anomalies_path: CSV of scored windows (as main.py's fft_features_with_anomalies.csv)
+        :param model_dir: ModelRegistry directory for the per-instrument models
+        :param field_id: Field ID analysed (e.g. "2" = Last price)
+        :param feature_cols: Detector inputs; default every numeric feature column except the window times
+        :param block_bytes: Bytes of data.txt parsed per block (bounds memory on a bootstrap)
+        """
+        if getattr(extractor, "resample_interval", None) is not None:
+            raise ValueError("IncrementalRunner does not support resample_interval: buckets would be split at refresh borders")
+        self.processor = processor
+        self.data_file = processor.data_file
+        self.extractor = extractor
+        self.detector = detector
+        self.state_dir = state_dir
+        self.features_path = features_path
+        self.anomalies_path = anomalies_path
+        self.model_dir = model_dir
+        self.field_id = str(field_id)
+        self.feature_cols = list(feature_cols) if feature_cols is not None else None
+        self.block_bytes = block_bytes
+        self.instrument_col = instrument_col
+        self.timestamp_col = timestamp_col
+        self.value_col = value_col
+        self.field_col = field_col
+        self.state_path = os.path.join(state_dir, "incremental_state.json")
+        self.aggregator = None
+        self.stats = {}
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def refresh(self, verbose=False):
+        """Bring the outputs up to date with data.txt. Returns stats for this refresh."""
+        started = time.perf_counter()
+        os.makedirs(self.state_dir, exist_ok=True)
+        state = self.load_state()
+        reason = self._bootstrap_reason(state)
+        if reason is None:
+            _truncate(self.features_path, state["features_bytes"])  # drop output of an interrupted refresh
+            _truncate(self.anomalies_path, state["anomalies_bytes"])
+            carry = pd.read_parquet(self._state_file(state, "carry"))
+            self.aggregator = joblib.load(self._state_file(state, "dashboard"))
+        else:
+            if verbose:
+                print(f"[incremental] bootstrap: {reason}")
+            state = self._new_state(state)
+            carry = None
+            self.aggregator = DashboardAggregator(instrument_col=self.instrument_col)
+            for path in (self.features_path, self.anomalies_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        bootstrap = reason is not None
+        n_ticks = n_late = 0
+        feature_parts = []
+        for ticks, offset in self._iter_tail(state):
+            n_ticks += len(ticks)
+            if state["watermark_ns"] is not None:
+                n_late += int((ticks[self.timestamp_col].to_numpy().view(np.int64) < state["watermark_ns"]).sum())
+            if len(ticks):
+                state["watermark_ns"] = max(state["watermark_ns"] or 0, int(ticks[self.timestamp_col].max().value))
+            combined = ticks if carry is None else pd.concat([carry, ticks], ignore_index=True)
+            # ticks at an instrument's latest timestamp wait for later lines: same-timestamp ticks must be
+            # resolved together (keeping the last value, as FieldPivot does) before a window uses them
+            combined, held = hold_latest(combined, self.instrument_col, self.timestamp_col)
+            combined = combined.drop_duplicates([self.instrument_col, self.timestamp_col], keep="last")
+            features = self.extractor.compute_rolling_features(
+                combined, value_col=self.value_col, instrument_col=self.instrument_col,
+                timestamp_col=self.timestamp_col)
+            carry = pd.concat([carry_rows(self.extractor, combined, self.instrument_col, self.timestamp_col), held],
+                              ignore_index=True)
+            state["offset"] = offset
+            if not features.empty:
+                features[self.field_col] = self.field_id  # same layout as compute_field_features
+                feature_parts.append(features)
+
+        features = pd.concat(feature_parts, ignore_index=True) if feature_parts else pd.DataFrame()
+        scored = self._score(features, state, bootstrap, verbose) if len(features) else features
+        if len(features):
+            state["features_bytes"] = _append_csv(features, self.features_path)
+            state["anomalies_bytes"] = _append_csv(scored, self.anomalies_path)
+            self.aggregator.update(scored)
+
+        if carry is None:
+            carry = pd.DataFrame({self.instrument_col: pd.Series(dtype=object),
+                                  self.timestamp_col: pd.Series(dtype="datetime64[ns]"),
+                                  self.value_col: pd.Series(dtype=np.float64)})
+        self._save_state(state, carry)
+
+        n_anomalies = int((scored["anomaly"] == -1).sum()) if len(features) else 0
+        self.stats = {"bootstrap": bootstrap, "ticks": n_ticks, "late_ticks": n_late, "windows": len(features),
+                      "anomalies": n_anomalies, "offset": state["offset"],
+                      "watermark": None if state["watermark_ns"] is None else str(pd.Timestamp(state["watermark_ns"])),
+                      "seconds": round(time.perf_counter() - started, 3)}
+        if n_late and verbose:
+            print(f"[incremental] {n_late} ticks older than the previous watermark: earlier windows are not revisited")
+        return self.stats
+
+    def summary(self, anomaly_threshold_pct=5.0):
+        """Dashboard table over every window scored so far (kept up to date without rereading the outputs)."""
+        if self.aggregator is None:
+            state = self.load_state()
+            if state is None:
+                raise FileNotFoundError(f"No incremental state in {self.state_dir}: run refresh() first")
+            self.aggregator = joblib.load(self._state_file(state, "dashboard"))
+        return self.aggregator.summary(anomaly_threshold_pct)
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as file:
+            return json.load(file)
+
+    # -------------------------------------------------
+    # Tail parsing
+    # -------------------------------------------------
+    def _iter_tail(self, state):
+        """
+        Yield (ticks frame, byte offset after the block) for the complete lines after state["offset"],
+        block_bytes at a time. A partially written last line is left for the next refresh.
+        """
+        with open(self.data_file, "rb") as file:
+            file.seek(state["offset"])
+            offset, pending = state["offset"], b""
+            while True:
+                block = file.read(self.block_bytes)
+                if not block:
+                    break
+                block = pending + block
+                end = block.rfind(b"\n") + 1
+                block, pending = block[:end], block[end:]
+                if not block:
+                    continue
+                offset += len(block)
+                yield self._ticks(block.decode().splitlines(), state["date"]), offset
+
+    def _ticks(self, lines, date):
+        """[instrument, timestamp, value] frame of the selected field, numeric values only, in file order."""
+        ticks = list(self.processor.iter_ticks(lines, self.field_id))
+        instruments, timestamps, values = zip(*ticks) if ticks else ((), (), ())
+        frame = pd.DataFrame({
+            self.instrument_col: np.asarray(instruments, dtype=object),
+            self.timestamp_col: to_epoch_ns(list(timestamps), date).astype("datetime64[ns]"),
+            self.value_col: np.asarray(values, dtype=np.float64),
+        })
+        return frame.dropna(subset=[self.value_col]).reset_index(drop=True)
+
+    # -------------------------------------------------
+    # Detection
+    # -------------------------------------------------
+    def _score(self, features, state, bootstrap, verbose):
+        """Fit + save every model on a bootstrap; otherwise score with the saved models, fitting only new instruments."""
+        if state["feature_cols"] is None:
+            state["feature_cols"] = self.feature_cols or [
+                c for c in features.select_dtypes(include=np.number).columns if c not in ["window_start", "window_end"]]
+        feature_cols = state["feature_cols"]
+        detector = self.detector
+
+        if bootstrap:
+            detector.models = {}
+            scored = detector.detect_per_instrument(
+                features, instrument_col=self.instrument_col, feature_cols=feature_cols, verbose=verbose)
+            detector.save_models(self.model_dir, feature_cols)
+            return scored
+
+        try:
+            detector.load_models(self.model_dir, feature_cols)
+        except FileNotFoundError:
+            detector.models = {}
+        scored = detector.detect_per_instrument(
+            features, instrument_col=self.instrument_col, feature_cols=feature_cols, verbose=verbose, score_only=True)
+
+        unscored = scored["anomaly"].isna().to_numpy()
+        if unscored.any():  # instruments whose first windows arrived after the bootstrap (fitted into a fresh dict)
+            fitted = detector.detect_per_instrument(
+                scored.loc[unscored, features.columns], instrument_col=self.instrument_col,
+                feature_cols=feature_cols, verbose=verbose)
+            detector.save_models(self.model_dir, feature_cols, append=True)
+            scored.loc[unscored, ["anomaly", "anomaly_score"]] = fitted[["anomaly", "anomaly_score"]].to_numpy()
+            detector.load_models(self.model_dir, feature_cols)
+        scored["anomaly"] = scored["anomaly"].astype(np.int64)  # integer labels, as a full run writes them
+        return scored
+
+    # -------------------------------------------------
+    # State
+    # -------------------------------------------------
+    def _source_fingerprint(self):
+        """Device/inode plus a hash of the first line: changes when data.txt is replaced (e.g. the next day)."""
+        stat = os.stat(self.data_file)
+        with open(self.data_file, "rb") as file:
+            head = file.readline()
+        return {"path": os.path.abspath(self.data_file), "dev": stat.st_dev, "inode": stat.st_ino,
+                "head_sha1": hashlib.sha1(head).hexdigest()}
+
+    def _params(self):
+        return {"version": STATE_VERSION,
+                "extractor": FeatureCache.extractor_params(self.extractor, [self.field_id]),
+                "detector": self.detector.model.get_params(),
+                "normalize_features": self.detector.normalize_features,
+                "feature_cols": self.feature_cols}
+
+    def _bootstrap_reason(self, state):
+        """Why the outputs must be rebuilt from scratch, or None when the tail can be appended."""
+        if state is None:
+            return "no previous state"
+        if json.loads(json.dumps(self._params(), default=str)) != state["params"]:
+            return "extractor or detector parameters changed"
+        if state["source"] != self._source_fingerprint():
+            return "data file replaced"
+        if os.path.getsize(self.data_file) < state["offset"]:
+            return "data file truncated"
+        for path, size in ((self.features_path, state["features_bytes"]),
+                           (self.anomalies_path, state["anomalies_bytes"])):
+            if size and (not os.path.exists(path) or os.path.getsize(path) < size):
+                return f"{path} is missing or shorter than recorded"
+        for kind in ("carry", "dashboard"):
+            if not os.path.exists(self._state_file(state, kind)):
+                return f"{kind} state missing"
+        return None
+
+    def _new_state(self, previous=None):
+        # generation continues from the previous state, so its carry/dashboard files are removed on save
+        return {"params": json.loads(json.dumps(self._params(), default=str)), "source": self._source_fingerprint(),
+                "date": self.processor.extract_date(), "offset": 0, "watermark_ns": None, "feature_cols": None,
+                "features_bytes": 0, "anomalies_bytes": 0, "generation": previous["generation"] if previous else 0}
+
+    def _state_file(self, state, kind):
+        extension = "parquet" if kind == "carry" else "joblib"
+        return os.path.join(self.state_dir, f"{kind}-{state['generation']:06d}.{extension}")
+
+    def _save_state(self, state, carry):
+        """Write this generation's carry and dashboard files, then switch the state file to them atomically."""
+        previous = [self._state_file(state, kind) for kind in ("carry", "dashboard")]
+        state["generation"] += 1
+        carry.to_parquet(self._state_file(state, "carry"), index=False)
+        joblib.dump(self.aggregator, self._state_file(state, "dashboard"))
+
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(state, file, indent=2, default=str)
+        os.replace(tmp_path, self.state_path)
+        for path in previous:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _append_csv(df, path):
+    """Append df to a CSV (header only when new, columns in the file's order). Returns the new file size."""
+    if os.path.exists(path) and os.path.getsize(path):
+        columns = pd.read_csv(path, nrows=0).columns
+        df[list(columns)].to_csv(path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return os.path.getsize(path)
+
+
+def _truncate(path, size):
+    if os.path.exists(path) and os.path.getsize(path) > size:
+        with open(path, "r+b") as file:
+            file.truncate(size)
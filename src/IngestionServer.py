@@ -0,0 +1,371 @@
+import asyncio
+import json
+import signal
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.OutOfCoreRunner import carry_rows, hold_latest
+from src.parallel import resolve_n_jobs
+from src.timestamps import NAT, to_epoch_ns
+
+
+class IngestionServer:
+    def __init__(self, processor, extractor, detector=None, model_dir="models", feature_cols=None, field_id="2",
+                 n_workers=-1, queue_size=8, batch_ticks=4096, batch_interval=0.05, read_bytes=1 << 16,
+                 callbacks=None, latency_samples=100_000, instrument_col="Instrument Code"):
+        """
+        asyncio service receiving data.txt-format tick lines over TCP or a Unix socket.
+
+        Each connection is read in blocks; complete lines are parsed with the processor's line rules
+        (InstrumentDataProcessor.iter_ticks) and buffered per instrument until batch_ticks ticks are
+        waiting or batch_interval seconds pass. Instruments are routed to a fixed worker process
+        (crc32 of the code), which keeps their carry-over ticks, computes the rolling FFT windows the
+        batch closes (same windows and values as the batch pipeline) and scores them with the saved
+        models, so the event loop never runs CPU-bound work.
+
+        Backpressure: every worker has a bounded queue of batches. When it is full, the connection
+        stops reading until the worker catches up, the socket buffers fill and the sender's writes block.
+
+        When a client closes its write side, the server answers with one JSON line of statistics for
+        that connection (ticks, windows, anomalies, tick latency from receipt to scored window).
+
+        :param processor: InstrumentDataProcessor supplying the line rules (no data file needed)
+        :param extractor: FFTFeatureExtractor (no resample_interval: buckets would be split at batch borders)
+        :param detector: Optional AnomalyDetector; models are loaded from model_dir (e.g. saved by main.py)
+        :param feature_cols: Detector inputs; default the extractor's numeric feature columns
+        :param field_id: Field ID analysed (e.g. "2" = Last price)
+        :param n_workers: Worker processes (-1 = all cores)
+        :param queue_size: Batches queued per worker before readers are paused
+        :param batch_ticks: Ticks buffered per connection before a batch is dispatched
+        :param batch_interval: Seconds after which a partial batch is dispatched anyway
+        :param read_bytes: Socket read size
+        :param callbacks: Optional list of callables receiving each DataFrame of scored windows
+        :param latency_samples: Number of most recent per-tick latencies kept for latency_stats()
+        """
+        if getattr(extractor, "resample_interval", None) is not None:
+            raise ValueError("IngestionServer does not support resample_interval: buckets would be split at batch borders")
+        self.processor = processor
+        self.extractor = extractor
+        self.detector = detector
+        self.model_dir = model_dir
+        self.feature_cols = list(feature_cols) if feature_cols is not None else [
+            "dominant_frequency", "total_power", "spectral_entropy", *extractor.spectral_features,
+            "rolling_mean", "rolling_std", "rolling_skew"]
+        self.field_id = str(field_id)
+        self.n_workers = resolve_n_jobs(n_workers)
+        self.queue_size = queue_size
+        self.batch_ticks = batch_ticks
+        self.batch_interval = batch_interval
+        self.read_bytes = read_bytes
+        self.callbacks = list(callbacks or [])
+        self.instrument_col = instrument_col
+        self.latencies = deque(maxlen=latency_samples)
+        self.stats = {"connections": 0, "lines": 0, "ticks": 0, "batches": 0, "windows": 0, "anomalies": 0,
+                      "backpressure_waits": 0}
+        self.server = None
+        self.executors = []
+        self.queues = []
+        self.consumers = []
+
+        if detector is not None:  # fail at startup, not in a worker, when no models were saved
+            detector.load_models(model_dir, self.feature_cols)
+
+    def add_callback(self, callback):
+        """Register callback(scored_windows_df), called for every processed batch."""
+        self.callbacks.append(callback)
+
+    # -------------------------------------------------
+    # Lifecycle
+    # -------------------------------------------------
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        """Start the worker processes and listen on host:port, or on the Unix socket unix_path."""
+        worker_args = (self.extractor, self.detector, self.model_dir, self.feature_cols, self.field_id,
+                       self.instrument_col)
+        for _ in range(self.n_workers):  # one single-process pool per shard: instrument state stays in one process
+            self.executors.append(ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=worker_args))
+            self.queues.append(asyncio.Queue(maxsize=self.queue_size))
+        # fork the workers now, before any client socket exists: a worker forked lazily on the first batch
+        # would inherit that connection's socket and keep it open after the server closes it
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(executor, _worker_ready) for executor in self.executors))
+        self.consumers = [asyncio.create_task(self._consume(shard)) for shard in range(self.n_workers)]
+
+        if unix_path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+        return self
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Stop listening, finish the queued batches and shut the workers down."""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for queue in self.queues:
+            await queue.put(None)
+        await asyncio.gather(*self.consumers)
+        for executor in self.executors:
+            executor.shutdown()
+
+    @property
+    def addresses(self):
+        return [sock.getsockname() for sock in self.server.sockets] if self.server else []
+
+    # -------------------------------------------------
+    # Connections
+    # -------------------------------------------------
+    async def _handle(self, reader, writer):
+        connection = _Connection()
+        self.stats["connections"] += 1
+        pending = b""
+        try:
+            while True:
+                # a partial batch waits at most batch_interval after its first tick arrived
+                timeout = (max(connection.first_arrival + self.batch_interval - time.perf_counter(), 0)
+                           if connection.n_buffered else None)
+                try:
+                    data = await asyncio.wait_for(reader.read(self.read_bytes), timeout)
+                except asyncio.TimeoutError:  # quiet feed: dispatch the partial batch
+                    await self._dispatch(connection)
+                    continue
+                if not data:
+                    break
+                data = pending + data
+                end = data.rfind(b"\n") + 1
+                pending = data[end:]
+                if end:
+                    self._add_lines(connection, data[:end].decode().splitlines(), time.perf_counter())
+                if connection.n_buffered >= self.batch_ticks or (
+                        connection.n_buffered and time.perf_counter() - connection.first_arrival >= self.batch_interval):
+                    await self._dispatch(connection)
+
+            if pending:  # last line without a newline
+                self._add_lines(connection, [pending.decode()], time.perf_counter())
+            await self._dispatch(connection)
+            await connection.wait_done()
+            writer.write((json.dumps(connection.summary()) + "\n").encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _add_lines(self, connection, lines, arrival):
+        if connection.date is None:  # logging date of the first tick line (blank or header lines are skipped)
+            for line in lines:
+                date = line.split('|', 1)[0].strip().replace('-', '')
+                if len(date) == 8 and date.isdigit() and next(self.processor.iter_ticks([line], self.field_id), None):
+                    connection.date = date
+                    break
+        ticks = list(self.processor.iter_ticks(lines, self.field_id))
+        self.stats["lines"] += len(lines)
+        connection.add(ticks, arrival)
+
+    async def _dispatch(self, connection):
+        """Split the connection's buffered ticks by worker and queue them (waits while a queue is full)."""
+        if not connection.n_buffered:
+            return
+        instruments, timestamps, values, arrivals = connection.take()
+        try:
+            timestamps = to_epoch_ns(timestamps, connection.date)
+        except ValueError as exc:  # e.g. no valid date: the batch is dropped and the connection reports why
+            connection.errors.append(f"{type(exc).__name__}: {exc}")
+            return
+        parsed = timestamps != NAT  # malformed timestamps are skipped, as the file parser skips them
+        if not parsed.all():
+            connection.errors.append(f"skipped {int((~parsed).sum())} ticks with unparsable timestamps")
+            instruments, timestamps, values, arrivals = (
+                instruments[parsed], timestamps[parsed], values[parsed], arrivals[parsed])
+        codes, uniques = pd.factorize(instruments, sort=False)
+        shards = np.array([zlib.crc32(str(inst).encode()) % self.n_workers for inst in uniques], dtype=np.int64)[codes]
+        for shard in np.unique(shards):
+            rows = np.flatnonzero(shards == shard)
+            queue = self.queues[shard]
+            if queue.full():
+                self.stats["backpressure_waits"] += 1
+            connection.pending += 1
+            await queue.put((connection, instruments[rows], timestamps[rows], values[rows], arrivals[rows]))
+        self.stats["ticks"] += len(instruments)
+
+    async def _consume(self, shard):
+        loop = asyncio.get_running_loop()
+        queue = self.queues[shard]
+        held = None
+        while True:
+            item = held if held is not None else await queue.get()
+            held = None
+            if item is None:
+                return
+            # batches that queued up while the worker was busy go in one call (fixed per-call costs such as
+            # scoring every instrument's model are paid once): the backlog shrinks instead of compounding
+            items = [item]
+            while not queue.empty():
+                queued = queue.get_nowait()
+                if queued is None or queued[0] is not item[0]:
+                    held = queued
+                    break
+                items.append(queued)
+            connection = item[0]
+            instruments, timestamps, values, arrivals = (np.concatenate(column) for column in zip(*(i[1:] for i in items)))
+            try:
+                scored = await loop.run_in_executor(self.executors[shard], _process_batch, instruments, timestamps, values)
+                latencies = time.perf_counter() - arrivals
+                self.latencies.extend(latencies)
+                n_anomalies = int((scored["anomaly"] == -1).sum()) if "anomaly" in scored else 0
+                self.stats["batches"] += 1
+                self.stats["windows"] += len(scored)
+                self.stats["anomalies"] += n_anomalies
+                connection.record(latencies, len(scored), n_anomalies)
+                if len(scored):
+                    for callback in self.callbacks:
+                        callback(scored)
+            except Exception as exc:  # keep serving other batches; the connection reports the error
+                connection.errors.append(f"{type(exc).__name__}: {exc}")
+            finally:
+                for _ in items:
+                    connection.batch_done()
+
+    def latency_stats(self):
+        """Tick latency (microseconds) from receipt to scored window, over the most recent ticks."""
+        return _latency_summary(np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies)))
+
+
+class _Connection:
+    """Per-connection tick buffer and counters."""
+
+    def __init__(self):
+        self.date = None
+        self.instruments, self.timestamps, self.values, self.arrivals = [], [], [], []
+        self.n_buffered = 0
+        self.first_arrival = None  # receipt time of the oldest buffered tick
+        self.n_ticks = self.n_windows = self.n_anomalies = 0
+        self.latencies = []
+        self.errors = []
+        self.pending = 0  # batches queued or running
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def add(self, ticks, arrival):
+        if not ticks:
+            return
+        instruments, timestamps, values = zip(*ticks)
+        if not self.n_buffered:
+            self.first_arrival = arrival
+        self.instruments.extend(instruments)
+        self.timestamps.extend(timestamps)
+        self.values.extend(values)
+        self.arrivals.append(np.full(len(ticks), arrival))
+        self.n_buffered += len(ticks)
+
+    def take(self):
+        """Buffered ticks as arrays (values NaN for text fields), emptying the buffer."""
+        taken = (np.asarray(self.instruments, dtype=object), self.timestamps,
+                 np.asarray(self.values, dtype=np.float64), np.concatenate(self.arrivals))
+        self.instruments, self.timestamps, self.values, self.arrivals = [], [], [], []
+        self.n_ticks += self.n_buffered
+        self.n_buffered = 0
+        self.idle.clear()
+        return taken
+
+    def record(self, latencies, n_windows, n_anomalies):
+        self.latencies.append(latencies)
+        self.n_windows += n_windows
+        self.n_anomalies += n_anomalies
+
+    def batch_done(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.idle.set()
+
+    async def wait_done(self):
+        if self.pending:
+            await self.idle.wait()
+
+    def summary(self):
+        latencies = np.concatenate(self.latencies) if self.latencies else np.empty(0)
+        return {"ticks": self.n_ticks, "windows": self.n_windows, "anomalies": self.n_anomalies,
+                "errors": self.errors, **_latency_summary(latencies)}
+
+
+def _latency_summary(latencies):
+    if not len(latencies):
+        return {"latency_samples": 0}
+    latencies_us = latencies * 1e6
+    return {
+        "latency_samples": len(latencies_us),
+        "mean_us": float(latencies_us.mean()),
+        "p50_us": float(np.percentile(latencies_us, 50)),
+        "p99_us": float(np.percentile(latencies_us, 99)),
+        "max_us": float(latencies_us.max()),
+    }
+
+
+# -------------------------------------------------
+# Worker processes
+# -------------------------------------------------
+_WORKER = {}
+
+
+def _init_worker(extractor, detector, model_dir, feature_cols, field_id, instrument_col):
+    """Per-process state: the extractor, loaded models and each routed instrument's carry-over ticks."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C stops the server, which then shuts workers down
+    if detector is not None:
+        detector.load_models(model_dir, feature_cols)
+    _WORKER.update(extractor=extractor, detector=detector, feature_cols=feature_cols, field_id=field_id,
+                   instrument_col=instrument_col, carry={})
+
+
+def _worker_ready():  # no-op task that makes each pool start its worker process
+    return True
+
+
+def _process_batch(instruments, timestamps, values):  # module level so it can be pickled to the pool
+    """
+    Append one batch to the carried ticks of its instruments and return the windows it closes, scored.
+    Ticks with NaN values are dropped and same-timestamp ticks keep the last value, as in the batch pipeline;
+    each instrument's ticks at its latest timestamp are carried until a later tick arrives.
+    """
+    extractor, detector = _WORKER["extractor"], _WORKER["detector"]
+    instrument_col, carry = _WORKER["instrument_col"], _WORKER["carry"]
+    numeric = ~np.isnan(values)
+    instruments, timestamps, values = instruments[numeric], timestamps[numeric], values[numeric]
+
+    codes, uniques = pd.factorize(instruments, sort=False)
+    parts = []
+    for code, inst in enumerate(uniques):  # carry first, then the new ticks, per instrument
+        rows = codes == code
+        carry_ts, carry_values = carry.get(inst, (np.empty(0, dtype=np.int64), np.empty(0)))
+        parts.append((inst, np.concatenate((carry_ts, timestamps[rows])), np.concatenate((carry_values, values[rows]))))
+    combined = pd.DataFrame({
+        instrument_col: np.repeat(np.asarray(uniques, dtype=object), [len(ts) for _, ts, _ in parts]),
+        "Timestamp": np.concatenate([ts for _, ts, _ in parts] or [np.empty(0, dtype=np.int64)]).astype("datetime64[ns]"),
+        "Value": np.concatenate([v for _, _, v in parts] or [np.empty(0)]),
+    })
+    # ticks at an instrument's latest timestamp wait for the next batch, where more ticks may share it
+    combined, held = hold_latest(combined, instrument_col)
+    combined = combined.drop_duplicates([instrument_col, "Timestamp"], keep="last")
+
+    features = extractor.compute_rolling_features(combined, instrument_col=instrument_col)
+    kept = pd.concat([carry_rows(extractor, combined, instrument_col), held], ignore_index=True)
+    for inst in uniques:  # instruments whose windows consumed every tick carry nothing
+        carry.pop(inst, None)
+    for inst, rows in kept.groupby(instrument_col, sort=False).groups.items():
+        carry[inst] = (kept.loc[rows, "Timestamp"].to_numpy().view(np.int64), kept.loc[rows, "Value"].to_numpy())
+
+    if features.empty:
+        return features
+    features["Field ID"] = _WORKER["field_id"]  # same layout as compute_field_features
+    if detector is None:
+        return features
+    # saved models score as they are; an online detector also folds every window into its state
+    return detector.detect_per_instrument(features, instrument_col=instrument_col, feature_cols=_WORKER["feature_cols"],
+                                          verbose=False, score_only=not getattr(detector, "online", False))
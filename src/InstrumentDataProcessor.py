@@ -1,7 +1,14 @@
 # InstrumentDataProcessor.py
 # import library modules
 import csv
-import datetime
+import os
+from array import array
+
+import numpy as np
+
+from src.CompactRecords import CompactRecords
+from src.timestamps import (NAT, _is_fixed_width, _parse_one, clock_to_ns, is_logging_date, ns_to_clock,
+                            parse_timestamp_ns, range_filter, to_epoch_ns)
 
 # processes and saves data to output CSV from files data.txt, DynamicField.txt and StaticFields.txt
 class InstrumentDataProcessor:
@@ -9,16 +16,18 @@ class InstrumentDataProcessor:
         self.data_file = data_file  # initialise class with file names
         self.static_fields_file = static_fields_file
         self.dynamic_fields_file = dynamic_fields_file
-        self.instrument_codes = []  # sets up empty lists/dictionaries to store relevant file data
+        self.instrument_codes = set()  # sets up empty sets/dictionaries to store relevant file data
         self.static_fields = {}
         self.dynamic_fields = {}
+        self.date_str = None  # logging date 'YYYYMMDD', set by the parse passes
+        self.stats = {"lines": 0, "records": 0}  # lines read / records parsed by the last iter_records/iter_compact pass
 
     def extract_instrument_codes(self):  # extracts list of instrument codes from data file (data.txt)
         with open(self.data_file, 'r') as file:
             for line in file:
                 fields = line.strip().split('|')
                 if len(fields) >= 4:
-                    self.instrument_codes.append(fields[3])  # stores codes in instrument_codes list
+                    self.instrument_codes.add(fields[3])  # stores codes in instrument_codes set (O(1) lookups)
 
     def extract_timestamps(self):  # extracts start/end timestamps from data file (data.txt)
         start_timestamp = None
@@ -38,6 +47,22 @@ class InstrumentDataProcessor:
                 return date_str.replace('-', '')
         return None
 
+    def extract_last_timestamp(self, block_size=4096):  # reads last record's timestamp by seeking from end of file
+        with open(self.data_file, 'rb') as file:
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            tail = b''
+            while position > 0:  # step backwards until the tail holds a complete non-empty last line
+                read_size = min(block_size, position)
+                position -= read_size
+                file.seek(position)
+                tail = file.read(read_size) + tail
+                lines = tail.rstrip(b'\r\n').split(b'\n')
+                if len(lines) > 1 or position == 0:
+                    last_line = lines[-1].decode()
+                    return last_line.split('|')[1] if '|' in last_line else None
+        return None
+
     def load_fields(self, filename, prefix):  # loads static/dynamic field data from StaticFields.txt/DynamicField.txt
         fields = {}
         with open(filename, 'r') as file:
@@ -51,6 +76,7 @@ class InstrumentDataProcessor:
 
     def parse_data_file(self, start_timestamp, end_timestamp):
         field_list = []
+        lexical_width, in_range = range_filter(start_timestamp, end_timestamp)  # chronological bounds check
         with open(self.data_file, 'r') as file:  # open data.txt file
             for line in file:
                 parts = line.strip().split('|')
@@ -62,7 +88,9 @@ class InstrumentDataProcessor:
                 field_type = parts[2]  # third item
                 fields_data = parts[7:]  # from 8th item (where fields 'f=' begin)
 
-                if instrument_code in self.instrument_codes and start_timestamp <= timestamp <= end_timestamp:
+                if instrument_code in self.instrument_codes and (
+                        start_timestamp <= timestamp <= end_timestamp
+                        if lexical_width is not None and _is_fixed_width(timestamp) else in_range(timestamp)):
                     for field in fields_data:  # from 8th item onwards, find ID after 'f' and value after '='
                         if field.startswith('f'):
                             field_parts = field[1:].split('=')
@@ -78,33 +106,312 @@ class InstrumentDataProcessor:
                                         (instrument_code, timestamp, field_id, self.dynamic_fields[field_id], value))
         return field_list
 
+    def iter_records(self):
+        """
+        Single-pass streaming parse of data.txt.
+        Finds the date, timestamp bounds and instrument set in the same pass that yields records,
+        so memory stays bounded whatever the file size (only the set of instrument codes is kept).
+        Requires static/dynamic fields to be loaded first.
+        """
+        self.instrument_codes = set()
+        self.date_str = None
+        self.stats = {"lines": 0, "records": 0}
+        end_timestamp = self.extract_last_timestamp()  # end bound read from file tail, no extra pass
+        in_range = None
+        with open(self.data_file, 'r') as file:
+            for line in file:
+                self.stats["lines"] += 1
+                parts = line.strip().split('|')
+                if in_range is None:  # first record gives logging date and start bound
+                    self.date_str = parts[0].replace('-', '')
+                    if len(parts) > 1:
+                        start_timestamp = parts[1]
+                        lexical_width, in_range = range_filter(start_timestamp, end_timestamp)
+                if len(parts) >= 4:
+                    self.instrument_codes.add(parts[3])
+                if len(parts) < 8:
+                    continue
+
+                timestamp = parts[1]
+                instrument_code = parts[3]
+                field_type = parts[2]
+                if lexical_width is not None and _is_fixed_width(timestamp):  # string order is chronological
+                    if not (start_timestamp <= timestamp <= end_timestamp):
+                        continue
+                elif not in_range(timestamp):  # other shapes compared as nanoseconds
+                    continue
+
+                lookup = self.static_fields if field_type == 'S' else self.dynamic_fields
+                for field in parts[7:]:
+                    if field.startswith('f'):
+                        field_parts = field[1:].split('=')
+                        if len(field_parts) == 2:
+                            field_id, value = field_parts
+                            description = lookup.get(field_id)
+                            if description is not None:
+                                self.stats["records"] += 1
+                                yield instrument_code, timestamp, field_id, description, value
+
+    def iter_compact(self, chunk_records=None, flush_records=65_536):
+        """
+        Single-pass parse (same rules as iter_records) into CompactRecords chunks of about chunk_records
+        records (one chunk for the whole file when None). Instruments and fields are integer-coded
+        against lookup tables shared by all chunks and values are parsed straight into float columns;
+        at most flush_records value strings are buffered before being packed into the chunk's raw text.
+        Requires static/dynamic fields to be loaded first.
+        """
+        self.instrument_codes = set()
+        self.date_str = None
+        self.stats = {"lines": 0, "records": 0}
+        instruments, instrument_ids = [], {}
+        field_ids = list(self.static_fields) + list(self.dynamic_fields)
+        descriptions = list(self.static_fields.values()) + list(self.dynamic_fields.values())
+        static_codes = {field_id: code for code, field_id in enumerate(self.static_fields)}
+        dynamic_codes = {field_id: code + len(static_codes) for code, field_id in enumerate(self.dynamic_fields)}
+        # instrument and HHMMSSmmm clock are buffered once per line and expanded to records on flush
+        line_instrument, line_clock, line_records, pending_raw = array('i'), array('q'), array('q'), []
+
+        def flush(chunk):
+            instrument, clock, counts = (np.frombuffer(column, dtype=column.typecode)
+                                         for column in (line_instrument, line_clock, line_records))
+            chunk.instrument.frombytes(np.repeat(instrument, counts).tobytes())
+            chunk.timestamp.frombytes(clock_to_ns(np.repeat(clock, counts)).tobytes())
+            chunk.extend_raw(pending_raw)
+            del instrument, clock, counts  # release the views so the buffers can be reset
+            del line_instrument[:], line_clock[:], line_records[:], pending_raw[:]
+
+        def new_chunk():
+            chunk = CompactRecords(instruments, field_ids, descriptions, self.date_str)
+            return chunk, chunk.field.append, chunk.value.append
+
+        records = None
+        end_timestamp = self.extract_last_timestamp()
+        in_range = None
+        add_raw = pending_raw.append
+        n_lines = 0
+        with open(self.data_file, 'r') as file:
+            for n_lines, line in enumerate(file, 1):
+                parts = line.strip().split('|')
+                if in_range is None:  # first record gives logging date and start bound
+                    self.date_str = parts[0].replace('-', '')
+                    records, add_field, add_value = new_chunk()
+                    if len(parts) > 1:
+                        start_timestamp = parts[1]
+                        lexical_width, in_range = range_filter(start_timestamp, end_timestamp)
+                if len(parts) >= 4:
+                    self.instrument_codes.add(parts[3])
+                if len(parts) < 8:
+                    continue
+
+                timestamp = parts[1]
+                fixed = _is_fixed_width(timestamp)
+                if fixed and lexical_width is not None:  # string order is chronological
+                    if not (start_timestamp <= timestamp <= end_timestamp):
+                        continue
+                elif not in_range(timestamp):  # other shapes compared as nanoseconds
+                    continue
+                if fixed:
+                    clock = int(timestamp.replace(':', ''))
+                else:
+                    timestamp_ns = _parse_one(timestamp)
+                    if timestamp_ns == NAT:  # unparsable (only reachable with non-fixed-width bounds): skip the line
+                        continue
+                    clock = ns_to_clock(timestamp_ns)
+
+                n_before = len(pending_raw)
+                codes = static_codes if parts[2] == 'S' else dynamic_codes
+                for field in parts[7:]:
+                    if field.startswith('f'):
+                        field_parts = field[1:].split('=')
+                        if len(field_parts) == 2:
+                            field_id, value = field_parts
+                            code = codes.get(field_id)
+                            if code is not None:
+                                try:
+                                    number = float(value)
+                                except ValueError:
+                                    number = float("nan")
+                                add_field(code)
+                                add_value(number)
+                                add_raw(value)
+
+                n_records = len(pending_raw) - n_before
+                if n_records:
+                    instrument = instrument_ids.get(parts[3])
+                    if instrument is None:
+                        instrument = instrument_ids[parts[3]] = len(instruments)
+                        instruments.append(parts[3])
+                    line_instrument.append(instrument)
+                    line_clock.append(clock)
+                    line_records.append(n_records)
+
+                    if len(pending_raw) >= flush_records:
+                        flush(records)
+                    if chunk_records is not None and len(records) >= chunk_records:
+                        flush(records)
+                        self.stats["lines"], self.stats["records"] = n_lines, self.stats["records"] + len(records)
+                        yield records
+                        records, add_field, add_value = new_chunk()
+
+        self.stats["lines"] = n_lines
+        if records is not None:
+            flush(records)
+            self.stats["records"] += len(records)
+            if len(records) or chunk_records is None:
+                yield records
+
+    def parse_compact(self):
+        """Whole-file parse into one CompactRecords (loads the field files). See iter_compact."""
+        self.static_fields = self.load_fields(self.static_fields_file, "S")
+        self.dynamic_fields = self.load_fields(self.dynamic_fields_file, "D")
+        records = next(self.iter_compact(), None)
+        return records if records is not None else CompactRecords([], [], [], self.date_str)
+
+    def iter_ticks(self, lines=None, field_id="2"):
+        """
+        Yield (instrument_code, timestamp, value) ticks for one dynamic field, line by line,
+        using the same line rules as parse_data_file. Lines default to data.txt; pass any
+        iterable of lines (e.g. a socket or tail reader) to stream live data.
+        Text values are yielded as NaN.
+        """
+        prefix = f"f{field_id}="
+        if lines is None:
+            with open(self.data_file, 'r') as file:
+                yield from self.iter_ticks(file, field_id)
+            return
+
+        for line in lines:
+            parts = line.strip().split('|')
+            if len(parts) < 8 or parts[2] == 'S':
+                continue
+            for field in parts[7:]:
+                if field.startswith(prefix):
+                    yield parts[3], parts[1], self.value_to_float(field[len(prefix):])
+                    break
+
     def save_to_csv(self, field_mappings, output_filename):  # prepare to save field_list as field_mappings to CSV
         with open(output_filename, mode='w', newline='') as file:
             writer = csv.writer(file)
             writer.writerow(["Instrument Code", "Timestamp", "Field ID", "Description", "Value"])
             writer.writerows(field_mappings)
 
-    def process(self):  # program's main process - to extract, parse, and save data
-        self.extract_instrument_codes()
-        start_timestamp, end_timestamp = self.extract_timestamps()  # extract timestamps
-        self.static_fields = self.load_fields(self.static_fields_file, "S")  # extract S ID matched field values (parse S prefix)
-        self.dynamic_fields = self.load_fields(self.dynamic_fields_file, "D")  # extract D ID matched field values (parse D prefix)
-        field_mappings = self.parse_data_file(start_timestamp, end_timestamp)  # assign returned field_list to field_mappings
+    def save_to_parquet(self, field_mappings, output_dir, batch_size=500_000):
+        """
+        Write records as a Parquet dataset partitioned by Date and Instrument Code (hive layout).
+        field_mappings yields record tuples or CompactRecords chunks (iter_compact).
+        Instrument codes, field IDs and descriptions are dictionary-encoded, timestamps are typed
+        and values are stored as float64, with the original string kept in 'Raw Value'.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+        except ImportError as exc:
+            raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from exc
+
+        date_str = self.date_str or self.extract_date()
+        if not is_logging_date(date_str):  # no usable date: timestamps stay nanoseconds since midnight
+            date_str = None
+
+        dictionary = pa.dictionary(pa.int32(), pa.string())
+        schema = pa.schema([
+            ("Date", pa.string()),
+            ("Instrument Code", dictionary),
+            ("Timestamp", pa.timestamp("ns")),
+            ("Field ID", dictionary),
+            ("Description", dictionary),
+            ("Value", pa.float64()),
+            ("Raw Value", pa.string()),
+        ])
+
+        def to_batch(rows):
+            instruments, timestamps, field_ids, descriptions, raw_values = zip(*rows)
+            return pa.record_batch([
+                pa.array([date_str or "00000000"] * len(rows), pa.string()),
+                pa.array(instruments, pa.string()).dictionary_encode(),
+                pa.array(to_epoch_ns(timestamps, date_str), pa.int64()).cast(pa.timestamp("ns")),  # one vectorised pass
+                pa.array(field_ids, pa.string()).dictionary_encode(),
+                pa.array(descriptions, pa.string()).dictionary_encode(),
+                pa.array([self.value_to_float(v) for v in raw_values], pa.float64()),
+                pa.array(raw_values, pa.string()),
+            ], schema=schema)
+
+        def batches():  # consume records lazily in fixed-size batches to keep memory bounded
+            rows = []
+            for record in field_mappings:
+                if isinstance(record, CompactRecords):  # iter_compact chunks convert column-wise
+                    if len(record):
+                        yield record.to_record_batch(schema)
+                    continue
+                rows.append(record)
+                if len(rows) >= batch_size:
+                    yield to_batch(rows)
+                    rows = []
+            if rows:
+                yield to_batch(rows)
+
+        partitioning = ds.partitioning(
+            pa.schema([("Date", pa.string()), ("Instrument Code", pa.string())]), flavor="hive")
+        ds.write_dataset(
+            batches(), output_dir, schema=schema, format="parquet", partitioning=partitioning,
+            existing_data_behavior="delete_matching", max_partitions=1 << 20)
+
+    @staticmethod
+    def timestamp_to_ns(timestamp):  # HH:MM:SS:MS -> nanoseconds since midnight
+        return parse_timestamp_ns(timestamp)
+
+    @staticmethod
+    def value_to_float(value):  # numeric field values as float, NaN for text fields
+        try:
+            return float(value)
+        except ValueError:
+            return float("nan")
+
+    def process(self, streaming=False, output_format="csv", output_dir=None):  # program's main process - to extract, parse, and save data
+        if output_format == "parquet":
+            return self.process_parquet(output_dir)
+        if streaming:
+            return self.process_streaming(output_dir)
+
+        records = self.parse_compact()  # typed columns + lookup tables instead of one tuple of strings per field
 
         date_str = self.extract_date()
         if date_str:
             output_filename = f"output_{date_str}.csv"  # generate filename using date from 1st data.txt record
         else:
             output_filename = "output.csv"  # in case date missing from first row of data.txt
+        output_filename = os.path.join(output_dir or "", output_filename)  # output_dir=None keeps the working directory
+
+        self.save_to_csv(records.iter_rows(), output_filename)  # rows rebuilt batch by batch while writing
+        print(f"Output saved to {output_filename}")
+        return output_filename
+
+    def process_streaming(self, output_dir=None):  # single pass over data.txt, records written to CSV as they are parsed
+        self.static_fields = self.load_fields(self.static_fields_file, "S")
+        self.dynamic_fields = self.load_fields(self.dynamic_fields_file, "D")
 
-        self.save_to_csv(field_mappings, output_filename)  # save field_list (now field_mappings) to CSV file
+        date_str = self.extract_date()  # reads first line only
+        output_filename = os.path.join(output_dir or "", f"output_{date_str}.csv" if date_str else "output.csv")
+
+        self.save_to_csv(self.iter_records(), output_filename)  # csv writer consumes the generator lazily
         print(f"Output saved to {output_filename}")
         return output_filename
 
+    def process_parquet(self, output_dir=None):  # single streaming pass written to a partitioned Parquet dataset
+        self.static_fields = self.load_fields(self.static_fields_file, "S")
+        self.dynamic_fields = self.load_fields(self.dynamic_fields_file, "D")
+
+        self.date_str = self.extract_date()
+        output_dir = os.path.join(output_dir or "", f"output_{self.date_str}" if self.date_str else "output")
+
+        self.save_to_parquet(self.iter_compact(chunk_records=500_000), output_dir)
+        print(f"Output saved to {output_dir}/")
+        return output_dir
+
 
 class InstrumentDataSearcher:
-    def __init__(self, csv_filename):
+    def __init__(self, csv_filename, tick_store=None):
         self.csv_filename = csv_filename
+        self.tick_store = tick_store  # optional TickStore: indexed O(log n) lookups instead of rescanning the CSV
 
     def search_instrument_code(self):  # search instrument codes and display corresponding values from output CSV
         while True:
@@ -113,6 +420,10 @@ class InstrumentDataSearcher:
                 print("Exiting the search.")
                 break
 
+            if self.tick_store is not None:
+                self.print_from_store(instrument_code)
+                continue
+
             found = False
             with open(self.csv_filename, 'r') as csvfile:
                 reader = csv.DictReader(csvfile)
@@ -127,6 +438,15 @@ class InstrumentDataSearcher:
             if not found:
                 print(f"Instrument Code: {instrument_code} not found in {self.csv_filename}.")
 
+    def print_from_store(self, instrument_code):  # same output as the CSV scan, read from the memory-mapped store
+        records = self.tick_store.instrument_slice(instrument_code)
+        if len(records) == 0:
+            print(f"Instrument Code: {instrument_code} not found in {self.tick_store.store_dir}.")
+            return
+        print(f"Instrument Code: {instrument_code} found. Here are the details:")
+        for row in self.tick_store.to_frame(records).itertuples(index=False):
+            print(f"{row.Timestamp} - {row.Description}: {row.Value}")
+
 
 if __name__ == "__main__":  # create instance of InstrumentDataProcessor
     data_processor = InstrumentDataProcessor("data.txt", "StaticFields.txt", "DynamicFields.txt")
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+
+import joblib
+
+
+class ModelRegistry:
+    def __init__(self, registry_dir="models"):
+        """
+        On-disk store of per-instrument (scaler, IsolationForest) pairs.
+
+        Layout: <registry_dir>/<version>/manifest.json + one uncompressed joblib file per instrument,
+        so arrays can be memory-mapped on load. The version is a hash of the feature columns and
+        model hyperparameters, so models trained on different features never get mixed up.
+
+        :param registry_dir: Root directory of the registry
+        """
+        self.registry_dir = registry_dir
+
+    @staticmethod
+    def version_key(feature_cols, params, normalize_features):
+        payload = json.dumps(
+            {"feature_cols": list(feature_cols), "params": params, "normalize_features": normalize_features},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+    def version_dir(self, feature_cols, params, normalize_features):
+        return os.path.join(self.registry_dir, self.version_key(feature_cols, params, normalize_features))
+
+    def save(self, models, feature_cols, params, normalize_features):
+        """Write every (scaler, model) pair in `models` and the manifest. Returns the version directory."""
+        version_dir = self.version_dir(feature_cols, params, normalize_features)
+        os.makedirs(version_dir, exist_ok=True)
+
+        files = {}
+        for i, (inst, pair) in enumerate(models.items()):
+            filename = f"model_{i:06d}.joblib"
+            joblib.dump(pair, os.path.join(version_dir, filename))  # uncompressed -> mmap-able
+            files[str(inst)] = filename
+
+        manifest = {
+            "feature_cols": list(feature_cols),
+            "params": params,
+            "normalize_features": normalize_features,
+            "models": files,
+        }
+        with open(os.path.join(version_dir, "manifest.json"), "w") as file:
+            json.dump(manifest, file, indent=2, default=str)
+        return version_dir
+
+    def add(self, models, feature_cols, params, normalize_features):
+        """
+        Write only the pairs in `models` into an existing version (created if missing), keeping the
+        other instruments' files; an instrument already saved is overwritten. Returns the version directory.
+        """
+        version_dir = self.version_dir(feature_cols, params, normalize_features)
+        manifest_path = os.path.join(version_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return self.save(models, feature_cols, params, normalize_features)
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+
+        files = manifest["models"]
+        for inst, pair in models.items():
+            filename = files.get(str(inst)) or f"model_{len(files):06d}.joblib"
+            joblib.dump(pair, os.path.join(version_dir, filename))
+            files[str(inst)] = filename
+
+        tmp_path = manifest_path + ".tmp"  # readers never see a manifest naming a missing file
+        with open(tmp_path, "w") as file:
+            json.dump(manifest, file, indent=2, default=str)
+        os.replace(tmp_path, manifest_path)
+        return version_dir
+
+    def load(self, feature_cols, params, normalize_features, mmap_mode="r"):
+        """
+        Return a lazy {instrument: (scaler, model)} mapping; each pair is read from disk on first access.
+        Raises FileNotFoundError when no models were saved for these features/hyperparameters.
+        """
+        version_dir = self.version_dir(feature_cols, params, normalize_features)
+        manifest_path = os.path.join(version_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(
+                f"No saved models in {self.registry_dir} for feature columns {list(feature_cols)} "
+                f"and these hyperparameters (expected {manifest_path})"
+            )
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        return LazyModels(version_dir, manifest["models"], mmap_mode)
+
+
+class LazyModels(Mapping):
+    """Read-only instrument -> (scaler, model) mapping that loads (and caches) each entry on first access."""
+
+    def __init__(self, version_dir, files, mmap_mode="r"):
+        self.version_dir = version_dir
+        self.files = files
+        self.mmap_mode = mmap_mode
+        self._loaded = {}
+
+    def __getitem__(self, instrument):
+        key = str(instrument)
+        if key not in self._loaded:
+            if key not in self.files:
+                raise KeyError(instrument)
+            path = os.path.join(self.version_dir, self.files[key])
+            self._loaded[key] = joblib.load(path, mmap_mode=self.mmap_mode)
+        return self._loaded[key]
+
+    def __contains__(self, instrument):
+        return str(instrument) in self.files
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
@@ -0,0 +1,200 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.ModelRegistry import ModelRegistry
+
+MAD_TO_SIGMA = np.sqrt(np.pi / 2)  # mean absolute deviation -> standard deviation for normal data
+
+
+class OnlineAnomalyDetector:
+    online = True  # detect_per_instrument keeps learning from every batch (IngestionServer scores and updates)
+
+    def __init__(self, alpha=0.05, z_threshold=4.0, warmup=20, clip=3.0):
+        """
+        Streaming per-instrument detector: robust running z-scores of the window features.
+
+        Each instrument keeps, per feature, an exponentially weighted mean and mean absolute deviation
+        (scaled to a standard deviation). A window is scored against the state *before* it is folded
+        in, so updating costs O(1) per window and nothing is ever refitted. Deviations are clipped to
+        clip scales before updating, so a burst of outliers does not drag the baseline along.
+
+        Output matches AnomalyDetector: anomaly_score = z_threshold - max |z| over the features
+        (negative = anomalous) and anomaly = -1 when it is negative, 1 otherwise. The first `warmup`
+        windows of an instrument only build its state and are never flagged.
+
+        :param alpha: EWMA weight of a new window (the first windows use 1/n, a plain running average)
+        :param z_threshold: Robust z-score above which a window is anomalous
+        :param warmup: Windows per instrument before anything can be flagged
+        :param clip: Deviations are clipped to +-clip scales when updating the state (after warmup)
+        """
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.clip = clip
+        self.feature_cols = None
+        self.instruments = {}  # instrument -> row of the state arrays
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros((0, 0))
+        self.scale = np.zeros((0, 0))
+
+    def get_params(self):
+        return {"alpha": self.alpha, "z_threshold": self.z_threshold, "warmup": self.warmup, "clip": self.clip}
+
+    # -------------------------------------------------
+    # Scoring
+    # -------------------------------------------------
+    def detect_per_instrument(self, feature_df, instrument_col="Instrument Code", feature_cols=None, verbose=True,
+                              score_only=False):
+        """
+        Drop-in for AnomalyDetector.detect_per_instrument: rows grouped per instrument (first-appearance
+        order, time order within) with anomaly / anomaly_score columns. Each instrument's windows are
+        scored in order and folded into its state, so calling it again with the next batch continues
+        the stream. With score_only=True the state is left unchanged.
+        """
+        scored = self.score(feature_df, instrument_col, feature_cols, update=not score_only)
+        codes, _ = pd.factorize(scored[instrument_col], sort=False)
+        valid = codes >= 0
+        result_df = scored.iloc[np.flatnonzero(valid)[np.argsort(codes[valid], kind="stable")]].reset_index(drop=True)
+        if verbose:
+            for inst, inst_df in result_df.groupby(instrument_col, sort=False):
+                print(f"Instrument {inst}: {(inst_df['anomaly'] == -1).sum()} anomalies out of {len(inst_df)} rows")
+        return result_df
+
+    def score(self, feature_df, instrument_col="Instrument Code", feature_cols=None, update=True):
+        """
+        Score windows in their row order (rows of one instrument must be in time order) and, with
+        update=True, fold them into the state. Instruments are stepped in lockstep: the k-th window of
+        every instrument is handled by one vectorised update, so the Python loop runs once per window
+        of the longest instrument, not once per row.
+        """
+        feature_cols = self._resolve_feature_cols(feature_df, feature_cols)
+        df_copy = feature_df.copy()
+        codes, uniques = pd.factorize(df_copy[instrument_col], sort=False)
+        anomaly = np.ones(len(df_copy), dtype=np.int64)
+        scores = np.full(len(df_copy), np.nan)
+
+        valid = np.flatnonzero(codes >= 0)
+        if len(valid):
+            slots = self._slots(uniques)
+            X = df_copy[feature_cols].to_numpy(dtype=np.float64)
+            # rank of each row within its instrument, then rows ordered by (rank, instrument)
+            order = valid[np.argsort(codes[valid], kind="stable")]
+            lengths = np.bincount(codes[order], minlength=len(uniques))
+            starts = np.cumsum(lengths) - lengths
+            rank = np.empty(len(df_copy), dtype=np.int64)
+            rank[order] = np.arange(len(order)) - starts[codes[order]]
+            by_rank = valid[np.lexsort((codes[valid], rank[valid]))]
+            bounds = np.concatenate(([0], np.cumsum(np.bincount(rank[valid]))))
+
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                rows = by_rank[first:last]
+                anomaly[rows], scores[rows] = self._step(slots[codes[rows]], X[rows], update)
+
+        df_copy["anomaly"] = anomaly
+        df_copy["anomaly_score"] = scores
+        return df_copy
+
+    def push(self, instrument, record, update=True):
+        """
+        Score one window record (e.g. from StreamingFFTExtractor.push) in O(1) and fold it into the
+        instrument's state. Returns the record with anomaly / anomaly_score added.
+        """
+        if self.feature_cols is None:
+            raise ValueError("push() needs feature columns: call score()/detect_per_instrument() or load_models() first")
+        x = np.array([[record.get(col, np.nan) for col in self.feature_cols]], dtype=np.float64)
+        anomaly, score = self._step(self._slots([instrument]), x, update)
+        return {**record, "anomaly": int(anomaly[0]), "anomaly_score": float(score[0])}
+
+    def get_anomalies(self, feature_df):
+        """Return only rows flagged as anomalies"""
+        return feature_df[feature_df["anomaly"] == -1]
+
+    def _step(self, slots, X, update):
+        """Score one window for each slot (distinct instruments) against its state, then update it."""
+        count, mean, scale = self.count[slots], self.mean[slots], self.scale[slots]
+        present = ~np.isnan(X)
+        deviation = np.where(present, X - mean, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tiny = 1e-12 * (np.abs(mean) + 1.0)  # constant features: any change counts as a large deviation
+            z = np.abs(deviation) / np.maximum(scale, tiny)
+        z[~present | (count[:, None] == 0)] = 0.0
+        scores = self.z_threshold - z.max(axis=1, initial=0.0)
+        anomaly = np.where((count >= self.warmup) & (scores < 0), -1, 1)
+
+        if update:
+            warm = (count[:, None] >= self.warmup) & (scale > 0)
+            clipped = np.where(warm, np.clip(deviation, -self.clip * scale, self.clip * scale), deviation)
+            weight = np.maximum(self.alpha, 1.0 / (count + 1))[:, None]
+            weight = np.where(present, weight, 0.0)  # missing feature values leave the state alone
+            self.mean[slots] = mean + weight * clipped
+            # deviation from the pre-update mean; the first window leaves the scale at 0
+            self.scale[slots] = np.where(count[:, None] == 0, 0.0,
+                                         (1 - weight) * scale + weight * MAD_TO_SIGMA * np.abs(clipped))
+            self.count[slots] = count + 1
+        return anomaly, scores
+
+    def _slots(self, instruments):
+        """State rows for these instruments, growing the arrays for new ones."""
+        slots = np.empty(len(instruments), dtype=np.int64)
+        for i, inst in enumerate(instruments):
+            slot = self.instruments.get(inst)
+            if slot is None:
+                slot = self.instruments[inst] = len(self.instruments)
+            slots[i] = slot
+        n, n_features = len(self.instruments), len(self.feature_cols)
+        if len(self.count) < n:
+            grow = max(n, 2 * len(self.count)) - len(self.count)
+            self.count = np.concatenate((self.count, np.zeros(grow, dtype=np.int64)))
+            self.mean = np.vstack((self.mean.reshape(-1, n_features), np.zeros((grow, n_features))))
+            self.scale = np.vstack((self.scale.reshape(-1, n_features), np.zeros((grow, n_features))))
+        return slots
+
+    def _resolve_feature_cols(self, feature_df, feature_cols):
+        if feature_cols is None:
+            feature_cols = self.feature_cols
+        if feature_cols is None:
+            # Use all numeric columns except instrument/timestamp identifiers
+            feature_cols = feature_df.select_dtypes(include=np.number).columns.tolist()
+            feature_cols = [c for c in feature_cols if c not in ["window_start", "window_end", "anomaly", "anomaly_score"]]
+        feature_cols = list(feature_cols)
+        if self.feature_cols is not None and feature_cols != self.feature_cols and self.instruments:
+            raise ValueError(f"State was built on feature columns {self.feature_cols}, got {feature_cols}")
+        self.feature_cols = feature_cols
+        return feature_cols
+
+    # -------------------------------------------------
+    # Persistence
+    # -------------------------------------------------
+    def save_models(self, registry_dir, feature_cols):
+        """Persist the per-instrument state next to the ModelRegistry versions. Returns the file path."""
+        os.makedirs(registry_dir, exist_ok=True)
+        path = self._state_path(registry_dir, feature_cols)
+        n = len(self.instruments)
+        tmp_path = path + ".tmp"
+        joblib.dump({"instruments": list(self.instruments), "feature_cols": list(feature_cols),
+                     "count": self.count[:n], "mean": self.mean[:n], "scale": self.scale[:n]}, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_models(self, registry_dir, feature_cols, mmap_mode=None):
+        """
+        Restore the state saved for these feature columns and parameters. Unlike AnomalyDetector, a
+        missing state is not an error: the detector starts empty and learns from the stream.
+        """
+        path = self._state_path(registry_dir, feature_cols)
+        self.feature_cols = list(feature_cols)
+        self.instruments = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = self.scale = np.zeros((0, len(self.feature_cols)))
+        if os.path.exists(path):
+            state = joblib.load(path)
+            self.instruments = {inst: i for i, inst in enumerate(state["instruments"])}
+            self.count, self.mean, self.scale = state["count"].copy(), state["mean"].copy(), state["scale"].copy()
+        return self.instruments
+
+    def _state_path(self, registry_dir, feature_cols):
+        version = ModelRegistry.version_key(feature_cols, self.get_params(), normalize_features=False)
+        return os.path.join(registry_dir, f"online-{version}.joblib")
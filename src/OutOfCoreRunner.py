@@ -0,0 +1,269 @@
+import itertools
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from src.pipeline import peak_rss_mb
+from src.timestamps import sort_key
+
+WORKING_COPIES = 4  # rough in-memory copies per chunk row (carry concat, sort permutation, numeric arrays, features)
+
+
+class OutOfCoreRunner:
+    def __init__(self, extractor, detector=None, output_dir="ooc_output", memory_budget_mb=512, field_id="2",
+                 instrument_col="Instrument Code", timestamp_col="Timestamp", value_col="Value",
+                 field_col="Field ID", description_col="Description", dynamic_fields=None):
+        """
+        Feature extraction + anomaly detection over processed data larger than RAM.
+
+        Features: the processed CSV / Parquet dataset is read in row chunks sized from memory_budget_mb.
+        Each instrument carries its rows from the next unemitted window start into the next chunk, so
+        windows spanning chunk borders are computed exactly once and stay aligned to step_size; the
+        windows of every chunk are appended to a Parquet dataset partitioned by instrument. Ticks sharing
+        an instrument and timestamp keep the last value (as FieldPivot does); each instrument's rows at its
+        latest timestamp are held back to the next chunk so such duplicates are never split across chunks.
+        Detection: instruments are read back in groups that fit the budget (each instrument whole, so
+        it is fitted on the same windows as in memory) and scored rows are appended the same way.
+
+        Rows of one instrument must arrive in time order across chunks (as InstrumentDataProcessor writes them).
+
+        :param extractor: FFTFeatureExtractor (no resample_interval: buckets would be split at chunk borders)
+        :param detector: AnomalyDetector for run()/detect(); None to extract features only
+        :param output_dir: Receives features/ and anomalies/ datasets (replaced on each run)
+        :param memory_budget_mb: Target peak working memory for one chunk / instrument group
+        :param field_id: Field ID analysed (e.g. "2" = Last price)
+        :param dynamic_fields: Optional {field_id: description} (InstrumentDataProcessor.dynamic_fields); when
+                               given, only D-field rows are kept, as FieldPivot does
+        """
+        if getattr(extractor, "resample_interval", None) is not None:
+            raise ValueError("OutOfCoreRunner does not support resample_interval: buckets would be split at chunk borders")
+        self.extractor = extractor
+        self.detector = detector
+        self.output_dir = output_dir
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 ** 2)
+        self.field_id = str(field_id)
+        self.instrument_col = instrument_col
+        self.timestamp_col = timestamp_col
+        self.value_col = value_col
+        self.field_col = field_col
+        self.description_col = description_col
+        self.description = None if dynamic_fields is None else dynamic_fields.get(self.field_id)
+        self.features_dir = os.path.join(output_dir, "features")
+        self.anomalies_dir = os.path.join(output_dir, "anomalies")
+        self.window_counts = {}  # instrument -> windows written, used to size detection groups
+        self.stats = {}
+
+    # -------------------------------------------------
+    # Public API
+    # -------------------------------------------------
+    def run(self, source, feature_cols=None, score_only=False, verbose=False):
+        """Extract features from `source` chunk by chunk, then detect anomalies per instrument group."""
+        self.extract_features(source)
+        if self.detector is not None:
+            self.detect(feature_cols=feature_cols, score_only=score_only, verbose=verbose)
+        return self.stats
+
+    def extract_features(self, source):
+        """Append rolling features of every chunk of `source` to output_dir/features. Returns the dataset path."""
+        shutil.rmtree(self.features_dir, ignore_errors=True)
+        self.window_counts = {}
+        rows_per_chunk = self.rows_per_chunk(source)
+        n_chunks = n_rows = n_windows = 0
+        carry = held = None
+
+        for chunk in itertools.chain(self.iter_chunks(source, rows_per_chunk), [None]):
+            if chunk is None:  # end of input: the held rows are final
+                if held is None or held.empty:
+                    break
+                chunk, held = held, None
+            else:
+                n_rows += len(chunk)
+                if held is not None:
+                    chunk = pd.concat([held, chunk], ignore_index=True)
+                chunk, held = self._hold_latest(chunk)
+            combined = chunk if carry is None else pd.concat([carry, chunk], ignore_index=True)
+            # same-timestamp ticks of an instrument keep the last value, as FieldPivot does
+            combined = combined.drop_duplicates([self.instrument_col, self.timestamp_col], keep="last")
+            features = self.extractor.compute_rolling_features(
+                combined, value_col=self.value_col, instrument_col=self.instrument_col,
+                timestamp_col=self.timestamp_col)
+            carry = self._carry_rows(combined)
+
+            if not features.empty:
+                features[self.field_col] = self.field_id  # same layout as compute_field_features
+                _append_partitioned(features, self.features_dir, self.instrument_col, n_chunks)
+                for inst, count in features[self.instrument_col].value_counts(sort=False).items():
+                    self.window_counts[inst] = self.window_counts.get(inst, 0) + int(count)
+                n_windows += len(features)
+            n_chunks += 1
+
+        self.stats.update({"features_dir": self.features_dir, "chunks": n_chunks, "rows_per_chunk": rows_per_chunk,
+                           "rows": n_rows, "windows": n_windows, "peak_rss_mb": round(peak_rss_mb(), 2)})
+        return self.features_dir
+
+    def detect(self, feature_cols=None, score_only=False, verbose=False):
+        """Score output_dir/features in budget-sized instrument groups into output_dir/anomalies. Returns its path."""
+        if self.detector is None:
+            raise ValueError("detect() requires a detector")
+        shutil.rmtree(self.anomalies_dir, ignore_errors=True)
+        n_groups = 0
+
+        for _, df in self.iter_groups("features"):
+            if df.empty:
+                continue
+            cols = feature_cols or [c for c in df.select_dtypes(include=np.number).columns
+                                    if c not in ["window_start", "window_end"]]
+            scored = self.detector.detect_per_instrument(
+                df, instrument_col=self.instrument_col, feature_cols=cols, verbose=verbose, score_only=score_only)
+            _append_partitioned(scored, self.anomalies_dir, self.instrument_col, n_groups)
+            n_groups += 1
+
+        self.stats.update({"anomalies_dir": self.anomalies_dir, "detect_groups": n_groups,
+                           "peak_rss_mb": round(peak_rss_mb(), 2)})
+        return self.anomalies_dir
+
+    def load(self, kind="anomalies", instruments=None):
+        """
+        Read back "features" or "anomalies" (optionally only some instruments) with the original column
+        order, plain string instrument codes and each instrument's windows in time order.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+
+        path = self.features_dir if kind == "features" else self.anomalies_dir
+        if not os.path.isdir(path):
+            return pd.DataFrame()
+        dataset = ds.dataset(path, format="parquet", partitioning="hive")
+        file_columns = [name for name in dataset.schema.names if name != self.instrument_col]
+        instrument_filter = None if instruments is None else pc.field(self.instrument_col).isin(list(instruments))
+        df = dataset.to_table(filter=instrument_filter).to_pandas()
+        df[self.instrument_col] = df[self.instrument_col].astype(str).astype(object)
+
+        # partition column is read back last: restore the written layout (instrument after the spectral columns)
+        columns = list(file_columns)
+        columns.insert(file_columns.index("window_start"), self.instrument_col)
+        inst_codes, _ = pd.factorize(df[self.instrument_col], sort=False)
+        order = np.lexsort((sort_key(df["window_end"]), inst_codes))
+        return df.iloc[order][columns].reset_index(drop=True)
+
+    def iter_groups(self, kind="anomalies", instruments=None):
+        """
+        Yield (instruments, frame) for "features" or "anomalies" in budget-sized groups of whole
+        instruments, so downstream stages (CSV export, dashboard totals, charts) stay within the budget.
+
+        :param instruments: Instruments to read, in this order (default: all, in written order)
+        """
+        for group in self._instrument_groups(instruments):
+            yield group, self.load(kind, instruments=group)
+
+    # -------------------------------------------------
+    # Chunking
+    # -------------------------------------------------
+    def rows_per_chunk(self, source, sample_rows=10_000):
+        """Rows per chunk so that a chunk's working copies fit the memory budget (measured on a sample)."""
+        sample = next(self.iter_chunks(source, sample_rows), None)
+        if sample is None or sample.empty:
+            return sample_rows
+        bytes_per_row = sample.memory_usage(deep=True).sum() / len(sample) * WORKING_COPIES
+        return max(int(self.memory_budget_bytes // bytes_per_row), self.extractor.window_size)
+
+    def iter_chunks(self, source, rows_per_chunk):
+        """Yield [instrument, timestamp, value] frames of the selected field with numeric values, ~rows_per_chunk rows each."""
+        columns = [self.instrument_col, self.timestamp_col, self.value_col]
+        if os.path.isdir(source):  # Parquet dataset from InstrumentDataProcessor(output_format="parquet")
+            import pyarrow.compute as pc
+            import pyarrow.dataset as ds
+
+            dataset = ds.dataset(source, format="parquet", partitioning="hive")
+            row_filter = pc.field(self.field_col) == self.field_id
+            if self.description is not None:
+                row_filter &= pc.field(self.description_col) == self.description
+            batches, n_buffered = [], 0
+            for batch in dataset.to_batches(columns=columns, filter=row_filter, batch_size=rows_per_chunk):
+                batches.append(batch.to_pandas())
+                n_buffered += batch.num_rows
+                if n_buffered >= rows_per_chunk:
+                    yield self._clean(pd.concat(batches, ignore_index=True))
+                    batches, n_buffered = [], 0
+            if batches:
+                yield self._clean(pd.concat(batches, ignore_index=True))
+            return
+
+        filter_cols = [self.field_col] + ([self.description_col] if self.description is not None else [])
+        reader = pd.read_csv(source, usecols=columns + filter_cols, chunksize=rows_per_chunk, dtype=str)
+        for chunk in reader:
+            mask = chunk[self.field_col] == self.field_id
+            if self.description is not None:
+                mask &= chunk[self.description_col] == self.description
+            yield self._clean(chunk.loc[mask, columns])
+
+    def _clean(self, chunk):
+        chunk = chunk.copy()
+        chunk[self.instrument_col] = chunk[self.instrument_col].astype(object)
+        chunk[self.value_col] = pd.to_numeric(chunk[self.value_col], errors="coerce")
+        return chunk.dropna(subset=[self.value_col]).reset_index(drop=True)
+
+    def _hold_latest(self, chunk):
+        return hold_latest(chunk, self.instrument_col, self.timestamp_col)
+
+    def _carry_rows(self, combined):
+        return carry_rows(self.extractor, combined, self.instrument_col, self.timestamp_col)
+
+    def _instrument_groups(self, instruments=None):
+        """Whole instruments, batched so each group's feature rows fit the memory budget."""
+        if not self.window_counts:
+            features = self.load("features")
+            self.window_counts = features[self.instrument_col].value_counts(sort=False).to_dict() if len(features) else {}
+        sample = self.load("features", instruments=list(self.window_counts)[:1])
+        bytes_per_row = (sample.memory_usage(deep=True).sum() / max(len(sample), 1)) * WORKING_COPIES
+        max_rows = max(int(self.memory_budget_bytes // max(bytes_per_row, 1)), 1)
+
+        group, n_rows = [], 0
+        for inst in (self.window_counts if instruments is None else instruments):
+            count = self.window_counts.get(inst, 0)
+            if group and n_rows + count > max_rows:
+                yield group
+                group, n_rows = [], 0
+            group.append(inst)
+            n_rows += count
+        if group:
+            yield group
+
+
+def hold_latest(combined, instrument_col="Instrument Code", timestamp_col="Timestamp"):
+    """
+    Split off each instrument's rows at its latest timestamp: ticks sharing that timestamp may continue
+    in the next rows (chunk, refresh or batch), and must be de-duplicated together before any window
+    uses them. Returns (rows that can be windowed now, held rows to prepend to the next rows).
+    """
+    keys = sort_key(combined[timestamp_col])
+    latest = pd.Series(keys).groupby(combined[instrument_col].to_numpy()).transform("max").to_numpy()
+    is_latest = keys == latest
+    return combined[~is_latest].reset_index(drop=True), combined[is_latest].reset_index(drop=True)
+
+
+def carry_rows(extractor, combined, instrument_col="Instrument Code", timestamp_col="Timestamp"):
+    """
+    Rows from each instrument's next unemitted window start on (< window_size + step_size rows each):
+    prepended to the next rows of the same instruments, they yield exactly the windows not emitted yet.
+    """
+    order, sorted_codes, _, group_starts, group_lengths = extractor._sorted_groups(
+        combined, instrument_col, timestamp_col)
+    next_start = extractor._window_counts(group_lengths) * extractor.step_size
+    position = np.arange(len(order)) - group_starts[sorted_codes]
+    return combined.iloc[order[position >= next_start[sorted_codes]]].reset_index(drop=True)
+
+
+def _append_partitioned(df, dataset_dir, instrument_col, part):
+    """Append df to a Parquet dataset partitioned by instrument (one file per instrument per call)."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    table = pa.Table.from_pandas(df.astype({instrument_col: str}), preserve_index=False)
+    ds.write_dataset(
+        table, dataset_dir, format="parquet",
+        partitioning=ds.partitioning(pa.schema([(instrument_col, pa.string())]), flavor="hive"),
+        basename_template=f"part-{part:06d}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore", max_partitions=1 << 20)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import time
+
+from src.timestamps import parse_timestamp_ns
+
+
+class ReplayClient:
+    def __init__(self, data_file, speed=None, lines_per_write=512, max_lines=None):
+        """
+        Stream a data.txt-format file to an IngestionServer for load tests.
+
+        Lines are paced by their own timestamps: speed=1 replays in real time, speed=10 ten times
+        faster, speed=None as fast as the server accepts them. Writes wait for the socket to drain,
+        so server backpressure shows up as lag behind the replay schedule.
+
+        :param data_file: Tick file to replay
+        :param speed: Replay speed relative to the recorded timestamps (None = unthrottled)
+        :param lines_per_write: Maximum lines sent per socket write
+        :param max_lines: Stop after this many lines (None = whole file)
+        """
+        self.data_file = data_file
+        self.speed = speed
+        self.lines_per_write = lines_per_write
+        self.max_lines = max_lines
+        self.stats = {}
+
+    async def run(self, host="127.0.0.1", port=8765, unix_path=None):
+        """Replay the file, wait for the server's per-connection statistics and return the combined stats."""
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+
+        started = time.perf_counter()
+        n_lines = n_bytes = 0
+        max_lag = 0.0
+        first_ns = None
+        batch = []
+        with open(self.data_file, 'r') as file:
+            for line in file:
+                if self.max_lines is not None and n_lines >= self.max_lines:
+                    break
+                if self.speed:
+                    timestamp_ns = _line_timestamp_ns(line)
+                    if timestamp_ns is not None:
+                        first_ns = timestamp_ns if first_ns is None else first_ns
+                        due = started + (timestamp_ns - first_ns) / 1e9 / self.speed
+                        now = time.perf_counter()
+                        if due > now:  # send what is due, then wait for this line's time
+                            n_bytes += await _send(writer, batch)
+                            batch = []
+                            await asyncio.sleep(due - time.perf_counter())
+                        else:
+                            max_lag = max(max_lag, now - due)
+                batch.append(line if line.endswith('\n') else line + '\n')
+                n_lines += 1
+                if len(batch) >= self.lines_per_write:
+                    n_bytes += await _send(writer, batch)
+                    batch = []
+        n_bytes += await _send(writer, batch)
+        sent = time.perf_counter()
+
+        writer.write_eof()  # server answers with its statistics once every tick is scored
+        reply = await reader.readline()
+        finished = time.perf_counter()
+        writer.close()
+        await writer.wait_closed()
+
+        server = json.loads(reply) if reply else {}
+        self.stats = {
+            "lines": n_lines,
+            "bytes": n_bytes,
+            "send_seconds": round(sent - started, 3),
+            "total_seconds": round(finished - started, 3),
+            "lines_per_second": round(n_lines / max(finished - started, 1e-9), 1),
+            "max_schedule_lag_ms": round(max_lag * 1e3, 3),
+            "server": server,
+        }
+        return self.stats
+
+
+async def _send(writer, lines):
+    if not lines:
+        return 0
+    data = ''.join(lines).encode()
+    writer.write(data)
+    await writer.drain()  # blocks while the server is applying backpressure
+    return len(data)
+
+
+def _line_timestamp_ns(line):
+    parts = line.split('|', 2)
+    if len(parts) < 3:
+        return None
+    try:
+        return parse_timestamp_ns(parts[1])
+    except (KeyError, ValueError):
+        return None
@@ -2,14 +2,22 @@ import pandas as pd
 import numpy as np
 from scipy.fft import fft, fftfreq
 
+from src.timestamps import sort_key
+
 class RollingFFTExtractor:
-    def __init__(self, window_size=20, sampling_rate=1):
+    def __init__(self, window_size=20, sampling_rate=1, method="fft", refresh_interval=256):
         """
         :param window_size: Number of observations per rolling window
         :param sampling_rate: Observations per unit time
+        :param method: "fft" (full FFT at every offset) or "sliding" (recursive sliding-DFT update, O(W) per sample)
+        :param refresh_interval: In sliding mode, number of updates between full recomputations (bounds drift)
         """
+        if method not in ("fft", "sliding"):
+            raise ValueError(f"Unknown method '{method}', expected 'fft' or 'sliding'")
         self.window_size = window_size
         self.sampling_rate = sampling_rate
+        self.method = method
+        self.refresh_interval = refresh_interval
 
     def compute_fft_features(self, series):
         series = np.array(series, dtype=float)
@@ -38,11 +46,15 @@ class RollingFFTExtractor:
         Compute FFT features for each instrument using rolling windows.
         Returns a DataFrame with one row per window.
         """
+        if self.method == "sliding":
+            return self._compute_rolling_features_sliding(df, value_col, instrument_col, timestamp_col)
+
         results = []
         instruments = df[instrument_col].unique()
 
         for inst in instruments:
-            inst_df = df[df[instrument_col] == inst].sort_values(timestamp_col)
+            inst_df = df[df[instrument_col] == inst]
+            inst_df = inst_df.iloc[np.argsort(sort_key(inst_df[timestamp_col]), kind="stable")]
             series = inst_df[value_col].values
 
             for start in range(len(series) - self.window_size + 1):
@@ -59,3 +71,65 @@ class RollingFFTExtractor:
                 results.append(fft_features)
 
         return pd.DataFrame(results)
+
+    def sliding_dft(self, series):
+        """
+        Spectra of every length-W window of a 1D series via the sliding DFT recurrence
+            X_k(t+1) = (X_k(t) - x[t] + x[t+W]) * exp(2j*pi*k/W)
+        Only the non-negative frequency bins used by compute_fft_features are tracked.
+        The recurrence is restarted from a full DFT every refresh_interval updates so
+        floating-point error cannot accumulate across the session, and at the first window
+        after any non-finite sample (a NaN would otherwise poison every later window).
+        Returns a complex array (n_windows x n_bins).
+        """
+        n = self.window_size
+        n_bins = (n + 1) // 2  # bins with fftfreq >= 0
+        n_windows = len(series) - n + 1
+        if n_windows <= 0:
+            return np.empty((0, n_bins), dtype=complex)
+
+        k = np.arange(n_bins)
+        twiddle = np.exp(2j * np.pi * k / n)
+        spectra = np.empty((n_windows, n_bins), dtype=complex)
+
+        restarts = set(range(0, n_windows, self.refresh_interval))
+        restarts.update(np.flatnonzero(~np.isfinite(series[:n_windows - 1])) + 1)  # first window past each gap
+        restarts = sorted(int(t) for t in restarts)
+        for block_start, block_end in zip(restarts, restarts[1:] + [n_windows]):
+            x = fft(series[block_start:block_start + n])[:n_bins]  # full recomputation at block start
+            spectra[block_start] = x
+            for t in range(block_start, block_end - 1):  # O(W) update per new sample
+                x = (x - series[t] + series[t + n]) * twiddle
+                spectra[t + 1] = x
+        return spectra
+
+    def _compute_rolling_features_sliding(self, df, value_col, instrument_col, timestamp_col):
+        n = self.window_size
+        freqs = fftfreq(n, d=1 / self.sampling_rate)
+        freqs = freqs[freqs >= 0]
+        parts = []
+
+        for inst, inst_df in df.groupby(instrument_col, sort=False):
+            inst_df = inst_df.iloc[np.argsort(sort_key(inst_df[timestamp_col]), kind="stable")]  # chronological
+            series = np.asarray(inst_df[value_col].values, dtype=float)
+            spectra = self.sliding_dft(series)
+            if len(spectra) == 0:
+                continue
+
+            power = np.abs(spectra) ** 2 / n
+            total_power = np.sum(power, axis=1)
+            norm_power = power / total_power[:, None]
+            timestamps = inst_df[timestamp_col].values
+
+            parts.append(pd.DataFrame({
+                "dominant_frequency": freqs[np.argmax(power, axis=1)],
+                "total_power": total_power,
+                "spectral_entropy": -np.sum(norm_power * np.log2(norm_power + 1e-12), axis=1),
+                instrument_col: inst,
+                "window_start": timestamps[:len(spectra)],
+                "window_end": timestamps[n - 1:],
+            }))
+
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,111 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from src.FFTFeatureExtractor import FFTFeatureExtractor
+
+
+class _RingBuffer:
+    """Fixed-size per-instrument buffer of the last window_size ticks."""
+
+    def __init__(self, size):
+        self.values = np.empty(size, dtype=np.float64)
+        self.timestamps = np.empty(size, dtype=object)
+        self.position = 0  # next slot to overwrite (= oldest tick once full)
+        self.count = 0     # ticks seen so far
+
+    def append(self, timestamp, value):
+        self.values[self.position] = value
+        self.timestamps[self.position] = timestamp
+        self.position = (self.position + 1) % len(self.values)
+        self.count += 1
+
+    def window(self):  # values in arrival order, oldest first
+        return np.concatenate((self.values[self.position:], self.values[:self.position]))
+
+    def oldest_timestamp(self):
+        return self.timestamps[self.position]
+
+
+class StreamingFFTExtractor:
+    def __init__(self, extractor=None, instrument_col="Instrument Code", latency_samples=100_000):
+        """
+        Stateful tick-by-tick wrapper around FFTFeatureExtractor.
+
+        :param extractor: FFTFeatureExtractor supplying window_size, step_size and sampling_rate
+        :param instrument_col: Key used for the instrument in emitted records
+        :param latency_samples: Number of most recent per-tick latencies kept for latency_stats()
+        """
+        self.extractor = extractor if extractor is not None else FFTFeatureExtractor()
+        self.instrument_col = instrument_col
+        self.buffers = {}  # instrument -> _RingBuffer (memory is O(window_size) per instrument)
+        self.latencies = deque(maxlen=latency_samples)
+
+    def push(self, instrument, timestamp, value):
+        """
+        Add one tick. Returns the window feature record if this tick closes a window, else None.
+        Windows close at the same offsets as the batch extractor (every step_size ticks once full).
+        Non-numeric values are ignored, as they are dropped before the batch FFT.
+        """
+        started = time.perf_counter()
+        record = None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            value = np.nan
+
+        if not np.isnan(value):
+            window_size = self.extractor.window_size
+            buffer = self.buffers.get(instrument)
+            if buffer is None:
+                buffer = self.buffers[instrument] = _RingBuffer(window_size)
+            buffer.append(timestamp, value)
+
+            if buffer.count >= window_size and (buffer.count - window_size) % self.extractor.step_size == 0:
+                features = self.extractor.compute_batch_features(buffer.window()[None, :])
+                record = {
+                    "dominant_frequency": features["dominant_frequency"][0],
+                    "total_power": features["total_power"][0],
+                    "spectral_entropy": features["spectral_entropy"][0],
+                    **{name: features[name][0] for name in self.extractor.spectral_features},
+                    self.instrument_col: instrument,
+                    "window_start": buffer.oldest_timestamp(),
+                    "window_end": timestamp,
+                    "rolling_mean": features["rolling_mean"][0],
+                    "rolling_std": features["rolling_std"][0],
+                    "rolling_skew": features["rolling_skew"][0],
+                }
+
+        self.latencies.append(time.perf_counter() - started)
+        return record
+
+    def push_many(self, ticks):
+        """
+        Feed an iterable of (instrument, timestamp, value) ticks, e.g. a micro-batch or
+        InstrumentDataProcessor.iter_ticks(); yields each window record as soon as it closes.
+        """
+        for instrument, timestamp, value in ticks:
+            record = self.push(instrument, timestamp, value)
+            if record is not None:
+                yield record
+
+    def latency_stats(self):
+        """Per-tick processing latency (microseconds) over the most recent ticks."""
+        if not self.latencies:
+            return {"ticks": 0}
+        latencies_us = np.fromiter(self.latencies, dtype=np.float64) * 1e6
+        return {
+            "ticks": len(latencies_us),
+            "mean_us": float(latencies_us.mean()),
+            "p50_us": float(np.percentile(latencies_us, 50)),
+            "p99_us": float(np.percentile(latencies_us, 99)),
+            "max_us": float(latencies_us.max()),
+        }
+
+    def reset(self, instrument=None):
+        """Drop buffered state for one instrument, or for all instruments."""
+        if instrument is None:
+            self.buffers.clear()
+        else:
+            self.buffers.pop(instrument, None)
@@ -0,0 +1,179 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.timestamps import format_timestamps, to_epoch_ns
+
+RECORD_DTYPE = np.dtype([
+    ("instrument", "<i4"),   # index into instruments.json (sorted codes)
+    ("timestamp", "<i8"),    # nanoseconds since midnight
+    ("field_id", "<i4"),     # numeric field ID (the 'fID' in data.txt)
+    ("description", "<i4"),  # index into descriptions.json
+    ("value", "<f8"),        # float value, NaN for text fields
+    ("text_offset", "<i8"),  # byte offset of the original value text in texts.bin
+    ("text_length", "<i4"),  # byte length of the original value text
+])
+
+
+class TickStore:
+    def __init__(self, store_dir):
+        """
+        Read-only, memory-mapped binary tick store built by TickStore.build().
+
+        Records are fixed-width (RECORD_DTYPE) and sorted by (instrument, timestamp); offsets.npy holds
+        each instrument's [start, end) record range, so instrument lookups are O(1) and time-range
+        lookups O(log n). Each record also points at its original value text in texts.bin, a UTF-8
+        buffer, so outputs reproduce data.txt exactly. instrument_slice() and time_range() return
+        zero-copy views of the mapped file; field_series() and to_frame() copy.
+
+        :param store_dir: Directory written by TickStore.build()
+        """
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "meta.json")) as file:
+            self.meta = json.load(file)
+        with open(os.path.join(store_dir, "instruments.json")) as file:
+            self.instruments = json.load(file)
+        with open(os.path.join(store_dir, "descriptions.json")) as file:
+            self.descriptions = json.load(file)
+
+        self.instrument_index = {code: i for i, code in enumerate(self.instruments)}
+        self.offsets = np.load(os.path.join(store_dir, "offsets.npy"))
+        records_path = os.path.join(store_dir, "records.bin")
+        if self.meta["n_records"]:
+            self.records = np.memmap(records_path, dtype=RECORD_DTYPE, mode="r", shape=(self.meta["n_records"],))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        texts_path = os.path.join(store_dir, "texts.bin")
+        if self.meta["text_bytes"]:
+            self.texts = np.memmap(texts_path, dtype=np.uint8, mode="r", shape=(self.meta["text_bytes"],))
+        else:
+            self.texts = np.empty(0, dtype=np.uint8)
+
+    # -------------------------------------------------
+    # Build
+    # -------------------------------------------------
+    @classmethod
+    def build(cls, processor, store_dir, chunk_records=1_000_000):
+        """
+        Build a store from data.txt in one streaming pass of processor.iter_records() (same parsing
+        rules as the CSV/Parquet outputs). Records are spilled to disk in chunks, then sorted by
+        (instrument, timestamp); only the two sort keys and the permutation are held in memory.
+        Returns the opened TickStore.
+        """
+        os.makedirs(store_dir, exist_ok=True)
+        processor.static_fields = processor.load_fields(processor.static_fields_file, "S")
+        processor.dynamic_fields = processor.load_fields(processor.dynamic_fields_file, "D")
+
+        instrument_ids, description_ids = {}, {}
+        unsorted_path = os.path.join(store_dir, "records.unsorted.bin")
+        n_records = text_bytes = 0
+
+        with open(unsorted_path, "wb") as file, open(os.path.join(store_dir, "texts.bin"), "wb") as text_file:
+            chunk = np.empty(chunk_records, dtype=RECORD_DTYPE)
+            chunk_timestamps, chunk_texts = [], []  # converted per chunk in one vectorised pass
+            filled = 0
+            for instrument_code, timestamp, field_id, description, value in processor.iter_records():
+                chunk_timestamps.append(timestamp)
+                chunk_texts.append(value)
+                chunk[filled] = (
+                    instrument_ids.setdefault(instrument_code, len(instrument_ids)),
+                    0,
+                    int(field_id),
+                    description_ids.setdefault(description, len(description_ids)),
+                    processor.value_to_float(value),
+                    0,
+                    0,
+                )
+                filled += 1
+                if filled == chunk_records:
+                    text_bytes = cls._flush_chunk(chunk, chunk_timestamps, chunk_texts, file, text_file, text_bytes)
+                    n_records += filled
+                    filled, chunk_timestamps, chunk_texts = 0, [], []
+            text_bytes = cls._flush_chunk(chunk[:filled], chunk_timestamps, chunk_texts, file, text_file, text_bytes)
+            n_records += filled
+
+        # renumber instruments in code order so the sorted file groups them alphabetically
+        instruments = sorted(instrument_ids)
+        remap = np.empty(len(instruments), dtype=np.int32)
+        for new_id, code in enumerate(instruments):
+            remap[instrument_ids[code]] = new_id
+
+        records_path = os.path.join(store_dir, "records.bin")
+        offsets = np.zeros(len(instruments) + 1, dtype=np.int64)
+        if n_records:
+            unsorted = np.memmap(unsorted_path, dtype=RECORD_DTYPE, mode="r", shape=(n_records,))
+            instrument_keys = remap[unsorted["instrument"]]
+            order = np.lexsort((unsorted["timestamp"], instrument_keys))
+            offsets[1:] = np.cumsum(np.bincount(instrument_keys, minlength=len(instruments)))
+            del instrument_keys
+
+            with open(records_path, "wb") as file:
+                for start in range(0, n_records, chunk_records):
+                    block = unsorted[order[start:start + chunk_records]]
+                    block["instrument"] = remap[block["instrument"]]
+                    block.tofile(file)
+            del unsorted
+        else:
+            open(records_path, "wb").close()
+        os.remove(unsorted_path)
+
+        np.save(os.path.join(store_dir, "offsets.npy"), offsets)
+        for name, table in (("instruments", instruments),
+                            ("descriptions", sorted(description_ids, key=description_ids.get))):
+            with open(os.path.join(store_dir, f"{name}.json"), "w") as file:
+                json.dump(table, file)
+        with open(os.path.join(store_dir, "meta.json"), "w") as file:
+            json.dump({"n_records": n_records, "text_bytes": text_bytes, "date": processor.date_str,
+                       "source": os.path.abspath(processor.data_file)}, file)
+        return cls(store_dir)
+
+    @staticmethod
+    def _flush_chunk(chunk, timestamps, texts, file, text_file, text_bytes):
+        """Fill in a chunk's timestamps and text offsets, write it and its value text; returns the new text size."""
+        chunk["timestamp"] = to_epoch_ns(timestamps)
+        encoded = [value.encode() for value in texts]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        chunk["text_length"] = lengths
+        chunk["text_offset"] = text_bytes + np.cumsum(lengths) - lengths
+        chunk.tofile(file)
+        text_file.write(b"".join(encoded))
+        return text_bytes + int(lengths.sum())
+
+    # -------------------------------------------------
+    # Queries
+    # -------------------------------------------------
+    def instrument_slice(self, instrument_code):
+        """All records for one instrument, time-ordered. Empty if the code is unknown."""
+        i = self.instrument_index.get(instrument_code)
+        if i is None:
+            return self.records[:0]
+        return self.records[self.offsets[i]:self.offsets[i + 1]]
+
+    def time_range(self, instrument_code, start_ns=None, end_ns=None):
+        """Records for one instrument with start_ns <= timestamp <= end_ns (binary search)."""
+        records = self.instrument_slice(instrument_code)
+        timestamps = records["timestamp"]
+        lo = 0 if start_ns is None else np.searchsorted(timestamps, start_ns, side="left")
+        hi = len(records) if end_ns is None else np.searchsorted(timestamps, end_ns, side="right")
+        return records[lo:hi]
+
+    def field_series(self, instrument_code, field_id, start_ns=None, end_ns=None):
+        """(timestamps, values) of one numeric field for one instrument, e.g. for the FFT stage (copies)."""
+        records = self.time_range(instrument_code, start_ns, end_ns)
+        mask = records["field_id"] == int(field_id)
+        return records["timestamp"][mask], records["value"][mask]
+
+    def to_frame(self, records):
+        """Records as a DataFrame shaped like InstrumentDataProcessor output (Value kept as original text)."""
+        texts = self.texts
+        values = [bytes(texts[offset:offset + length]).decode()
+                  for offset, length in zip(records["text_offset"].tolist(), records["text_length"].tolist())]
+        return pd.DataFrame({
+            "Instrument Code": np.asarray(self.instruments, dtype=object)[records["instrument"]],
+            "Timestamp": format_timestamps(records["timestamp"]),
+            "Field ID": records["field_id"].astype(str),
+            "Description": np.asarray(self.descriptions, dtype=object)[records["description"]],
+            "Value": values,
+        })
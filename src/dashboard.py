@@ -7,10 +7,13 @@ import numpy as np
 def generate_financial_dashboard(
     fft_features_with_anomalies: pd.DataFrame,
     charts_dir: str = "charts",
-    anomaly_threshold_pct: float = 5.0
+    anomaly_threshold_pct: float = 5.0,
+    aggregator=None
 ) -> pd.DataFrame:
     """
     Build an instrument-level risk summary table.
+    Pass an already-fed `aggregator` (DashboardAggregator, e.g. updated group by group out of core)
+    to summarise its totals instead of the frame (which may then be None).
 
     Outputs:
     - charts/financial_health_summary.csv
@@ -21,37 +24,10 @@ def generate_financial_dashboard(
 
     os.makedirs(charts_dir, exist_ok=True)
 
-    summaries = []
-
-    for inst, inst_df in fft_features_with_anomalies.groupby("Instrument Code"):
-        total_windows = len(inst_df)
-        num_anomalies = (inst_df["anomaly"] == -1).sum()
-
-        pct_anomalies = (
-            (num_anomalies / total_windows) * 100
-            if total_windows > 0
-            else 0.0
-        )
-
-        summaries.append({
-            "Instrument": inst,
-            "Total Windows": total_windows,
-            "Anomalies": num_anomalies,
-            "% Anomalous": round(pct_anomalies, 2),
-            "Avg Total Power": inst_df["total_power"].mean(),
-            "Dominant Frequency": (
-                inst_df["dominant_frequency"].mode().iloc[0]
-                if not inst_df["dominant_frequency"].dropna().empty
-                else np.nan
-            ),
-            "High Risk": pct_anomalies >= anomaly_threshold_pct
-        })
-
-    summary_df = (
-        pd.DataFrame(summaries)
-        .sort_values("% Anomalous", ascending=False)
-        .reset_index(drop=True)
-    )
+    # one vectorised pass (bincount per instrument, value counts per frequency bin)
+    if aggregator is None:
+        aggregator = DashboardAggregator().update(fft_features_with_anomalies)
+    summary_df = aggregator.summary(anomaly_threshold_pct)
 
     output_path = os.path.join(charts_dir, "financial_health_summary.csv")
     summary_df.to_csv(output_path, index=False)
@@ -59,3 +35,118 @@ def generate_financial_dashboard(
     print(f"Financial dashboard summary saved to {output_path}")
 
     return summary_df
+
+
+class DashboardAggregator:
+    def __init__(
+        self,
+        instrument_col: str = "Instrument Code",
+        power_col: str = "total_power",
+        frequency_col: str = "dominant_frequency",
+        moment_cols=None
+    ):
+        """
+        Incremental state behind the financial dashboard.
+
+        update() folds a batch of scored windows into per-instrument running totals (windows,
+        anomalies, power sum/count) and per-(instrument, frequency bin) counts, so appending a batch
+        costs O(batch) and summary() is computed from the totals without revisiting any window.
+        The mode of the dominant frequency is the most frequent bin (smallest on ties, like Series.mode).
+
+        :param moment_cols: Optional numeric columns whose running count/mean/M2 are kept too
+                            (variances() then feeds compare_feature_sets without the whole frame)
+        """
+        self.instrument_col = instrument_col
+        self.power_col = power_col
+        self.frequency_col = frequency_col
+        self.moment_cols = list(moment_cols or [])
+        self.totals = pd.DataFrame(columns=["windows", "anomalies", "power_sum", "power_count"], dtype=np.float64)
+        self.frequency_counts = pd.Series(
+            dtype=np.float64, index=pd.MultiIndex.from_arrays([[], []], names=["instrument", "frequency"]))
+        self.moments = pd.DataFrame(0.0, index=self.moment_cols, columns=["count", "mean", "m2"])
+
+    def update(self, scored: pd.DataFrame):
+        """Fold one batch of scored windows (anomaly column from AnomalyDetector) into the state."""
+        codes, instruments = pd.factorize(scored[self.instrument_col], sort=False)
+        n = len(instruments)
+        keep = codes >= 0
+
+        power = scored[self.power_col].to_numpy(dtype=np.float64)
+        has_power = keep & ~np.isnan(power)
+        batch = pd.DataFrame({
+            "windows": np.bincount(codes[keep], minlength=n),
+            "anomalies": np.bincount(codes[keep], weights=(scored["anomaly"] == -1).to_numpy()[keep], minlength=n),
+            "power_sum": np.bincount(codes[has_power], weights=power[has_power], minlength=n),
+            "power_count": np.bincount(codes[has_power], minlength=n),
+        }, index=pd.Index(instruments, dtype=object), dtype=np.float64)
+        self.totals = batch if self.totals.empty else self.totals.add(batch, fill_value=0)
+
+        # counts per (instrument, frequency bin): one bincount over the combined code
+        frequency = scored[self.frequency_col].to_numpy(dtype=np.float64)
+        has_frequency = keep & ~np.isnan(frequency)
+        bin_codes, bins = pd.factorize(frequency[has_frequency], sort=False)
+        pair_counts = np.bincount(codes[has_frequency] * len(bins) + bin_codes, minlength=n * len(bins))
+        pairs = np.flatnonzero(pair_counts)
+        batch_counts = pd.Series(pair_counts[pairs].astype(np.float64), index=pd.MultiIndex.from_arrays(
+            [np.asarray(instruments, dtype=object)[pairs // max(len(bins), 1)], np.asarray(bins)[pairs % max(len(bins), 1)]],
+            names=["instrument", "frequency"]))
+        self.frequency_counts = (batch_counts if self.frequency_counts.empty
+                                 else self.frequency_counts.add(batch_counts, fill_value=0))
+
+        if self.moment_cols:
+            self._update_moments(scored[self.moment_cols].to_numpy(dtype=np.float64))
+        return self
+
+    def update_moments(self, batch: pd.DataFrame):
+        """Fold only the moment columns of a batch (e.g. unscored feature windows) into the running variances."""
+        self._update_moments(batch[self.moment_cols].to_numpy(dtype=np.float64))
+        return self
+
+    def summary(self, anomaly_threshold_pct: float = 5.0) -> pd.DataFrame:
+        """Dashboard table (same columns and order as generate_financial_dashboard) from the current state."""
+        totals = self.totals.sort_index()  # groupby order, so the stable layout matches a one-shot run
+        windows = totals["windows"].to_numpy()
+        anomalies = totals["anomalies"].to_numpy()
+        pct_anomalies = np.where(windows > 0, anomalies / np.maximum(windows, 1) * 100, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg_power = totals["power_sum"].to_numpy() / totals["power_count"].to_numpy()
+
+        summary_df = pd.DataFrame({
+            "Instrument": totals.index.to_numpy(dtype=object),
+            "Total Windows": windows.astype(np.int64),
+            "Anomalies": anomalies.astype(np.int64),
+            "% Anomalous": np.round(pct_anomalies, 2),
+            "Avg Total Power": avg_power,
+            "Dominant Frequency": self.dominant_frequency().reindex(totals.index).to_numpy(dtype=np.float64),
+            "High Risk": pct_anomalies >= anomaly_threshold_pct
+        })
+        return summary_df.sort_values("% Anomalous", ascending=False).reset_index(drop=True)
+
+    def dominant_frequency(self) -> pd.Series:
+        """Most frequent dominant_frequency bin per instrument (ties -> smallest bin)."""
+        if self.frequency_counts.empty:
+            return pd.Series(dtype=np.float64)
+        counts = self.frequency_counts.reset_index(name="count")
+        counts = counts.sort_values(["instrument", "count", "frequency"], ascending=[True, False, True], kind="stable")
+        first = counts.drop_duplicates("instrument")
+        return pd.Series(first["frequency"].to_numpy(dtype=np.float64), index=first["instrument"].to_numpy(dtype=object))
+
+    def variances(self) -> pd.Series:
+        """Sample variance (ddof=1, NaN skipped, as DataFrame.var) of each moment column over all batches."""
+        count = self.moments["count"]
+        return (self.moments["m2"] / (count - 1)).where(count > 1)
+
+    def _update_moments(self, values):
+        # Chan et al. pairwise merge of (count, mean, M2) per column; NaNs skipped
+        present = ~np.isnan(values)
+        n_b = present.sum(axis=0).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, np.nansum(values, axis=0) / n_b, 0.0)
+            m2_b = np.nansum(np.where(present, values - mean_b, 0.0) ** 2, axis=0)
+        n_a, mean_a, m2_a = (self.moments[c].to_numpy() for c in ("count", "mean", "m2"))
+        n = n_a + n_b
+        delta = mean_b - mean_a
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(n > 0, mean_a + delta * n_b / np.maximum(n, 1), 0.0)
+            m2 = m2_a + m2_b + np.where(n > 0, delta ** 2 * n_a * n_b / np.maximum(n, 1), 0.0)
+        self.moments = pd.DataFrame({"count": n, "mean": mean, "m2": m2}, index=self.moment_cols)
@@ -2,9 +2,11 @@ import numpy as np
 import pandas as pd
 
 
-def compare_feature_sets(df, fft_cols, baseline_cols):
+def compare_feature_sets(df, fft_cols, baseline_cols, variances=None):
     """
     Compare FFT feature set vs baseline (time-domain) features.
+    Pass `variances` (column -> variance, e.g. DashboardAggregator(moment_cols=...).variances())
+    to reuse running variances instead of recomputing them over df (df may then be None).
 
     Returns:
     - Average variance per feature set
@@ -12,13 +14,13 @@ def compare_feature_sets(df, fft_cols, baseline_cols):
     - Normalized signal improvement (%)
     - Optional: anomaly spread per feature set (future expansion)
     """
-    # Ensure numeric only
-    fft_df = df[fft_cols].select_dtypes(include=np.number)
-    baseline_df = df[baseline_cols].select_dtypes(include=np.number)
+    # Ensure numeric only; both feature sets in one pass
+    if variances is None:
+        variances = df[list(dict.fromkeys(fft_cols + baseline_cols))].select_dtypes(include=np.number).var()
 
     # Compute mean variance per feature set
-    fft_variance = fft_df.var().mean()
-    baseline_variance = baseline_df.var().mean()
+    fft_variance = variances.reindex(fft_cols).mean()
+    baseline_variance = variances.reindex(baseline_cols).mean()
 
     # Compute ratio
     variance_ratio = fft_variance / baseline_variance if baseline_variance != 0 else None
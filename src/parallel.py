@@ -0,0 +1,84 @@
+# src/parallel.py
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# -------------------------------------------------
+# Shared-memory arrays
+# -------------------------------------------------
+class SharedArray:
+    """
+    NumPy array backed by POSIX shared memory. Only the descriptor (name, shape, dtype)
+    is pickled to worker processes, never the data itself.
+    """
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.descriptor = (self.shm.name, array.shape, array.dtype.str)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)[...] = array
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def attach_shared_array(descriptor):
+    """Attach to a SharedArray from a worker. Returns (shm handle, array view); close the handle when done."""
+    name, shape, dtype = descriptor
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+# -------------------------------------------------
+# Sharding + pool execution
+# -------------------------------------------------
+def resolve_n_jobs(n_jobs):
+    """n_jobs=None/1 -> 1, n_jobs=-1 -> all cores, otherwise as given."""
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return max(1, (os.cpu_count() or 1) + 1 + n_jobs)
+    return max(1, n_jobs)
+
+
+def shard_groups(n_groups, n_jobs, chunk_size=None):
+    """
+    Split group indices [0, n_groups) into contiguous (first, last) ranges.
+    Default chunking gives each worker ~4 tasks for load balancing.
+    """
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(n_groups / (n_jobs * 4)))
+    return [(first, min(first + chunk_size, n_groups)) for first in range(0, n_groups, chunk_size)]
+
+
+def run_sharded(worker, tasks, n_jobs):
+    """
+    Run worker(*task) for every task across a process pool.
+    Results are returned in task order, so output is deterministic whatever the scheduling.
+    """
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [worker(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+        futures = [pool.submit(worker, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def iter_sharded(worker, tasks, n_jobs):
+    """Like run_sharded, but yields results one at a time in task order so callers can stream them out."""
+    if n_jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield worker(*task)
+        return
+    with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+        yield from pool.map(worker, *zip(*tasks))
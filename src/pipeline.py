@@ -0,0 +1,214 @@
+# src/pipeline.py
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (since start, or since the last reset_peak_rss()), in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KiB on Linux
+
+
+def cpu_seconds():
+    """CPU time of this process plus its reaped child processes (e.g. process pools shut down so far), in seconds."""
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+def current_rss_mb():
+    """Current resident set size in MB (Linux /proc/self/statm), None where unavailable."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def reset_peak_rss():
+    """Reset the kernel's RSS high-water mark to the current RSS (Linux >= 4.0). Returns False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def high_water_rss_mb():
+    """RSS high-water mark (VmHWM) since start or the last reset_peak_rss(), in MB; None where unavailable."""
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024  # kB
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class RssSampler:
+    """Polls current_rss_mb() in a daemon thread; stop() returns the largest value seen."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return max(self.peak, current_rss_mb() or 0.0)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb() or 0.0)
+
+
+class StageContext:
+    """Handle yielded by PipelineRunner.stage(); set rows_in/rows_out or extra metrics inside the block."""
+
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.metrics = {}
+
+
+class PipelineRunner:
+    def __init__(self, events_path="pipeline_events.jsonl", profile=None, profile_dir="profiles", callbacks=None):
+        """
+        Runs named pipeline stages and emits one structured event per stage.
+
+        Each event has: stage, status, started_at, wall_s, cpu_s, peak_rss_mb, rss_start_mb, rss_delta_mb,
+        process_peak_rss_mb, rows_in, rows_out (+ traced_peak_mb with tracemalloc profiling, error on
+        failure, and any custom metrics). peak_rss_mb is the peak during this stage alone: the kernel
+        high-water mark is reset when the stage starts (Linux), or the current RSS is sampled where it
+        cannot be; it is None when neither is available. process_peak_rss_mb is the lifetime peak.
+        cpu_s includes child processes reaped during the stage (process pools shut down inside it);
+        workers still alive when the stage ends, such as a reused joblib pool, are not counted.
+        Events are appended to events_path as JSON lines and passed to every callback.
+
+        :param events_path: JSON-lines file for stage events (None to disable)
+        :param profile: None, "cprofile" (dump <profile_dir>/<stage>.prof) or "tracemalloc"
+                        (dump <profile_dir>/<stage>.tracemalloc.txt with top allocation sites)
+        :param profile_dir: Directory for per-stage profile dumps
+        :param callbacks: Optional list of callables receiving each event dict (e.g. a metrics exporter)
+        """
+        if profile not in (None, "cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profile '{profile}', expected None, 'cprofile' or 'tracemalloc'")
+        self.events_path = events_path
+        self.profile = profile
+        self.profile_dir = profile_dir
+        self.callbacks = list(callbacks or [])
+        self.events = []
+        self.process_peak_rss_mb = peak_rss_mb()
+        if profile:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def add_callback(self, callback):
+        """Register callback(event_dict), called after every stage."""
+        self.callbacks.append(callback)
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        Time the enclosed block as stage `name`:
+
+            with runner.stage("fft", rows_in=len(df)) as stage:
+                features = extractor.compute_rolling_features(df)
+                stage.rows_out = len(features)
+        """
+        context = StageContext(name, rows_in)
+        profiler = cProfile.Profile() if self.profile == "cprofile" else None
+        if self.profile == "tracemalloc":
+            tracemalloc.start()
+
+        rss_start = current_rss_mb()
+        self.process_peak_rss_mb = max(self.process_peak_rss_mb, peak_rss_mb())  # before the reset lowers it
+        sampler = None
+        if not reset_peak_rss() and rss_start is not None:  # no resettable high-water mark: poll instead
+            sampler = RssSampler().start()
+
+        started_at = time.time()
+        wall_start, cpu_start = time.perf_counter(), cpu_seconds()
+        if profiler:
+            profiler.enable()
+
+        error = None
+        try:
+            yield context
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+            rss_end = current_rss_mb()
+            stage_peak = sampler.stop() if sampler is not None else high_water_rss_mb()
+            self.process_peak_rss_mb = max(self.process_peak_rss_mb, peak_rss_mb(), stage_peak or 0.0)
+            event = {
+                "stage": name,
+                "status": "error" if error is not None else "ok",
+                "started_at": started_at,
+                "wall_s": round(time.perf_counter() - wall_start, 6),
+                "cpu_s": round(cpu_seconds() - cpu_start, 6),
+                "peak_rss_mb": None if stage_peak is None else round(stage_peak, 2),
+                "rss_start_mb": None if rss_start is None else round(rss_start, 2),
+                "rss_delta_mb": None if rss_start is None or rss_end is None else round(rss_end - rss_start, 2),
+                "process_peak_rss_mb": round(self.process_peak_rss_mb, 2),
+                "rows_in": context.rows_in,
+                "rows_out": context.rows_out,
+            }
+            if error is not None:
+                event["error"] = f"{type(error).__name__}: {error}"
+            if profiler:
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            if self.profile == "tracemalloc":
+                snapshot = tracemalloc.take_snapshot()
+                event["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+                tracemalloc.stop()
+                with open(os.path.join(self.profile_dir, f"{name}.tracemalloc.txt"), "w") as file:
+                    for stat in snapshot.statistics("lineno")[:50]:
+                        file.write(f"{stat}\n")
+            event.update(context.metrics)
+            self.emit(event)
+
+    def skip(self, name, reason):
+        """Record a stage that did not run (e.g. served from cache)."""
+        self.emit({"stage": name, "status": "skipped", "started_at": time.time(), "reason": reason})
+
+    def emit(self, event):
+        self.events.append(event)
+        if self.events_path:
+            with open(self.events_path, "a") as file:
+                file.write(json.dumps(event, default=str) + "\n")
+        for callback in self.callbacks:
+            callback(event)
+
+    def summary(self):
+        """One line per stage, for the end-of-run printout."""
+        lines = []
+        for event in self.events:
+            if event["status"] == "skipped":
+                lines.append(f"{event['stage']:<10} skipped ({event['reason']})")
+            else:
+                rss = (f"peak RSS {event['peak_rss_mb']:8.1f} MB ({event['rss_delta_mb']:+.1f})"
+                       if event["peak_rss_mb"] is not None else f"process peak RSS {event['process_peak_rss_mb']:8.1f} MB")
+                lines.append(
+                    f"{event['stage']:<10} {event['status']:<6} wall {event['wall_s']:8.3f}s  cpu {event['cpu_s']:8.3f}s  "
+                    f"{rss}  rows {event['rows_in']} -> {event['rows_out']}"
+                )
+        return "\n".join(lines)
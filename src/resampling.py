@@ -0,0 +1,154 @@
+# src/resampling.py
+import numpy as np
+import pandas as pd
+
+from src.timestamps import NAT, NS_PER_SECOND, format_timestamps, to_epoch_ns
+
+RESAMPLE_METHODS = ("last", "mean", "ohlc", "vwap")
+
+
+def interval_to_ns(interval):
+    """Bucket width in nanoseconds from seconds (int/float) or a pandas timedelta string ('500ms', '1s', '1min')."""
+    if isinstance(interval, (str, pd.Timedelta, np.timedelta64)):
+        interval_ns = pd.Timedelta(interval).value
+    else:
+        interval_ns = int(round(float(interval) * NS_PER_SECOND))
+    if interval_ns <= 0:
+        raise ValueError(f"Resample interval must be positive, got {interval!r}")
+    return interval_ns
+
+
+def resample_ticks(
+    df,
+    interval,
+    how="last",
+    value_col="Value",
+    instrument_col="Instrument Code",
+    timestamp_col="Timestamp",
+    volume_col=None,
+    fill_gaps=True,
+):
+    """
+    Bucket irregular ticks onto a fixed per-instrument time grid, so spectra have a real time axis.
+
+    All instruments are handled in one sort plus ufunc.reduceat passes (no Python loop over rows or
+    instruments). Buckets are labelled by their start time, in the same representation as the input
+    timestamps ('HH:MM:SS:mmm' strings, datetime64 or seconds).
+
+    :param df: Long-format ticks [instrument_col, timestamp_col, value_col (, volume_col)]
+    :param interval: Bucket width, seconds or a pandas timedelta string (e.g. "1s", "250ms")
+    :param how: "last" (last price in bucket), "mean", "ohlc" (adds Open/High/Low/Close columns,
+                value_col = Close) or "vwap" (volume-weighted average price, requires volume_col)
+    :param volume_col: Trade size column for "vwap" (and summed into a Volume column when given)
+    :param fill_gaps: Emit every bucket between an instrument's first and last tick; empty buckets
+                      carry the previous value forward (OHLC bars become flat at the previous close)
+    :return: DataFrame sorted by instrument (first-appearance order) then bucket
+    """
+    if how not in RESAMPLE_METHODS:
+        raise ValueError(f"Unknown resample method '{how}', expected one of {RESAMPLE_METHODS}")
+    if how == "vwap" and volume_col is None:
+        raise ValueError("how='vwap' requires volume_col")
+    interval_ns = interval_to_ns(interval)
+
+    ns = to_epoch_ns(df[timestamp_col])
+    values = pd.to_numeric(df[value_col], errors="coerce").to_numpy(dtype=np.float64)
+    valid = (ns != NAT) & ~np.isnan(values)
+    if volume_col is not None:
+        volumes = pd.to_numeric(df[volume_col], errors="coerce").to_numpy(dtype=np.float64)
+        valid &= ~np.isnan(volumes)
+
+    inst_codes, inst_uniques = pd.factorize(df[instrument_col], sort=False)
+    valid &= inst_codes >= 0
+    order = np.flatnonzero(valid)
+    order = order[np.lexsort((ns[order], inst_codes[order]))]
+
+    codes = inst_codes[order]
+    buckets = ns[order] // interval_ns
+    values = values[order]
+
+    # one run per non-empty (instrument, bucket)
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])
+    run_starts = np.flatnonzero(new_run)
+    run_ends = np.append(run_starts[1:], len(order))
+    run_codes = codes[run_starts]
+    run_buckets = buckets[run_starts]
+
+    columns = {}
+    if len(run_starts):
+        close = values[run_ends - 1]
+        if how == "mean":
+            columns[value_col] = np.add.reduceat(values, run_starts) / (run_ends - run_starts)
+        elif how == "ohlc":
+            columns["Open"] = values[run_starts]
+            columns["High"] = np.maximum.reduceat(values, run_starts)
+            columns["Low"] = np.minimum.reduceat(values, run_starts)
+            columns["Close"] = close
+            columns[value_col] = close
+        else:
+            columns[value_col] = close
+        if volume_col is not None:
+            volumes = volumes[order]
+            volume = np.add.reduceat(volumes, run_starts)
+            if how == "vwap":
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    vwap = np.add.reduceat(values * volumes, run_starts) / volume
+                columns[value_col] = np.where(volume > 0, vwap, close)  # no traded volume: last price
+            columns["Volume"] = volume
+        columns["Ticks"] = run_ends - run_starts
+    else:
+        columns = {name: np.empty(0) for name in _output_columns(how, value_col, volume_col)}
+
+    if fill_gaps and len(run_starts):
+        run_codes, run_buckets, columns = _fill_gaps(run_codes, run_buckets, columns, how)
+
+    labels = run_buckets * interval_ns
+    if pd.api.types.is_datetime64_any_dtype(df[timestamp_col].dtype):
+        labels = labels.astype("datetime64[ns]")
+    elif pd.api.types.is_numeric_dtype(df[timestamp_col].dtype):
+        labels = labels / NS_PER_SECOND
+    else:
+        labels = format_timestamps(labels)
+
+    result = pd.DataFrame({
+        instrument_col: np.asarray(inst_uniques, dtype=object)[run_codes],
+        timestamp_col: labels,
+    })
+    for name in _output_columns(how, value_col, volume_col):
+        result[name] = columns[name]
+    return result
+
+
+def _output_columns(how, value_col, volume_col):
+    names = [value_col] + (["Open", "High", "Low", "Close"] if how == "ohlc" else [])
+    return names + (["Volume"] if volume_col is not None else []) + ["Ticks"]
+
+
+def _fill_gaps(run_codes, run_buckets, columns, how):
+    """Expand runs to a contiguous bucket grid per instrument, forward-filling empty buckets."""
+    inst_bounds = np.flatnonzero(np.diff(run_codes)) + 1
+    inst_first = np.concatenate(([0], inst_bounds))
+    inst_last = np.append(inst_bounds, len(run_codes)) - 1
+    first_bucket = run_buckets[inst_first]
+    grid_lengths = run_buckets[inst_last] - first_bucket + 1
+    grid_offsets = np.cumsum(grid_lengths) - grid_lengths
+
+    # grid position of every observed run; empty cells point at the previous run of the same instrument
+    run_inst = np.repeat(np.arange(len(inst_first)), inst_last - inst_first + 1)
+    positions = grid_offsets[run_inst] + (run_buckets - first_bucket[run_inst])
+    source = np.full(int(grid_lengths.sum()), -1, dtype=np.int64)
+    source[positions] = np.arange(len(run_codes))
+    observed = source >= 0
+    source = np.maximum.accumulate(source)  # each instrument's first cell is observed, so no bleed across
+
+    grid_inst = np.repeat(np.arange(len(inst_first)), grid_lengths)
+    grid_buckets = np.repeat(first_bucket, grid_lengths) + (np.arange(len(source)) - np.repeat(grid_offsets, grid_lengths))
+
+    filled = {name: column[source] for name, column in columns.items()}
+    if how == "ohlc":
+        for name in ("Open", "High", "Low"):  # flat bars at the previous close
+            filled[name] = np.where(observed, filled[name], filled["Close"])
+    for name in ("Volume", "Ticks"):
+        if name in filled:
+            filled[name] = np.where(observed, filled[name], 0)
+    return run_codes[inst_first][grid_inst], grid_buckets, filled
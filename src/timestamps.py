@@ -0,0 +1,202 @@
+# src/timestamps.py
+import datetime
+
+import numpy as np
+import pandas as pd
+
+NS_PER_MS = 1_000_000
+NS_PER_SECOND = 1_000_000_000
+NS_PER_MINUTE = 60 * NS_PER_SECOND
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+FIXED_WIDTH = len("HH:MM:SS:mmm")
+NAT = np.iinfo(np.int64).min  # missing / unparsable timestamps (same sentinel as numpy NaT)
+
+_PART_SCALES = {  # ns per component for HH:MM:SS:MS, MM:SS:MS and SS:MS
+    4: (3600 * NS_PER_SECOND, NS_PER_MINUTE, NS_PER_SECOND, NS_PER_MS),
+    3: (NS_PER_MINUTE, NS_PER_SECOND, NS_PER_MS),
+    2: (NS_PER_SECOND, NS_PER_MS),
+}
+
+
+def parse_timestamp_ns(timestamp):
+    """Scalar 'HH:MM:SS:MS' (or 'MM:SS:MS', 'SS:MS') -> nanoseconds since midnight."""
+    parts = timestamp.split(':')
+    return sum(int(p) * scale for p, scale in zip(parts, _PART_SCALES[len(parts)]))
+
+
+def range_filter(start_timestamp, end_timestamp):
+    """
+    Bounds check for the line-by-line parser: returns (lexical_width, in_range). Timestamps of length
+    lexical_width can be compared to the bound strings directly (fixed-width 'HH:MM:SS:mmm' sorts
+    chronologically); anything else goes through in_range(timestamp), which compares nanoseconds.
+    lexical_width is None when the bounds themselves are not fixed-width. Timestamps that do not parse
+    are out of range; a bound that does not parse falls back to plain string comparison (a missing
+    bound is open), as the original parser compared every timestamp.
+    """
+    start_ns, end_ns = _parse_one(start_timestamp), _parse_one(end_timestamp)
+    if start_ns == NAT or end_ns == NAT:
+        return None, (lambda timestamp: (start_timestamp is None or start_timestamp <= timestamp)
+                      and (end_timestamp is None or timestamp <= end_timestamp))
+    fixed = _is_fixed_width(start_timestamp) and _is_fixed_width(end_timestamp)
+
+    def in_range(timestamp):
+        timestamp_ns = _parse_one(timestamp)
+        return timestamp_ns != NAT and start_ns <= timestamp_ns <= end_ns
+
+    return (FIXED_WIDTH if fixed else None), in_range
+
+
+def is_logging_date(date_str):
+    """True for a valid 'YYYYMMDD' logging date string."""
+    if not (isinstance(date_str, str) and len(date_str) == 8 and date_str.isdigit()):
+        return False
+    try:
+        datetime.datetime.strptime(date_str, "%Y%m%d")
+    except ValueError:
+        return False
+    return True
+
+
+def date_to_epoch_ns(date):
+    """'YYYYMMDD' / 'YYYY-MM-DD' / date -> epoch nanoseconds of that midnight."""
+    if isinstance(date, str):
+        date = datetime.datetime.strptime(date.replace('-', ''), "%Y%m%d")
+    return int(pd.Timestamp(date).normalize().value)
+
+
+def to_epoch_ns(values, date=None):
+    """
+    Convert a whole timestamp column to int64 nanoseconds in one vectorised pass.
+
+    Accepts 'HH:MM:SS:MS' / 'MM:SS:MS' / 'SS:MS' strings, datetime64 values (returned as epoch ns),
+    or numbers (seconds). String times are nanoseconds since midnight, or since the epoch when
+    `date` is given. Missing or unparsable entries become NAT.
+    """
+    series = _as_series(values)
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.astype("datetime64[ns]").to_numpy().view(np.int64).copy()
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        seconds = series.to_numpy(dtype=np.float64)
+        result = np.where(np.isnan(seconds), 0, np.round(seconds * NS_PER_SECOND)).astype(np.int64)
+        result[np.isnan(seconds)] = NAT
+        return result
+
+    result, parsed = _parse_fixed_width(series)
+    fallback = np.flatnonzero(~parsed)  # anything else (other widths, MM:SS:MS, missing) one by one
+    if len(fallback):
+        result[fallback] = [_parse_one(value) for value in series.to_numpy(dtype=object)[fallback]]
+    if date is not None:
+        result = np.where(result == NAT, NAT, result + date_to_epoch_ns(date))
+    return result
+
+
+def clock_to_ns(clock):
+    """
+    HHMMSSmmm integers (the digits of 'HH:MM:SS:mmm', as the line parser stores them) -> nanoseconds
+    since midnight, in place on an int64 array and returned.
+    """
+    clock = np.asarray(clock)
+    hours, rest = np.divmod(clock, 10_000_000)
+    minutes, rest = np.divmod(rest, 100_000)
+    seconds, millis = np.divmod(rest, 1000)
+    clock[...] = ((hours * 60 + minutes) * 60 + seconds) * NS_PER_SECOND + millis * NS_PER_MS
+    return clock
+
+
+def ns_to_clock(ns):
+    """Scalar nanoseconds since midnight -> HHMMSSmmm integer (millisecond resolution)."""
+    seconds, millis = divmod(ns // NS_PER_MS, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return ((hours * 100 + minutes) * 100 + seconds) * 1000 + millis
+
+
+def to_minutes(values):
+    """Minutes as float (NaN for missing), e.g. for plot axes; datetimes give minutes since midnight."""
+    series = _as_series(values)
+    ns = to_epoch_ns(series)
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        ns = np.where(ns == NAT, NAT, ns % NS_PER_DAY)
+    minutes = ns / NS_PER_MINUTE
+    minutes[ns == NAT] = np.nan
+    return minutes
+
+
+def sort_key(values):
+    """
+    int64 keys that order a timestamp column chronologically (missing last). Columns that are not
+    timestamps at all fall back to their lexical order, so any column can still be sorted by.
+    """
+    series = _as_series(values)
+    keys = to_epoch_ns(series)
+    missing = keys == NAT
+    if (missing & series.notna().to_numpy()).any():  # unparsable values present: sort as before, lexically
+        keys, _ = pd.factorize(series, sort=True)
+        keys = keys.astype(np.int64)
+        missing = keys < 0
+    keys[missing] = np.iinfo(np.int64).max
+    return keys
+
+
+def format_timestamps(ns):
+    """int64 nanoseconds since midnight -> 'HH:MM:SS:mmm' strings (inverse of the fixed-width parse)."""
+    ms = np.asarray(ns, dtype=np.int64) // NS_PER_MS
+    digits = np.empty((len(ms), 12), dtype=np.uint8)
+    for column, (divisor, modulus) in zip((0, 1, 3, 4, 6, 7, 9, 10, 11), (
+            (36_000_000, 10), (3_600_000, 10), (600_000, 6), (60_000, 10),
+            (10_000, 6), (1000, 10), (100, 10), (10, 10), (1, 10))):
+        digits[:, column] = ms // divisor % modulus + ord('0')
+    digits[:, [2, 5, 8]] = ord(':')
+    return digits.view("S12").ravel().astype(str).astype(object)
+
+
+def _as_series(values):
+    """Wrap input as a Series; object columns holding datetime objects become datetime64."""
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) in ("datetime", "datetime64"):
+        series = pd.to_datetime(series)
+    return series
+
+
+def _is_fixed_width(timestamp):
+    return (len(timestamp) == FIXED_WIDTH and timestamp[2] == timestamp[5] == timestamp[8] == ':'
+            and timestamp.replace(':', '').isdigit())
+
+
+def _parse_fixed_width(series):
+    """
+    Fast path: read 'HH:MM:SS:mmm' digits straight from a byte matrix.
+    Returns (ns, parsed) where parsed flags the rows that had exactly that shape.
+    """
+    try:
+        raw = series.to_numpy(dtype="S13")  # one spare byte so longer values are detected, not truncated
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return np.full(len(series), NAT, dtype=np.int64), np.zeros(len(series), dtype=bool)
+
+    chars = raw.view(np.uint8).reshape(len(raw), 13)
+    digits = chars[:, [0, 1, 3, 4, 6, 7, 9, 10, 11]].astype(np.int64) - ord('0')
+    parsed = ((chars[:, [2, 5, 8]] == ord(':')).all(axis=1) & (chars[:, 12] == 0)
+              & ((digits >= 0) & (digits <= 9)).all(axis=1))
+
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 2] * 10 + digits[:, 3]
+    seconds = digits[:, 4] * 10 + digits[:, 5]
+    millis = digits[:, 6] * 100 + digits[:, 7] * 10 + digits[:, 8]
+    result = ((hours * 60 + minutes) * 60 + seconds) * NS_PER_SECOND + millis * NS_PER_MS
+    result[~parsed] = NAT
+    return result, parsed
+
+
+def _parse_one(value):
+    """Fallback for a single value the fast path could not read: NAT if missing or malformed."""
+    if isinstance(value, (int, float)) and value == value:  # numbers are seconds, as in numeric columns
+        return int(round(value * NS_PER_SECOND))
+    if not isinstance(value, str):
+        return NAT
+    parts = value.split(':')
+    scales = _PART_SCALES.get(len(parts))
+    try:
+        return int(round(sum(float(p) * scale for p, scale in zip(parts, scales)))) if scales else NAT
+    except ValueError:
+        return NAT
@@ -1,8 +1,30 @@
+import os
 import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 
 
+def load_processed_data(path, columns=None, filters=None):
+    """
+    Load InstrumentDataProcessor output as a DataFrame with a numeric 'Value' column.
+
+    :param path: output CSV file, or Parquet dataset directory written with output_format="parquet"
+    :param columns: optional list of columns to read (pushed down to the Parquet reader)
+    :param filters: optional pyarrow filter expression, e.g. pc.field("Instrument Code") == "IXN24AJB63000"
+    :return: Pandas DataFrame
+    """
+    if os.path.isdir(path):
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(path, format="parquet", partitioning="hive")
+        return dataset.to_table(columns=columns, filter=filters).to_pandas()
+
+    df = pd.read_csv(path, usecols=columns)
+    if "Value" in df.columns:
+        df["Value"] = pd.to_numeric(df["Value"], errors="coerce")
+    return df
+
+
 def generate_synthetic_ticker_data(
         instruments=None,
         start_date="2025-01-01",
@@ -25,20 +47,110 @@ def generate_synthetic_ticker_data(
         instruments = ["AAPL", "SPY", "GOOG", "MSFT"]
 
     dates = pd.date_range(start=start_date, periods=num_days, freq=freq)
-    data = []
-
-    for inst in instruments:
-        # Generate a synthetic price series with trend + seasonal + noise
-        trend = np.linspace(100, 120, num_days)  # linear trend
-        seasonal = 5 * np.sin(np.linspace(0, 4 * np.pi, num_days))  # sine wave
-        noise = np.random.normal(0, 1, num_days)  # Gaussian noise
-        prices = trend + seasonal + noise
 
-        # Convert prices to "returns" if desired
-        returns = np.diff(np.log(prices + 1e-9), prepend=np.log(prices[0] + 1e-9))
+    # Generate synthetic price series with trend + seasonal + noise for all instruments at once
+    trend = np.linspace(100, 120, num_days)  # linear trend
+    seasonal = 5 * np.sin(np.linspace(0, 4 * np.pi, num_days))  # sine wave
+    noise = np.random.normal(0, 1, (len(instruments), num_days))  # Gaussian noise, one row per instrument
+    prices = trend + seasonal + noise
 
-        for d, r in zip(dates, returns):
-            data.append([d, inst, r])
+    # Convert prices to "returns" if desired
+    log_prices = np.log(prices + 1e-9)
+    returns = np.diff(log_prices, axis=1, prepend=log_prices[:, :1])
 
-    df = pd.DataFrame(data, columns=["Date", "Instrument Code", "Value"])
+    df = pd.DataFrame({
+        "Date": np.tile(dates, len(instruments)),
+        "Instrument Code": np.repeat(instruments, num_days),
+        "Value": returns.ravel(),
+    })
     return df
+
+
+def _synthetic_ticks(n_ticks, n_instruments, seed, start_ms, mean_gap_ms):
+    """Vectorised tick arrays: (instrument index, ms since midnight, price, size), time-ordered."""
+    rng = np.random.default_rng(seed)
+    inst_idx = rng.integers(0, n_instruments, n_ticks)
+    times_ms = start_ms + np.cumsum(rng.exponential(mean_gap_ms, n_ticks)).astype(np.int64)
+    start_prices = rng.uniform(10, 500, n_instruments)
+    increments = rng.normal(0, 0.001, n_ticks)
+    # per-instrument random walk without a Python loop over ticks
+    walk = pd.Series(increments).groupby(inst_idx).cumsum().to_numpy()
+    prices = np.round(start_prices[inst_idx] * np.exp(walk), 4)
+    sizes = rng.integers(1, 1000, n_ticks)
+    return inst_idx, times_ms, prices, sizes
+
+
+def _format_ms(times_ms):
+    """Vectorised ms-since-midnight -> 'HH:MM:SS:MS' strings."""
+    times = pd.Series(times_ms)
+    hours, rest = times // 3_600_000, times % 3_600_000
+    return (hours.astype(str).str.zfill(2) + ":" + (rest // 60_000).astype(str).str.zfill(2) + ":"
+            + (rest % 60_000 // 1000).astype(str).str.zfill(2) + ":" + (rest % 1000).astype(str).str.zfill(3))
+
+
+def generate_synthetic_tick_frame(
+        n_ticks=1_000_000,
+        n_instruments=1000,
+        seed=42,
+        start_time_ms=9 * 3_600_000,
+        mean_gap_ms=20.0
+):
+    """
+    Generate a long-format tick DataFrame shaped like InstrumentDataProcessor output
+    (last price D2 and last volume D3 per tick), fully vectorised for millions of ticks.
+
+    :param n_ticks: number of ticks (each tick yields two rows: price and volume)
+    :param n_instruments: number of instruments ticks are spread over
+    :param seed: random seed for reproducibility
+    :param start_time_ms: session start, in ms since midnight
+    :param mean_gap_ms: mean gap between consecutive ticks (exponential inter-arrival)
+    :return: Pandas DataFrame with columns ['Instrument Code', 'Timestamp', 'Field ID', 'Description', 'Value']
+    """
+    inst_idx, times_ms, prices, sizes = _synthetic_ticks(n_ticks, n_instruments, seed, start_time_ms, mean_gap_ms)
+    codes = np.array([f"SYN{i:06d}" for i in range(n_instruments)], dtype=object)[inst_idx]
+    timestamps = _format_ms(times_ms).to_numpy(dtype=object)
+
+    return pd.DataFrame({
+        "Instrument Code": np.concatenate([codes, codes]),
+        "Timestamp": np.concatenate([timestamps, timestamps]),
+        "Field ID": np.repeat(["2", "3"], n_ticks),
+        "Description": np.repeat(["Last price", "Last volume"], n_ticks),
+        "Value": np.concatenate([prices, sizes.astype(float)]),
+    })
+
+
+def write_synthetic_tick_file(
+        path,
+        n_ticks=1_000_000,
+        n_instruments=1000,
+        date="2025-01-02",
+        seed=42,
+        start_time_ms=9 * 3_600_000,
+        mean_gap_ms=20.0,
+        chunk_size=500_000
+):
+    """
+    Write a synthetic tick file in data.txt format (pipe-delimited, 'fID=value' fields from the 8th item),
+    built with vectorised string operations and written in chunks.
+
+    :param path: output file path
+    :param date: logging date written as the first item of every line (YYYY-MM-DD)
+    :param chunk_size: lines formatted per write (bounds memory)
+    :return: path
+    """
+    inst_idx, times_ms, prices, sizes = _synthetic_ticks(n_ticks, n_instruments, seed, start_time_ms, mean_gap_ms)
+    codes = np.array([f"SYN{i:06d}" for i in range(n_instruments)], dtype=object)
+
+    with open(path, "w") as file:
+        for start in range(0, n_ticks, chunk_size):
+            end = min(start + chunk_size, n_ticks)
+            minutes = pd.Series(times_ms[start:end] // 60_000).astype(str)
+            lines = (
+                date + "|" + _format_ms(times_ms[start:end]) + "|D|"
+                + pd.Series(codes[inst_idx[start:end]]) + "|0|0|0|f1=" + minutes
+                + "|f2=" + pd.Series(prices[start:end]).astype(str)
+                + "|f3=" + pd.Series(sizes[start:end]).astype(str)
+            )
+            file.write("\n".join(lines.tolist()))
+            file.write("\n")
+    return path
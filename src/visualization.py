@@ -2,7 +2,10 @@
 import os
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from src.timestamps import to_minutes
 
 
 # -------------------------------------------------
@@ -12,6 +15,13 @@ def ensure_dir(directory: str):
     os.makedirs(directory, exist_ok=True)
 
 
+def new_figure(figsize):
+    """Stand-alone Agg figure (object-oriented API, no pyplot global state), safe in worker processes."""
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
 def parse_window_end_to_minutes(t):
     """
     Convert window_end into minutes since start.
@@ -19,12 +29,17 @@ def parse_window_end_to_minutes(t):
     - HH:MM:SS:MS
     - MM:SS:MS
     - seconds (int/float)
-    Returns float minutes or NaN.
+    - datetime-like (minutes since midnight)
+    Returns float minutes or NaN. Scalar helper; whole columns go through timestamps.to_minutes.
     """
     try:
         if pd.isna(t):
             return np.nan
 
+        if isinstance(t, (pd.Timestamp, np.datetime64)):
+            t = pd.Timestamp(t)
+            return t.hour * 60 + t.minute + (t.second + t.microsecond / 1e6) / 60.0
+
         if isinstance(t, (int, float)):
             return float(t) / 60.0
 
@@ -51,21 +66,25 @@ def parse_window_end_to_minutes(t):
 # -------------------------------------------------
 # Figure 1: Dominant Frequency Histogram
 # -------------------------------------------------
-def plot_dominant_frequency_histogram(df, output_dir="charts", bins=50, fig_num=1):
+def plot_dominant_frequency_histogram(df, output_dir="charts", bins=50, fig_num=1, counts=None):
+    # counts: optional Series frequency -> windows (e.g. DashboardAggregator.frequency_counts summed per bin), used instead of df
     ensure_dir(output_dir)
-    values = df["dominant_frequency"].dropna()
-    if values.empty:
+    if counts is None:
+        values, weights = df["dominant_frequency"].dropna(), None
+    else:
+        counts = counts[counts.index.notna()]
+        values, weights = counts.index.to_numpy(dtype=float), counts.to_numpy(dtype=float)
+    if not len(values):
         print("No dominant_frequency data to plot.")
         return
 
-    plt.figure(fig_num, figsize=(8, 5))
-    plt.hist(values, bins=bins, color="steelblue", edgecolor="black")
-    plt.title("Figure 1: Distribution of Dominant Frequencies")
-    plt.xlabel("Dominant Frequency")
-    plt.ylabel("Count")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"figure_{fig_num}_dominant_frequency.png"))
-    plt.close()
+    fig, ax = new_figure((8, 5))
+    ax.hist(values, bins=bins, weights=weights, color="steelblue", edgecolor="black")
+    ax.set_title("Figure 1: Distribution of Dominant Frequencies")
+    ax.set_xlabel("Dominant Frequency")
+    ax.set_ylabel("Count")
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, f"figure_{fig_num}_dominant_frequency.png"))
 
 
 # -------------------------------------------------
@@ -81,56 +100,51 @@ def plot_anomalies_over_time(
     highlight_high_risk=True
 ):
     ensure_dir(output_dir)
-    inst_df = df[df["Instrument Code"] == instrument_code].copy()
+    inst_df = df[df["Instrument Code"] == instrument_code]
     if inst_df.empty:
         print(f"[Figure {fig_num}] No rows for {instrument_code}")
         return
 
     # ---- unified time axis (minutes since start)
-    inst_df["t_min"] = inst_df["window_end"].apply(parse_window_end_to_minutes)
-    inst_df = inst_df.dropna(subset=["t_min", value_col])
-    inst_df = inst_df.sort_values("t_min")
-    if inst_df.empty:
+    t_min = to_minutes(inst_df["window_end"])  # one vectorised pass over the column
+    values = inst_df[value_col].to_numpy(dtype=float)
+    anomaly = (inst_df["anomaly"] == -1).to_numpy()
+    valid = ~np.isnan(t_min) & ~np.isnan(values)
+    order = np.argsort(t_min[valid], kind="stable")
+    if not len(order):
         print(f"[Figure {fig_num}] No valid parsed data for {instrument_code}")
         return
 
-    # ---- plotting with 1D arrays
-    plt.figure(fig_num, figsize=(12, 5))
-    plt.plot(
-        np.array(inst_df["t_min"].tolist()),
-        np.array(inst_df[value_col].tolist()),
-        label="Total Power",
-        linewidth=2,
-        marker="o",
-        color="royalblue"
-    )
+    save_total_power_figure(
+        os.path.join(output_dir, f"figure_{fig_num}_total_power_{instrument_code}.png"),
+        t_min[valid][order], values[valid][order], anomaly[valid][order], instrument_code, fig_num, n_ticks)
+
+
+def save_total_power_figure(path, t_min, values, anomaly, instrument_code, fig_num=3, n_ticks=10):
+    """
+    Draw one instrument's total power over time (anomalies in red) from time-sorted 1D arrays and
+    save it to path. Shared by plot_anomalies_over_time and the batch ChartRenderer.
+    """
+    fig, ax = new_figure((12, 5))
+    ax.plot(t_min, values, label="Total Power", linewidth=2, marker="o", color="royalblue")
 
     # anomalies
-    anomalies = inst_df[inst_df["anomaly"] == -1]
-    if not anomalies.empty:
-        plt.scatter(
-            np.array(anomalies["t_min"].tolist()),
-            np.array(anomalies[value_col].tolist()),
-            color="crimson",
-            s=60,
-            zorder=5,
-            label="Anomalies"
-        )
+    if anomaly.any():
+        ax.scatter(t_min[anomaly], values[anomaly], color="crimson", s=60, zorder=5, label="Anomalies")
 
-    plt.title(f"Figure {fig_num}: Total Power Over Time ({instrument_code})")
-    plt.xlabel("Time (minutes since start)")
-    plt.ylabel("Total Power")
-    plt.legend()
-    plt.grid(alpha=0.3)
+    ax.set_title(f"Figure {fig_num}: Total Power Over Time ({instrument_code})")
+    ax.set_xlabel("Time (minutes since start)")
+    ax.set_ylabel("Total Power")
+    ax.legend()
+    ax.grid(alpha=0.3)
 
     # reduce tick clutter
-    if len(inst_df) > n_ticks:
-        idx = np.linspace(0, len(inst_df) - 1, n_ticks).astype(int)
-        plt.xticks(inst_df["t_min"].iloc[idx])
+    if len(t_min) > n_ticks:
+        idx = np.linspace(0, len(t_min) - 1, n_ticks).astype(int)
+        ax.set_xticks(t_min[idx])
 
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"figure_{fig_num}_total_power_{instrument_code}.png"))
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(path)
 
 
 # -------------------------------------------------
@@ -145,10 +159,10 @@ def plot_top_anomalies_bar(summary_df, top_n=20, output_dir="charts", fig_num=2)
 
     colors = ["red" if hr else "orange" for hr in df["High Risk"]]
 
-    plt.figure(fig_num, figsize=(12, 5))
-    bars = plt.bar(df["Instrument"], df["% Anomalous"], color=colors)
+    fig, ax = new_figure((12, 5))
+    bars = ax.bar(df["Instrument"], df["% Anomalous"], color=colors)
     for bar, hr in zip(bars, df["High Risk"]):
-        plt.text(
+        ax.text(
             bar.get_x() + bar.get_width() / 2,
             bar.get_height() + 0.5,
             f"{bar.get_height():.1f}%",
@@ -158,9 +172,9 @@ def plot_top_anomalies_bar(summary_df, top_n=20, output_dir="charts", fig_num=2)
             color="darkred" if hr else "black"
         )
 
-    plt.xticks(rotation=45, ha="right")
-    plt.ylabel("% Anomalous Windows")
-    plt.title("Figure 2: Top Instruments by % Anomalous Windows")
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"figure_{fig_num}_top_anomalies.png"))
-    plt.close()
+    for label in ax.get_xticklabels():
+        label.set(rotation=45, horizontalalignment="right")
+    ax.set_ylabel("% Anomalous Windows")
+    ax.set_title("Figure 2: Top Instruments by % Anomalous Windows")
+    fig.tight_layout()
+    fig.savefig(os.path.join(output_dir, f"figure_{fig_num}_top_anomalies.png"))
@@ -1,7 +1,11 @@
+import numpy as np
 import pandas as pd
 from src.InstrumentDataProcessor import InstrumentDataProcessor
 from src.FFTFeatureExtractor import FFTFeatureExtractor
 from src.AnomalyDetector import AnomalyDetector
+from src.RollingFFTExtractor import RollingFFTExtractor
+from src.FieldPivot import FieldPivot
+from src.OutOfCoreRunner import OutOfCoreRunner
 
 # Step 1: Process data using your existing tool
 processor = InstrumentDataProcessor("data/data.txt", "data/StaticFields.txt", "data/DynamicFields.txt")
@@ -10,6 +14,8 @@ output_file = processor.process()
 # Step 2: Load processed CSV
 df = pd.read_csv(output_file)
 print(f"Loaded {len(df)} rows from {output_file}")
+df["Value"] = pd.to_numeric(df["Value"], errors="coerce")
+df = df.dropna(subset=["Value"])
 
 # Step 3: Compute FFT features
 fft_extractor = FFTFeatureExtractor(window_size=20, step_size=5)
@@ -28,3 +34,47 @@ print(fft_df_anomaly.head())
 # Step 5: Save results
 fft_df_anomaly.to_csv("fft_features_with_anomalies_test.csv", index=False)
 print("Saved FFT + anomaly results to fft_features_with_anomalies_test.csv")
+
+# Step 6: Check sliding-DFT mode against the exact per-offset FFT
+price_df = df[df["Description"] == "Last price"]
+exact_df = RollingFFTExtractor(window_size=20).compute_rolling_features(price_df)
+sliding_df = RollingFFTExtractor(window_size=20, method="sliding").compute_rolling_features(price_df)
+
+assert exact_df.shape == sliding_df.shape, "Sliding DFT produced a different number of windows"
+for col in ["dominant_frequency", "total_power", "spectral_entropy"]:
+    assert np.allclose(exact_df[col], sliding_df[col], rtol=1e-7, atol=1e-9), f"Sliding DFT mismatch in {col}"
+assert (exact_df["window_end"].values == sliding_df["window_end"].values).all(), "Sliding DFT window mismatch"
+print(f"Sliding DFT matches exact FFT on {len(exact_df)} windows")
+
+# a missing price only affects the windows that contain it
+gap_df = price_df[price_df["Instrument Code"] == price_df["Instrument Code"].iloc[0]].iloc[:400].copy()
+gap_df.iloc[100, gap_df.columns.get_loc("Value")] = np.nan
+exact_gap = RollingFFTExtractor(window_size=20).compute_rolling_features(gap_df)
+sliding_gap = RollingFFTExtractor(window_size=20, method="sliding").compute_rolling_features(gap_df)
+assert sliding_gap["total_power"].isna().sum() == exact_gap["total_power"].isna().sum(), "NaN leaked past its windows"
+for col in ["dominant_frequency", "total_power", "spectral_entropy"]:
+    assert np.allclose(exact_gap[col], sliding_gap[col], rtol=1e-7, atol=1e-9, equal_nan=True), \
+        f"Sliding DFT mismatch in {col} around a NaN"
+print(f"Sliding DFT recovers after a NaN ({exact_gap['total_power'].isna().sum()} NaN windows, as exact)")
+
+# Step 7: Check out-of-core features (one chunk and many chunks) against the in-memory pivot
+feature_cols = ["dominant_frequency", "total_power", "spectral_entropy", "rolling_mean", "rolling_std", "rolling_skew"]
+pivot = FieldPivot(field_ids=["2"], dynamic_fields=processor.dynamic_fields).build(df)
+vectorized_extractor = FFTFeatureExtractor(window_size=20, step_size=5, engine="vectorized")
+memory_df = vectorized_extractor.compute_field_features(pivot, field_ids=["2"])
+memory_df = memory_df.sort_values(["Instrument Code", "window_end"], kind="stable").reset_index(drop=True)
+
+for budget_mb in (512, 0.05):
+    out_of_core = OutOfCoreRunner(vectorized_extractor, output_dir="ooc_output_test", memory_budget_mb=budget_mb,
+                                  dynamic_fields=processor.dynamic_fields)
+    out_of_core.extract_features(output_file)
+    ooc_df = out_of_core.load("features").sort_values(["Instrument Code", "window_end"], kind="stable")
+    ooc_df = ooc_df.reset_index(drop=True)
+
+    assert len(ooc_df) == len(memory_df), f"Out-of-core ({budget_mb} MB) produced {len(ooc_df)} windows, not {len(memory_df)}"
+    assert (ooc_df["Instrument Code"].values == memory_df["Instrument Code"].values).all(), "Out-of-core instrument mismatch"
+    assert (ooc_df["window_end"].values == memory_df["window_end"].values).all(), "Out-of-core window mismatch"
+    for col in feature_cols:
+        assert np.allclose(ooc_df[col], memory_df[col], rtol=1e-7, atol=1e-9, equal_nan=True), \
+            f"Out-of-core ({budget_mb} MB) mismatch in {col}"
+    print(f"Out-of-core features ({out_of_core.stats['chunks']} chunks) match in-memory on {len(ooc_df)} windows")